@@ -0,0 +1,693 @@
+"""Benchmarks du backend d'analyse d'images
+
+Hors-ligne et sur CPU : par défaut, de petits modèles BLIP / ViT / traduction à poids aléatoires
+remplacent les checkpoints dans le registre de modèles (--models real pour les vrais modèles).
+
+Usage :
+    python benchmark.py colors --sizes 0.3 2 12 24 --repeat 5 --json colors.json
+    python benchmark.py report --cases 32 --repeat 200 --json report.json
+    python benchmark.py latency --concurrency 1 4 8 --requests 32 --json latency.json
+    python benchmark.py batch --images 64 --json batch.json
+    python benchmark.py coldstart --json coldstart.json
+    python benchmark.py suite --json suite.json
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Ne pas charger les modèles à l'import de server-final.py
+os.environ.setdefault('PRELOAD_MODELS', '0')
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageStat
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+STANDIN_IMAGE_SIZE = 64
+STANDIN_LABELS = 100
+
+def load_server(models=None):
+    """Importer server-final.py (le nom du fichier n'est pas un nom de module valide)
+    
+    models='standin' ou 'real' : configuration de mesure (cache d'analyse et réutilisation des quasi-doublons désactivés) ;
+    'standin' installe en plus les petits modèles dans le registre, sans mémo ni export persistants.
+    """
+    if models is not None:
+        os.environ['ANALYSIS_CACHE_SIZE'] = '0'
+        os.environ['ANALYSIS_CACHE_DB'] = ''
+        os.environ['JOB_DB'] = ''
+        os.environ['EMBEDDING_DIR'] = ''
+        os.environ['NEAR_DUPLICATE_REUSE'] = '0'
+    if models == 'standin':
+        os.environ['TRANSLATION_MEMO_DB'] = ''
+        os.environ['EXPORT_DIR'] = tempfile.mkdtemp(prefix='standin-export-')
+    spec = importlib.util.spec_from_file_location('server_final', os.path.join(BACKEND_DIR, 'server-final.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if models == 'standin':
+        install_standin_models(module)
+    return module
+
+def _standin_tokenizer():
+    from transformers import BertTokenizerFast
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + [f'word{i}' for i in range(59)]
+    path = os.path.join(tempfile.mkdtemp(prefix='standin-vocab-'), 'vocab.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab))
+    return BertTokenizerFast(vocab_file=path)
+
+def standin_blip(seed=0):
+    """BLIP miniature à poids aléatoires : (processor, modèle), même interface que les checkpoints"""
+    import torch
+    from transformers import BlipConfig, BlipForConditionalGeneration, BlipImageProcessor, BlipProcessor
+    config = BlipConfig(
+        text_config={'vocab_size': 64, 'hidden_size': 32, 'num_hidden_layers': 2, 'num_attention_heads': 2,
+                     'intermediate_size': 64, 'bos_token_id': 2, 'sep_token_id': 3, 'pad_token_id': 0},
+        vision_config={'hidden_size': 32, 'num_hidden_layers': 2, 'num_attention_heads': 2,
+                       'intermediate_size': 64, 'image_size': STANDIN_IMAGE_SIZE, 'patch_size': 16}
+    )
+    torch.manual_seed(seed)
+    model = BlipForConditionalGeneration(config).eval()
+    image_processor = BlipImageProcessor(size={'height': STANDIN_IMAGE_SIZE, 'width': STANDIN_IMAGE_SIZE})
+    return BlipProcessor(image_processor=image_processor, tokenizer=_standin_tokenizer()), model
+
+def standin_vit(seed=0):
+    """ViT miniature à poids aléatoires : (processor, modèle)"""
+    import torch
+    from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+    id2label = {i: f'label {i}' for i in range(STANDIN_LABELS)}
+    config = ViTConfig(
+        hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        image_size=STANDIN_IMAGE_SIZE, patch_size=16, num_labels=STANDIN_LABELS,
+        id2label=id2label, label2id={label: i for i, label in id2label.items()}
+    )
+    torch.manual_seed(seed)
+    model = ViTForImageClassification(config).eval()
+    return ViTImageProcessor(size={'height': STANDIN_IMAGE_SIZE, 'width': STANDIN_IMAGE_SIZE}), model
+
+class StandInTranslator:
+    """Pipeline de traduction factice (même appel et même sortie que transformers.pipeline)"""
+
+    task = 'translation'
+    tokenizer = None
+
+    def __init__(self, target_lang):
+        import torch
+        self.target_lang = target_lang
+        self.model = torch.nn.Linear(8, 8)
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return [{'translation_text': f"[{self.target_lang}] {text}"} for text in inputs]
+
+def install_standin_models(server):
+    """Remplacer les chargeurs du registre par les modèles miniatures (conversion de backend comprise)"""
+    def load_blip():
+        processor, model = standin_blip()
+        return processor, server.convert_blip_model(server.INFERENCE_BACKEND, model)
+    
+    def load_vit():
+        processor, model = standin_vit()
+        return processor, server.convert_vit_model(server.INFERENCE_BACKEND, model)
+    
+    def load_translation(key):
+        server.translation_model_ids[key] = f'standin-{key}'
+        return StandInTranslator(key.split('-')[1])
+    
+    for name in server.model_registry.names():
+        if name.startswith('blip:'):
+            server.model_registry.register(name, load_blip)
+        elif name == 'vit':
+            server.model_registry.register(name, load_vit)
+        else:
+            key = name.split(':', 1)[1]
+            server.model_registry.register(name, lambda key=key: load_translation(key))
+
+def synthetic_image(megapixels, seed=0, aspect=4 / 3):
+    """Image RGB synthétique : dégradés, formes et bruit, pour une taille donnée en mégapixels"""
+    height = max(8, int((megapixels * 1e6 / aspect) ** 0.5))
+    width = max(8, int(height * aspect))
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = 255 * x / width
+    pixels[..., 1] = 255 * y / height
+    pixels[..., 2] = 128 + 127 * np.sin(x / 37.0) * np.cos(y / 53.0)
+    # Quelques rectangles pleins pour créer des contours francs
+    for _ in range(12):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        pixels[y0:y0 + height // 8, x0:x0 + width // 8] = rng.integers(0, 256, 3)
+    pixels += rng.normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+_FORMAT_EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'webp': 'webp'}
+
+def synthetic_corpus(sizes, formats, count, seed=0):
+    """Corpus encodé : (nom de fichier, octets, mégapixels, format), tailles et formats en alternance"""
+    corpus = []
+    for index in range(count):
+        megapixels = sizes[index % len(sizes)]
+        image_format = formats[(index // len(sizes)) % len(formats)]
+        buffer = io.BytesIO()
+        synthetic_image(megapixels, seed=seed + index).save(buffer, image_format.upper(), quality=90)
+        filename = f"synthetic-{index:04d}-{megapixels}mp.{_FORMAT_EXTENSIONS[image_format]}"
+        corpus.append((filename, buffer.getvalue(), megapixels, image_format))
+    return corpus
+
+def legacy_analyze_colors(image):
+    """Implémentation d'origine (getcolors + ImageStat + FIND_EDGES pleine résolution), pour comparaison"""
+    width, height = image.size
+    small_img = image.resize((100, 100))
+    colors = small_img.getcolors(10000)
+    dominant_colors = []
+    if colors:
+        colors.sort(key=lambda x: x[0], reverse=True)
+        for count, color in colors[:5]:
+            dominant_colors.append('#{:02x}{:02x}{:02x}'.format(color[0], color[1], color[2]))
+
+    stat = ImageStat.Stat(image)
+    edges = image.filter(ImageFilter.FIND_EDGES)
+    edge_stat = ImageStat.Stat(edges)
+    return {
+        'dominant_colors': dominant_colors,
+        'brightness': sum(stat.mean) / 3,
+        'contrast': sum(stat.stddev) / 3,
+        'edge_strength': sum(edge_stat.mean) / 3,
+        'width': width,
+        'height': height
+    }
+
+def legacy_french_report(server, blip_description, vit_results, color_analysis):
+    """Générateur de rapport d'origine (français) : concaténations et dictionnaires reconstruits à chaque appel"""
+    trans = server.TRANSLATIONS['fr']
+
+    def translate_label(label):
+        if server.translation_available('en-fr'):
+            translated = server.translate_with_ia(label, 'fr')
+            if translated and translated != label:
+                return translated
+        translations = {
+            "building": "Bâtiment", "street": "Rue", "city": "Ville", "landscape": "Paysage",
+            "mountain": "Montagne", "beach": "Plage", "forest": "Forêt", "person": "Personne", "car": "Voiture",
+            "animal": "Animal", "tree": "Arbre", "water": "Eau", "sky": "Ciel", "food": "Nourriture",
+            "indoor": "Intérieur", "outdoor": "Extérieur", "zebra": "Zèbre", "gazelle": "Gazelle",
+            "impala": "Impala", "giraffe": "Girafe", "comic book": "Bande dessinée",
+            "book jacket": "Couverture de livre", "dust cover": "Couverture protectrice",
+            "dust jacket": "Couverture de livre", "dust wrapper": "Emballage protecteur", "bow": "Arc",
+            "book": "Livre"
+        }
+        return translations.get(label.lower(), label)
+
+    def composition(composition_type):
+        descriptions = {
+            lang: dict(server.TRANSLATIONS[lang]['compositions']) for lang in ('fr', 'ar', 'en')
+        }
+        return descriptions['fr'].get(composition_type, composition_type)
+
+    def caption(text):
+        translated = server.translate_with_ia(text, 'fr')
+        if translated and translated != text:
+            return translated
+        translations = {
+            "a man with a stick in his hand in the jungle": "Un homme tenant un bâton dans sa main dans la jungle",
+            "in his hand": "dans sa main", "in the jungle": "dans la jungle", "with a stick": "tenant un bâton",
+            "a man": "un homme",
+        }
+        for eng, fr in translations.items():
+            if eng in text.lower():
+                return text.lower().replace(eng, fr).capitalize()
+        return "Image contenant divers éléments visuels"
+
+    report = "🖼️ RAPPORT COMPLET D'ANALYSE D'IMAGE\n\n"
+    report += f"📋 {trans['executive_summary']}\n"
+    french_desc = caption(blip_description) if blip_description else 'Image contenant divers éléments visuels'
+    report += f"Description IA : {french_desc}\n\n"
+    report += f"🔍 {trans['content_analysis']}\n"
+    if vit_results:
+        report += f"{trans['main_categories']} :\n"
+        for result in vit_results[:3]:
+            report += f"  • {translate_label(result['label'])} (confiance: {result['confidence']*100:.1f}%)\n"
+    report += f"\n{trans['visual_analysis']} :\n"
+    if color_analysis:
+        report += f"  • {trans['resolution']} : {color_analysis['width']} × {color_analysis['height']} pixels\n"
+        report += f"  • {trans['aspect_ratio']} : {color_analysis['width']/color_analysis['height']:.2f}:1\n"
+        report += f"  • {trans['dominant_colors']} : {', '.join(color_analysis['dominant_colors'][:3])}\n"
+        report += f"  • {trans['composition_type']} : {composition(color_analysis['composition'])}\n"
+        report += f"  • {trans['brightness_level']} : {'Élevé' if color_analysis['brightness'] > 150 else 'Moyen' if color_analysis['brightness'] > 100 else 'Faible'}\n"
+
+    report += f"\n🎨 {trans['technical_analysis']}\n"
+    analysis = ""
+    if color_analysis:
+        if color_analysis['contrast'] > 60:
+            analysis += f"  • {trans['high_contrast']}\n"
+        if color_analysis['edge_strength'] > 40:
+            analysis += f"  • {trans['sharp_details']}\n"
+        if len(color_analysis['dominant_colors']) >= 3:
+            analysis += f"  • {trans['color_harmony']}\n"
+    if vit_results:
+        main_category = vit_results[0]['label']
+        if 'landscape' in main_category.lower():
+            analysis += "  • Paysage panoramique avec profondeur de champ\n"
+        elif 'building' in main_category.lower():
+            analysis += f"  • {trans['architectural_elements']}\n"
+        elif 'person' in main_category.lower():
+            analysis += "  • Présence d'éléments humains comme point focal\n"
+    report += analysis
+
+    report += f"\n💡 {trans['recommendations']}\n"
+    recommendations = []
+    desc_lower = (blip_description or "").lower()
+    if any(word in desc_lower for word in ['landscape', 'mountain', 'beach', 'paysage', 'جبل', 'شاطئ']):
+        recommendations.extend(["Présentations environnementales", "Arrière-plans naturels"])
+    if any(word in desc_lower for word in ['city', 'building', 'street', 'ville', 'bâtiment', 'مدينة', 'مبنى']):
+        recommendations.extend(["Projets urbains", "Design architectural"])
+    recommendations.extend(["Usage professionnel", "Impression et affichage numérique"])
+    report += "  • " + "\n  • ".join(recommendations[:4])
+    return report
+
+def time_call(fn, arg, repeat):
+    """Durées (ms) de `repeat` appels, après un appel de chauffe"""
+    fn(arg)
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+def summarize(durations):
+    return {
+        'median_ms': round(statistics.median(durations), 2),
+        'min_ms': round(min(durations), 2),
+        'max_ms': round(max(durations), 2)
+    }
+
+def percentiles(durations):
+    """Percentiles de latence (ms)"""
+    values = np.asarray(durations, dtype=np.float64)
+    return {
+        'count': int(values.size),
+        'mean_ms': round(float(values.mean()), 2),
+        **{f'p{q}_ms': round(float(np.percentile(values, q)), 2) for q in (50, 90, 95, 99)},
+        'max_ms': round(float(values.max()), 2)
+    }
+
+def peak_rss_bytes():
+    """Pic de mémoire résidente du processus (ru_maxrss est en Ko sous Linux, en octets sous macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def environment(args, server=None):
+    """Contexte de la mesure, pour comparer des résultats entre commits"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    info = {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'models': getattr(args, 'models', None)
+    }
+    if server is not None:
+        info.update({
+            'torch': server.torch.__version__,
+            'torch_threads': server.torch.get_num_threads(),
+            'inference_backend': server.INFERENCE_BACKEND,
+            'batch_max_size': server.BATCH_MAX_SIZE,
+            'batch_max_wait_ms': server.BATCH_MAX_WAIT_MS
+        })
+    return info
+
+def bench_colors(args):
+    """Comparer l'analyse des couleurs vectorisée à l'implémentation d'origine"""
+    server = load_server()
+    results = []
+    for megapixels in args.sizes:
+        image = synthetic_image(megapixels)
+        legacy = summarize(time_call(legacy_analyze_colors, image, args.repeat))
+        vectorized = summarize(time_call(server.analyze_colors_and_composition, image, args.repeat))
+        results.append({
+            'megapixels': megapixels,
+            'size': f"{image.size[0]}x{image.size[1]}",
+            'legacy': legacy,
+            'vectorized': vectorized,
+            'speedup': round(legacy['median_ms'] / max(vectorized['median_ms'], 1e-6), 1)
+        })
+        print(f"{megapixels:>6.1f} MP  legacy {legacy['median_ms']:>9.2f} ms  "
+              f"numpy {vectorized['median_ms']:>7.2f} ms  x{results[-1]['speedup']}")
+    return {'benchmark': 'colors', 'repeat': args.repeat, 'results': results}
+
+def _report_cases(server, count, seed):
+    """Entrées de rapport variées : analyse des couleurs d'images synthétiques et résultats ViT simulés"""
+    rng = np.random.default_rng(seed)
+    labels = ['landscape', 'building', 'person', 'zebra', 'book jacket', 'street', 'unknown thing']
+    captions = ['a man with a stick in his hand in the jungle', 'a city street with a tall building',
+                'a mountain beach at sunset', None]
+    cases = []
+    for index in range(count):
+        color_analysis = server.analyze_colors_and_composition(synthetic_image(0.05, seed=seed + index))
+        confidences = np.sort(rng.dirichlet(np.ones(5)))[::-1]
+        vit_results = [{'label': labels[(index + k) % len(labels)], 'confidence': float(c)}
+                       for k, c in enumerate(confidences)]
+        cases.append((captions[index % len(captions)], vit_results, color_analysis))
+    return cases
+
+def _measure_reports(fn, cases, repeat, rounds=5):
+    """CPU par rapport (µs, meilleure de `rounds` séries) et pic d'allocation pendant un rapport (tracemalloc, octets)"""
+    for case in cases:
+        fn(*case)
+    cpu_us = float('inf')
+    for _ in range(rounds):
+        started = time.process_time()
+        for _ in range(repeat):
+            for case in cases:
+                fn(*case)
+        cpu_us = min(cpu_us, (time.process_time() - started) / (repeat * len(cases)) * 1e6)
+    
+    peaks = []
+    tracemalloc.start()
+    try:
+        for case in cases:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(*case)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return {'cpu_us_per_report': round(cpu_us, 2), 'peak_alloc_bytes_median': int(statistics.median(peaks))}
+
+def _unavailable_model():
+    raise RuntimeError("modèle désactivé pour la mesure")
+
+def bench_report(args):
+    """Rapport français : générateur d'origine vs moteur à gabarits compilés (texte, JSON, HTML)"""
+    server = load_server('standin')
+    cases = _report_cases(server, args.cases, args.seed)
+    engine = server.report_engine
+    legacy = partial(legacy_french_report, server)
+    compiled = lambda *case: engine.render_text(*case, 'fr')
+    from_report = lambda *case: engine.render(engine.build(*case, 'fr'), 'text')
+    
+    scenarios = {}
+    # Traduction IA (servie par le mémo), puis pipeline indisponible : repli sur les dictionnaires
+    for scenario in ('translation', 'dictionary'):
+        if scenario == 'dictionary':
+            server.model_registry.register(server.translation_model_name('en-fr'), _unavailable_model)
+            server.translation_available('en-fr')
+        results = {
+            'legacy': _measure_reports(legacy, cases, args.repeat),
+            'compiled_text': _measure_reports(compiled, cases, args.repeat),
+            'compiled_json': _measure_reports(lambda *case: engine.build(*case, 'fr'), cases, args.repeat),
+            'json_and_text': _measure_reports(from_report, cases, args.repeat),
+            'compiled_html': _measure_reports(lambda *case: engine.render(engine.build(*case, 'fr'), 'html'),
+                                              cases, args.repeat),
+        }
+        identical = all(legacy(*case) == compiled(*case) == from_report(*case) for case in cases)
+        print(f"[{scenario}] texte identique à l'implémentation d'origine : {identical}")
+        for name, result in results.items():
+            print(f"  {name:<14} {result['cpu_us_per_report']:>9.2f} µs/rapport  "
+                  f"pic d'allocation {result['peak_alloc_bytes_median']:>7d} o")
+        scenarios[scenario] = {
+            'identical_text': identical,
+            'results': results,
+            'cpu_speedup': round(results['legacy']['cpu_us_per_report'] /
+                                 max(results['compiled_text']['cpu_us_per_report'], 1e-6), 2)
+        }
+    return {
+        'benchmark': 'report',
+        'environment': environment(args, server),
+        'cases': len(cases),
+        'repeat': args.repeat,
+        'scenarios': scenarios
+    }
+
+def post_image(app, filename, data, language, profile):
+    """Une requête /api/analyze-image via le client de test Flask ; retourne (ms, code, JSON)"""
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post(
+        '/api/analyze-image',
+        data={'image': (io.BytesIO(data), filename), 'language': language, 'profile': profile},
+        content_type='multipart/form-data'
+    )
+    return (time.perf_counter() - started) * 1000, response.status_code, response.get_json()
+
+def stage_summary(results):
+    """Médiane et p90 de chaque étape (details.stage_timings_ms des réponses)"""
+    stages = {}
+    for _, status, body in results:
+        if status == 200:
+            for stage, duration in body['details'].get('stage_timings_ms', {}).items():
+                stages.setdefault(stage, []).append(duration)
+    return {
+        stage: {'p50_ms': round(float(np.percentile(values, 50)), 2),
+                'p90_ms': round(float(np.percentile(values, 90)), 2)}
+        for stage, values in sorted(stages.items())
+    }
+
+def bench_latency(args, server=None):
+    """Latence de bout en bout de /api/analyze-image à plusieurs niveaux de concurrence"""
+    server = server or load_server(args.models)
+    corpus = synthetic_corpus(args.sizes, args.formats, args.requests, seed=args.seed)
+    
+    # Première requête : chargement des modèles compris
+    filename, data, _, _ = corpus[0]
+    first_ms, status, _ = post_image(server.app, filename, data, args.language, args.profile)
+    print(f"première requête (chargement des modèles): {first_ms:.0f} ms (HTTP {status})")
+    
+    levels = []
+    for concurrency in args.concurrency:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                lambda item: post_image(server.app, item[0], item[1], args.language, args.profile), corpus
+            ))
+        wall = time.perf_counter() - started
+        ok = [r for r in results if r[1] == 200]
+        level = {
+            'concurrency': concurrency,
+            'requests': len(results),
+            'errors': len(results) - len(ok),
+            'throughput_rps': round(len(results) / wall, 2),
+            'latency': percentiles([r[0] for r in results]),
+            'latency_by_format': {
+                image_format: percentiles([r[0] for r, item in zip(results, corpus) if item[3] == image_format])
+                for image_format in args.formats
+            },
+            'latency_by_megapixels': {
+                str(megapixels): percentiles([r[0] for r, item in zip(results, corpus) if item[2] == megapixels])
+                for megapixels in args.sizes
+            },
+            'stages': stage_summary(results)
+        }
+        levels.append(level)
+        print(f"concurrence {concurrency:>3}: p50 {level['latency']['p50_ms']:>8.1f} ms  "
+              f"p99 {level['latency']['p99_ms']:>8.1f} ms  {level['throughput_rps']:>6.2f} req/s  "
+              f"erreurs {level['errors']}")
+    
+    return {
+        'benchmark': 'latency',
+        'environment': environment(args, server),
+        'corpus': {'sizes_mp': args.sizes, 'formats': args.formats, 'images': len(corpus)},
+        'language': args.language,
+        'profile': args.profile,
+        'first_request_ms': round(first_ms, 1),
+        'levels': levels,
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+
+def bench_batch(args, server=None):
+    """Débit (images/s) des modes par lot : /api/analyze-batch (NDJSON) et travaux asynchrones /api/jobs"""
+    server = server or load_server(args.models)
+    corpus = synthetic_corpus(args.sizes, args.formats, args.images, seed=args.seed + 10000)
+    client = server.app.test_client()
+    
+    # Chauffe : charger les modèles hors mesure
+    post_image(server.app, corpus[0][0], corpus[0][1], args.language, args.profile)
+    
+    started = time.perf_counter()
+    response = client.post(
+        '/api/analyze-batch',
+        data={'images': [(io.BytesIO(data), filename) for filename, data, _, _ in corpus],
+              'language': args.language, 'profile': args.profile},
+        content_type='multipart/form-data'
+    )
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    batch_seconds = time.perf_counter() - started
+    summary = lines[-1] if lines and lines[-1].get('done') else {}
+    
+    started = time.perf_counter()
+    job_ids = []
+    for filename, data, _, _ in corpus:
+        submitted = client.post(
+            '/api/jobs',
+            data={'image': (io.BytesIO(data), filename), 'language': args.language, 'profile': args.profile},
+            content_type='multipart/form-data'
+        )
+        if submitted.status_code == 202:
+            job_ids.append(submitted.get_json()['job_id'])
+    jobs = {}
+    while len(jobs) < len(job_ids):
+        for job_id in job_ids:
+            if job_id not in jobs:
+                job = client.get(f'/api/jobs/{job_id}').get_json()
+                if job['status'] in ('done', 'failed'):
+                    jobs[job_id] = job
+        time.sleep(0.01)
+    jobs_seconds = time.perf_counter() - started
+    
+    report = {
+        'benchmark': 'batch',
+        'environment': environment(args, server),
+        'images': len(corpus),
+        'analyze_batch': {
+            'seconds': round(batch_seconds, 3),
+            'images_per_second': round(len(corpus) / batch_seconds, 2),
+            'errors': summary.get('errors')
+        },
+        'jobs': {
+            'seconds': round(jobs_seconds, 3),
+            'images_per_second': round(len(job_ids) / jobs_seconds, 2) if job_ids else 0,
+            'rejected': len(corpus) - len(job_ids),
+            'failed': sum(1 for job in jobs.values() if job['status'] == 'failed'),
+            'queue_wait': percentiles([job['timings_ms']['queue_wait'] for job in jobs.values()]) if jobs else None
+        },
+        'batching': server.vit_batcher.stats(),
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+    print(f"analyze-batch: {report['analyze_batch']['images_per_second']} images/s | "
+          f"jobs: {report['jobs']['images_per_second']} images/s")
+    return report
+
+def cold_start_child(models, language, profile):
+    """Exécuté dans un processus neuf : import du serveur puis première analyse (JSON sur stdout)"""
+    started = time.perf_counter()
+    server = load_server(models)
+    imported = time.perf_counter()
+    filename, data, _, _ = synthetic_corpus([0.3], ['jpeg'], 1)[0]
+    _, status, _ = post_image(server.app, filename, data, language, profile)
+    first_response = time.perf_counter()
+    print(json.dumps({
+        'import_seconds': round(imported - started, 3),
+        'first_analysis_seconds': round(first_response - imported, 3),
+        'first_status': status,
+        'peak_rss_bytes': peak_rss_bytes()
+    }))
+
+def bench_coldstart(args):
+    """Démarrage à froid dans des processus neufs : import (démarrage du serveur) puis première réponse"""
+    runs = []
+    code = (f"import benchmark; benchmark.cold_start_child({args.models!r}, {args.language!r}, {args.profile!r})")
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if completed.returncode != 0:
+            raise RuntimeError(f"Démarrage à froid en échec: {completed.stderr[-2000:]}")
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        run['process_seconds'] = round(wall, 3)
+        runs.append(run)
+        print(f"import {run['import_seconds']:.2f}s  première analyse {run['first_analysis_seconds']:.2f}s  "
+              f"pic RSS {run['peak_rss_bytes'] / 1e6:.0f} Mo")
+    
+    return {
+        'benchmark': 'coldstart',
+        'environment': environment(args),
+        'runs': runs,
+        'median': {
+            key: statistics.median(run[key] for run in runs)
+            for key in ('import_seconds', 'first_analysis_seconds', 'process_seconds', 'peak_rss_bytes')
+        }
+    }
+
+def bench_suite(args):
+    """Latence, débit par lot et démarrage à froid dans un seul rapport"""
+    coldstart = bench_coldstart(args)
+    server = load_server(args.models)
+    return {
+        'benchmark': 'suite',
+        'environment': environment(args, server),
+        'latency': bench_latency(args, server),
+        'batch': bench_batch(args, server),
+        'coldstart': coldstart,
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', help="Écrire les résultats dans ce fichier JSON")
+    serving = argparse.ArgumentParser(add_help=False)
+    serving.add_argument('--models', choices=['standin', 'real'], default='standin',
+                         help="Petits modèles à poids aléatoires (hors-ligne) ou vrais checkpoints")
+    serving.add_argument('--sizes', type=float, nargs='+', default=[0.3, 2, 12],
+                         help="Tailles des images du corpus (mégapixels)")
+    serving.add_argument('--formats', nargs='+', choices=list(_FORMAT_EXTENSIONS), default=['jpeg', 'png', 'webp'])
+    serving.add_argument('--language', default='fr')
+    serving.add_argument('--profile', default='best')
+    serving.add_argument('--seed', type=int, default=0)
+    latency_args = argparse.ArgumentParser(add_help=False)
+    latency_args.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    latency_args.add_argument('--requests', type=int, default=24, help="Requêtes par niveau de concurrence")
+    batch_args = argparse.ArgumentParser(add_help=False)
+    batch_args.add_argument('--images', type=int, default=32, help="Images par mode de traitement par lot")
+    coldstart_args = argparse.ArgumentParser(add_help=False)
+    coldstart_args.add_argument('--runs', type=int, default=3)
+    
+    parser = argparse.ArgumentParser(description="Benchmarks du backend d'analyse d'images")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    colors_parser = subparsers.add_parser('colors', parents=[common],
+                                          help="Analyse des couleurs : numpy vs implémentation d'origine")
+    colors_parser.add_argument('--sizes', type=float, nargs='+', default=[0.3, 2, 12, 24],
+                               help="Tailles des images synthétiques (mégapixels)")
+    colors_parser.add_argument('--repeat', type=int, default=5)
+    colors_parser.set_defaults(run=bench_colors)
+    
+    report_parser = subparsers.add_parser('report', parents=[common],
+                                          help="Génération des rapports : gabarits compilés vs implémentation d'origine")
+    report_parser.add_argument('--cases', type=int, default=32, help="Nombre d'entrées de rapport différentes")
+    report_parser.add_argument('--repeat', type=int, default=200)
+    report_parser.add_argument('--seed', type=int, default=0)
+    report_parser.set_defaults(run=bench_report, models='standin')
+    
+    subparsers.add_parser(
+        'latency', parents=[common, serving, latency_args],
+        help="Percentiles de latence de /api/analyze-image par niveau de concurrence"
+    ).set_defaults(run=bench_latency)
+    subparsers.add_parser(
+        'batch', parents=[common, serving, batch_args],
+        help="Images/s de /api/analyze-batch et des travaux asynchrones"
+    ).set_defaults(run=bench_batch)
+    subparsers.add_parser(
+        'coldstart', parents=[common, serving, coldstart_args],
+        help="Démarrage à froid : import du serveur et première analyse"
+    ).set_defaults(run=bench_coldstart)
+    subparsers.add_parser(
+        'suite', parents=[common, serving, latency_args, batch_args, coldstart_args],
+        help="latency + batch + coldstart"
+    ).set_defaults(run=bench_suite)
+
+    args = parser.parse_args()
+
+    report = args.run(args)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,58 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from PIL import Image, ImageFilter, ImageStat
+from PIL import Image
+import numpy as np
 import torch
+import requests
 from transformers import BlipProcessor, BlipForConditionalGeneration
 from transformers import ViTImageProcessor, ViTForImageClassification
 from transformers import pipeline  # Utiliser pipeline pour la traduction
+from transformers import AutoConfig
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+import argparse
+import bisect
+import ctypes
+import gc
 import logging
+import multiprocessing
 from datetime import datetime
+from collections import OrderedDict, deque
+import hashlib
+import heapq
+import html
 import io
+import ipaddress
+import itertools
 import json
+import math
+import mmap
+import os
+import queue
+import re
+import select
+import shutil
+import signal
+import socket
+import sqlite3
+import tempfile
 import threading
 import time
+import uuid
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+from functools import partial, wraps
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import tarfile
+import zipfile
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -19,77 +61,847 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Variables globales pour les modèles
-blip_processor = None
-blip_model = None
-vit_processor = None
-vit_model = None
-translation_pipelines = {}
-translation_models_loading = False
+# Identifiants des modèles (utilisés aussi dans la clé du cache d'analyse)
+BLIP_MODEL_ID = "Salesforce/blip-image-captioning-large"
+VIT_MODEL_ID = 'google/vit-base-patch16-224'
 
-def load_models_async():
-    """Charger les modèles en arrière-plan"""
-    global blip_processor, blip_model, vit_processor, vit_model, translation_pipelines, translation_models_loading
-    
-    logger.info("🔄 Début du chargement asynchrone des modèles...")
-    
-    try:
-        # Charger les modèles d'analyse d'image
-        logger.info("Chargement BLIP...")
-        blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-large")
-        blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-large")
-        
-        logger.info("Chargement ViT...")
-        vit_processor = ViTImageProcessor.from_pretrained('google/vit-base-patch16-224')
-        vit_model = ViTForImageClassification.from_pretrained('google/vit-base-patch16-224')
-        
-        logger.info("✅ Modèles d'analyse d'image chargés")
+# Profils de génération des descriptions (qualité / latence)
+CAPTION_PROFILES = {
+    'fast': {'model_id': "Salesforce/blip-image-captioning-base", 'num_beams': 1, 'max_length': 30},
+    'balanced': {'model_id': BLIP_MODEL_ID, 'num_beams': 3, 'max_length': 50},
+    'best': {'model_id': BLIP_MODEL_ID, 'num_beams': 5, 'max_length': 100},
+}
+DEFAULT_CAPTION_PROFILE = os.environ.get('CAPTION_PROFILE', 'best')
+if DEFAULT_CAPTION_PROFILE not in CAPTION_PROFILES:
+    logger.warning(f"⚠️ Profil de description inconnu '{DEFAULT_CAPTION_PROFILE}', utilisation de 'best'")
+    DEFAULT_CAPTION_PROFILE = 'best'
+
+# Backend d'inférence : eager (fp32), int8 (quantification dynamique), torchscript ou onnx
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'eager')
+INFERENCE_BACKENDS = ['eager', 'int8', 'torchscript', 'onnx']
+EXPORT_DIR = os.environ.get(
+    'EXPORT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exported_models')
+)
+
+# Modèles chargés au premier usage ; PRELOAD_MODELS=1 précharge en arrière-plan ceux du profil par défaut
+PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS', '0') == '1'
+# Budget mémoire des poids chargés (Mo, 0 = illimité) : au-delà, déchargement LRU des modèles inactifs
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', '0'))
+MODEL_RETRY_AFTER = float(os.environ.get('MODEL_RETRY_AFTER', '60'))  # délai avant de retenter un chargement échoué
+
+# Ingestion des images : côté max du tampon RGB partagé et limite anti « decompression bomb »
+INGEST_MAX_SIDE = int(os.environ.get('INGEST_MAX_SIDE', '512'))
+INGEST_MAX_PIXELS = int(os.environ.get('INGEST_MAX_PIXELS', str(64 * 1000 * 1000)))
+
+# Mode tuilé (champ tiled=1) : côté max du raster tuilé (memmap sur disque), tuiles carrées qui se chevauchent
+TILE_MAX_PIXELS = int(os.environ.get('TILE_MAX_PIXELS', str(1000 * 1000 * 1000)))  # taille annoncée par l'en-tête
+# Pixels décodés en entier en mémoire : après réduction DCT pour les JPEG, pleine résolution pour les autres formats
+TILE_DECODE_MAX_PIXELS = int(os.environ.get('TILE_DECODE_MAX_PIXELS', str(256 * 1000 * 1000)))
+TILE_SCAN_MAX_SIDE = int(os.environ.get('TILE_SCAN_MAX_SIDE', '4096'))
+TILE_SIZE = int(os.environ.get('TILE_SIZE', '1024'))  # côté d'une tuile dans le raster
+TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', '0.25'))
+TILE_MAX_COUNT = int(os.environ.get('TILE_MAX_COUNT', '16'))  # au-delà, les tuiles sont agrandies
+TILE_MODEL_SIDE = 384  # tuiles réduites dès leur extraction (entrée BLIP ; ViT redimensionne à 224)
+TILE_CAPTION_MAX = 3  # descriptions de tuiles ajoutées à la description globale
+
+# Garde-fou global de Pillow au plus large des deux limites ; chaque chemin vérifie la sienne explicitement
+Image.MAX_IMAGE_PIXELS = max(INGEST_MAX_PIXELS, TILE_MAX_PIXELS)
+
+# Réception des images en flux : taille max du fichier, seuil de débordement sur disque (mmap), taille des lectures
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))
+UPLOAD_SPOOL_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MEMORY', str(1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(64 * 1024)))
+UPLOAD_MAX_FIELD_BYTES = 64 * 1024  # champs texte du formulaire (language, profile...)
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024  # en-têtes des parties et champs, en plus du fichier
+# Plafond de tout corps de requête (lots, archives, formulaires) : Werkzeug répond 413 au-delà
+REQUEST_MAX_BYTES = int(os.environ.get('REQUEST_MAX_BYTES', str(256 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = REQUEST_MAX_BYTES
+
+# Analyse des couleurs : côté max du sous-échantillon et quantification (bits par canal)
+COLOR_ANALYSIS_MAX_SIDE = int(os.environ.get('COLOR_ANALYSIS_MAX_SIDE', '256'))
+COLOR_QUANT_BITS = 4
+
+# Configuration du micro-batching (BLIP / ViT)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '8'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '10'))
+
+# Configuration du cache d'analyse (mémoire LRU + disque sqlite optionnel)
+ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', '512'))
+ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+ANALYSIS_CACHE_TTL = float(os.environ.get('ANALYSIS_CACHE_TTL', '3600'))
+ANALYSIS_CACHE_DB = os.environ.get('ANALYSIS_CACHE_DB', '')
+ANALYSIS_CACHE_DISK_TTL = float(os.environ.get('ANALYSIS_CACHE_DISK_TTL', str(7 * 24 * 3600)))
+ANALYSIS_CACHE_DISK_MAX_ROWS = int(os.environ.get('ANALYSIS_CACHE_DISK_MAX_ROWS', '100000'))  # 0 = illimité
+ANALYSIS_CACHE_DISK_PURGE_EVERY = 256  # écritures entre deux purges (expirés puis plus anciens au-delà du plafond)
+
+# Quasi-doublons : hash perceptuel (64 bits) et réutilisation des résultats BLIP/ViT
+NEAR_DUPLICATE_REUSE = os.environ.get('NEAR_DUPLICATE_REUSE', '1') != '0'
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.environ.get('NEAR_DUPLICATE_MAX_DISTANCE', '6'))  # bits différents
+NEAR_DUPLICATE_INDEX_SIZE = int(os.environ.get('NEAR_DUPLICATE_INDEX_SIZE', '100000'))
+
+# Embeddings ViT : matrice float16 mappée en mémoire dans EMBEDDING_DIR (persistance sur demande :
+# le dossier n'est jamais purgé) ; vide = en mémoire seulement, perdus au redémarrage
+EMBEDDING_DIR = os.environ.get('EMBEDDING_DIR', '')
+EMBEDDING_INDEX = os.environ.get('EMBEDDING_INDEX', 'flat')  # flat (force brute) ou ivf
+EMBEDDING_SEARCH_CHUNK = int(os.environ.get('EMBEDDING_SEARCH_CHUNK', '65536'))  # lignes converties par bloc
+EMBEDDING_IVF_MIN_VECTORS = int(os.environ.get('EMBEDDING_IVF_MIN_VECTORS', '50000'))
+EMBEDDING_IVF_LISTS = int(os.environ.get('EMBEDDING_IVF_LISTS', '0'))  # 0 = 4 x racine du nombre de vecteurs
+EMBEDDING_IVF_PROBES = int(os.environ.get('EMBEDDING_IVF_PROBES', '8'))
+
+# Configuration de la traduction (mémo persistant + traduction par lot)
+TRANSLATION_MEMO_DB = os.environ.get(
+    'TRANSLATION_MEMO_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_memo.sqlite3')
+)
+TRANSLATION_BATCH_SIZE = int(os.environ.get('TRANSLATION_BATCH_SIZE', '32'))
+
+# Configuration de l'exécution parallèle des étapes (BLIP, ViT, couleurs)
+STAGE_WORKERS = int(os.environ.get('STAGE_WORKERS', '4'))
+
+# Configuration de l'analyse par lot (nombre d'images en vol par requête /api/analyze-batch)
+BATCH_ANALYSIS_WINDOW = int(os.environ.get('BATCH_ANALYSIS_WINDOW', str(2 * BATCH_MAX_SIZE)))
+# Archives du lot : nombre max d'images et total décompressé max par requête (chaque image reste bornée par UPLOAD_MAX_BYTES)
+BATCH_ARCHIVE_MAX_MEMBERS = int(os.environ.get('BATCH_ARCHIVE_MAX_MEMBERS', '1000'))
+BATCH_ARCHIVE_MAX_BYTES = int(os.environ.get('BATCH_ARCHIVE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Travaux asynchrones (/api/jobs) : workers, taille max de la file, rétention des résultats, sqlite optionnel
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', '64'))
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', '3600'))
+JOB_DB = os.environ.get('JOB_DB', '')
+JOB_CALLBACK_TIMEOUT = float(os.environ.get('JOB_CALLBACK_TIMEOUT', '10'))
+# Hôtes de webhook autorisés (séparés par des virgules) ; vide : tout hôte dont les adresses sont publiques
+JOB_CALLBACK_ALLOWED_HOSTS = {host.strip().lower() for host in os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',')
+                              if host.strip()}
+
+# Service de production (serve --production) : workers préforkés × threads HTTP, threads torch par worker
+SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', '0'))  # 0 = cœurs / threads torch par worker
+SERVE_THREADS = int(os.environ.get('SERVE_THREADS', str(BATCH_MAX_SIZE)))  # de quoi remplir un lot BLIP/ViT
+SERVE_TIMEOUT = int(os.environ.get('SERVE_TIMEOUT', '120'))
+SERVE_GRACEFUL_TIMEOUT = int(os.environ.get('SERVE_GRACEFUL_TIMEOUT', '60'))
+SERVE_WARMUP = os.environ.get('SERVE_WARMUP', '1') != '0'
+
+# Coalescence (single-flight) des analyses identiques en cours : un seul calcul partagé par les requêtes
+SINGLE_FLIGHT = os.environ.get('SINGLE_FLIGHT', '1') != '0'
+SINGLE_FLIGHT_WORKERS = int(os.environ.get('SINGLE_FLIGHT_WORKERS', str(max(SERVE_THREADS, BATCH_ANALYSIS_WINDOW))))
+SINGLE_FLIGHT_POLL_MS = float(os.environ.get('SINGLE_FLIGHT_POLL_MS', '100'))  # détection des clients partis
+
+# Échéance par requête (en-tête X-Deadline-Ms ou champ deadline_ms) : dégradation progressive puis délestage (503)
+REQUEST_DEADLINE_MS = float(os.environ.get('REQUEST_DEADLINE_MS', '0'))  # 0 = pas d'échéance par défaut
+DEADLINE_MARGIN_MS = float(os.environ.get('DEADLINE_MARGIN_MS', '50'))  # rapport, sérialisation et réseau
+DEADLINE_ESTIMATE_TTL = float(os.environ.get('DEADLINE_ESTIMATE_TTL', '30'))  # s : latence non remesurée ignorée
+
+ALLOWED_FORMATS = ['jpg', 'jpeg', 'png', 'webp', 'bmp', 'gif']
+TORCH_INTRAOP_THREADS = int(os.environ.get('TORCH_INTRAOP_THREADS', '0'))  # 0 = automatique
+
+# Métriques Prometheus : METRICS_STAGE_TIMERS=0 retire les histogrammes de durée par étape ; compteurs de requêtes,
+# durée HTTP et erreurs par étape restent toujours actifs
+METRICS_STAGE_TIMERS = os.environ.get('METRICS_STAGE_TIMERS', '1') != '0'
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Compteur Prometheus (valeurs par combinaison de labels)"""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Histogramme Prometheus à seaux fixes (valeurs par combinaison de labels)"""
+
+    def __init__(self, name, help_text, label_names=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [comptes par seau (+Inf compris), somme]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, [('le', le)])} {cumulative}")
+                suffix = _format_labels(self.label_names, labels)
+                lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+                lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Métriques exposées sur /metrics : compteurs, histogrammes et jauges calculées à la lecture"""
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []  # (nom, aide, noms des labels, fonction -> {labels: valeur})
+
+    def counter(self, name, help_text, label_names=()):
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, label_names=(), buckets=METRICS_BUCKETS):
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, label_names, collect):
+        self._gauges.append((name, help_text, label_names, collect))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, label_names, collect in self._gauges:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge"])
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"⚠️ Jauge {name} indisponible: {e}")
+                continue
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(label_names, labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+stage_latency = metrics.histogram(
+    'image_analysis_stage_duration_seconds', "Durée d'exécution d'une étape d'analyse", ('stage',))
+stage_errors = metrics.counter(
+    'image_analysis_stage_errors_total', "Erreurs par étape d'analyse", ('stage',))
+http_latency = metrics.histogram(
+    'image_analysis_http_request_duration_seconds', "Durée de traitement des requêtes HTTP", ('endpoint',))
+http_requests = metrics.counter(
+    'image_analysis_http_requests_total', "Requêtes HTTP par endpoint et code de réponse", ('endpoint', 'code'))
+
+def instrument_stage(stage):
+    """Décorateur : durée et erreurs de l'étape ; erreurs seulement (sans chronomètre) si METRICS_STAGE_TIMERS=0"""
+    def decorate(fn):
+        if not METRICS_STAGE_TIMERS:
+            @wraps(fn)
+            def counted(*args, **kwargs):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    stage_errors.inc(stage)
+                    raise
+            return counted
         
-        # Charger les pipelines de traduction (plus simple que MarianMT)
-        logger.info("Chargement des pipelines de traduction IA...")
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                stage_errors.inc(stage)
+                raise
+            finally:
+                stage_latency.observe(time.perf_counter() - started, stage)
+        return timed
+    return decorate
+
+def record_stage_error(stage):
+    """Compter une erreur gérée sans exception (résultat de repli)"""
+    stage_errors.inc(stage)
+
+# Modèles de traduction (clé de pipeline -> tâche, modèle et repli éventuel)
+TRANSLATION_MODELS = {
+    'en-fr': {
+        'task': "translation_en_to_fr", 'model_id': "Helsinki-NLP/opus-mt-en-fr",
+        'fallback': {'task': "translation", 'model_id': "t5-small"}
+    },
+    'en-ar': {'task': "translation_en_to_ar", 'model_id': "Helsinki-NLP/opus-mt-en-ar"},
+}
+
+translation_model_ids = {}  # pipeline -> modèle effectivement chargé (repli compris)
+inference_backends = {}  # modèle -> backend effectivement utilisé
+
+def process_rss_bytes():
+    """Mémoire résidente actuelle du processus (octets, 0 si indisponible)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # pic, faute de mieux
+    except ImportError:
+        return 0
+
+def release_memory():
+    """Rendre au système la mémoire libérée par un modèle déchargé"""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def _tensor_nbytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):  # poids int8 empaquetés
+        return sum(_tensor_nbytes(v) for v in value)
+    return 0
+
+def model_nbytes(obj):
+    """Taille estimée des poids d'un modèle chargé (tuple processor/modèle, pipeline, ViT exporté)"""
+    if isinstance(obj, (tuple, list)):
+        return sum(model_nbytes(o) for o in obj)
+    if isinstance(obj, torch.nn.Module):
+        return sum(_tensor_nbytes(v) for v in obj.state_dict().values())
+    if getattr(obj, 'model', None) is not None:  # pipeline de traduction
+        return model_nbytes(obj.model)
+    return getattr(obj, 'nbytes', 0)
+
+class ModelEntry:
+    """État d'un modèle du registre"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.value = None
+        self.state = 'unloaded'  # unloaded | loading | loaded | error
+        self.error = None
+        self.failed_at = 0.0
+        self.nbytes = 0
+        self.rss_delta = 0
+        self.load_seconds = None
+        self.loads = 0
+        self.in_use = 0
+        self.last_used = None
+        self.load_lock = threading.Lock()
+
+class ModelRegistry:
+    """Registre des modèles : chargement au premier usage, budget mémoire et déchargement LRU des modèles inactifs"""
+
+    def __init__(self, budget_bytes=0, retry_after=MODEL_RETRY_AFTER):
+        self.budget_bytes = budget_bytes
+        self.retry_after = retry_after
+        self._entries = OrderedDict()  # ordre LRU : le moins récemment utilisé en tête
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        self._entries[name] = ModelEntry(name, loader)
+
+    def names(self):
+        return list(self._entries)
+
+    def is_loaded(self, name):
+        return self._entries[name].state == 'loaded'
+
+    def is_failed(self, name):
+        """Vrai si le dernier chargement a échoué récemment (pas de nouvelle tentative avant retry_after)"""
+        entry = self._entries[name]
+        return entry.state == 'error' and time.time() - entry.failed_at < self.retry_after
+
+    def get(self, name):
+        """Retourner le modèle sans le réserver (il reste déchargeable une fois retourné)"""
+        entry, value = self._acquire(name)
+        self._release(entry)
+        return value
+
+    @contextmanager
+    def use(self, name):
+        """Réserver le modèle (chargé si nécessaire) pendant son utilisation ; lève l'erreur de chargement"""
+        entry, value = self._acquire(name)
+        try:
+            yield value
+        finally:
+            self._release(entry)
+
+    def _acquire(self, name):
+        # Réservé sous le verrou du registre avant tout chargement : aucun _enforce_budget
+        # d'un autre thread ne peut le décharger entre la fin de _load et son utilisation
+        entry = self._entries[name]
+        with self._lock:
+            entry.in_use += 1
+            self._entries.move_to_end(name)
+        try:
+            with entry.load_lock:
+                if entry.value is None:
+                    self._load(entry)
+                with self._lock:
+                    value = entry.value
+        except BaseException:
+            self._release(entry)
+            raise
+        return entry, value
+
+    def _release(self, entry):
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.time()
+            over_budget = self.budget_bytes and self.loaded_bytes() > self.budget_bytes
+        if over_budget:  # un modèle réservé pendant un chargement précédent est redevenu déchargeable
+            self._enforce_budget(keep=entry.name, warn=False)
+
+    def _load(self, entry):
+        if self.is_failed(entry.name):
+            raise RuntimeError(f"Modèle {entry.name} indisponible: {entry.error}")
         
+        logger.info(f"🔄 Chargement du modèle {entry.name}...")
+        entry.state = 'loading'
+        rss_before = process_rss_bytes()
+        started = time.perf_counter()
         try:
-            # Pipeline Anglais -> Français
-            translation_pipelines['en-fr'] = pipeline(
-                "translation_en_to_fr", 
-                model="Helsinki-NLP/opus-mt-en-fr",
-                device=-1  # CPU, utiliser device=0 pour GPU
-            )
-            logger.info("✅ Pipeline EN->FR chargé")
+            value = entry.loader()
         except Exception as e:
-            logger.warning(f"⚠️ Erreur pipeline EN->FR: {e}")
-            # Fallback à un modèle plus léger
-            try:
-                translation_pipelines['en-fr'] = pipeline(
-                    "translation", 
-                    model="t5-small",
-                    tokenizer="t5-small",
-                    framework="pt"
-                )
-                logger.info("✅ Pipeline T5-small (EN->FR) chargé comme fallback")
-            except Exception as e2:
-                logger.error(f"❌ Erreur fallback EN->FR: {e2}")
+            entry.state, entry.error, entry.failed_at = 'error', str(e), time.time()
+            logger.error(f"❌ Erreur chargement {entry.name}: {e}")
+            raise
         
+        entry.value = value
+        entry.state, entry.error = 'loaded', None
+        entry.nbytes = model_nbytes(value)
+        entry.rss_delta = max(0, process_rss_bytes() - rss_before)
+        entry.load_seconds = round(time.perf_counter() - started, 2)
+        entry.loads += 1
+        entry.last_used = time.time()
+        logger.info(f"✅ {entry.name} chargé en {entry.load_seconds}s ({entry.nbytes / 1e6:.0f} Mo)")
+        self._enforce_budget(keep=entry.name)
+
+    def _enforce_budget(self, keep, warn=True):
+        """Décharger les modèles inactifs les moins récemment utilisés tant que le budget est dépassé"""
+        if not self.budget_bytes:
+            return
+        evicted = []
+        with self._lock:
+            while self.loaded_bytes() > self.budget_bytes:
+                idle = [e for e in self._entries.values()
+                        if e.state == 'loaded' and e.in_use == 0 and e.name != keep]
+                if not idle:
+                    if warn:
+                        logger.warning(f"⚠️ Budget mémoire des modèles dépassé "
+                                       f"({self.loaded_bytes() / 1e6:.0f}/{self.budget_bytes / 1e6:.0f} Mo), "
+                                       f"aucun modèle inactif à décharger")
+                    break
+                self._unload(idle[0])
+                evicted.append(idle[0].name)
+        if evicted:
+            release_memory()
+            logger.info(f"♻️ Modèles déchargés (budget mémoire): {', '.join(evicted)}")
+
+    def _unload(self, entry):
+        entry.value = None
+        entry.state = 'unloaded'
+
+    def unload(self, name):
+        """Décharger un modèle inactif ; retourne False s'il est en cours d'utilisation"""
+        entry = self._entries[name]
+        with self._lock:
+            if entry.in_use or entry.state != 'loaded':
+                return False
+            self._unload(entry)
+        release_memory()
+        return True
+
+    def loaded_bytes(self):
+        return sum(e.nbytes for e in self._entries.values() if e.state == 'loaded')
+
+    def preload(self, names):
+        """Charger les modèles indiqués (avant un fork, pour partager les poids en copie-sur-écriture)"""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                pass  # état 'error' déjà enregistré et journalisé
+
+    def stats(self):
+        now = time.time()
+        models = {}
+        for name, entry in list(self._entries.items()):
+            models[name] = {
+                'state': entry.state,
+                'weights_bytes': entry.nbytes if entry.state == 'loaded' else 0,
+                'rss_delta_bytes': entry.rss_delta if entry.state == 'loaded' else 0,
+                'load_seconds': entry.load_seconds,
+                'loads': entry.loads,
+                'in_use': entry.in_use,
+                'idle_seconds': round(now - entry.last_used, 1) if entry.last_used else None,
+                'error': entry.error
+            }
+        return {
+            'budget_bytes': self.budget_bytes,
+            'loaded_bytes': self.loaded_bytes(),
+            'process_rss_bytes': process_rss_bytes(),
+            'models': models
+        }
+
+def blip_model_name(model_id=BLIP_MODEL_ID):
+    """Nom d'un modèle BLIP dans le registre"""
+    return f"blip:{model_id}"
+
+def translation_model_name(pipeline_key):
+    """Nom d'un pipeline de traduction dans le registre"""
+    return f"translation:{pipeline_key}"
+
+def _load_blip(model_id):
+    processor = BlipProcessor.from_pretrained(model_id)
+    model = BlipForConditionalGeneration.from_pretrained(model_id).eval()
+    return processor, convert_blip_model(INFERENCE_BACKEND, model)
+
+def _load_vit():
+    processor = ViTImageProcessor.from_pretrained(VIT_MODEL_ID)
+    model = ViTForImageClassification.from_pretrained(VIT_MODEL_ID).eval()
+    return processor, convert_vit_model(INFERENCE_BACKEND, model)
+
+def create_translation_pipeline(pipeline_key):
+    """Créer le pipeline de traduction fp32 (plus simple que MarianMT), avec repli éventuel"""
+    spec = TRANSLATION_MODELS[pipeline_key]
+    try:
+        pipeline_obj = pipeline(spec['task'], model=spec['model_id'], device=-1)  # CPU, device=0 pour GPU
+        translation_model_ids[pipeline_key] = spec['model_id']
+    except Exception as e:
+        fallback = spec.get('fallback')
+        if not fallback:
+            raise
+        logger.warning(f"⚠️ Erreur pipeline {pipeline_key}: {e}, repli sur {fallback['model_id']}")
+        pipeline_obj = pipeline(
+            fallback['task'],
+            model=fallback['model_id'],
+            tokenizer=fallback['model_id'],
+            framework="pt"
+        )
+        translation_model_ids[pipeline_key] = fallback['model_id']
+    return pipeline_obj
+
+def _load_translation(pipeline_key):
+    return convert_translation_pipeline(INFERENCE_BACKEND, pipeline_key, create_translation_pipeline(pipeline_key))
+
+model_registry = ModelRegistry(MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+for _model_id in dict.fromkeys(p['model_id'] for p in CAPTION_PROFILES.values()):
+    model_registry.register(blip_model_name(_model_id), partial(_load_blip, _model_id))
+model_registry.register('vit', _load_vit)
+for _pipeline_key in TRANSLATION_MODELS:
+    model_registry.register(translation_model_name(_pipeline_key), partial(_load_translation, _pipeline_key))
+
+def default_model_names():
+    """Modèles utilisés par le profil par défaut (préchargés par PRELOAD_MODELS=1)"""
+    return [
+        blip_model_name(CAPTION_PROFILES[DEFAULT_CAPTION_PROFILE]['model_id']),
+        'vit',
+        *(translation_model_name(key) for key in TRANSLATION_MODELS)
+    ]
+
+def preload_models(names=None):
+    """Charger les modèles par défaut (ou ceux indiqués) sans attendre la première requête"""
+    model_registry.preload(names or default_model_names())
+
+# État de service du processus (readiness) : préchargement / warmup en cours, arrêt en cours
+serving_state = {'warming_up': False, 'draining': False, 'warmup_seconds': None}
+
+def start_background_preload():
+    """Précharger les modèles dans un thread ; le processus n'est pas « ready » avant la fin"""
+    def run():
         try:
-            # Pipeline Anglais -> Arabe
-            translation_pipelines['en-ar'] = pipeline(
-                "translation_en_to_ar",
-                model="Helsinki-NLP/opus-mt-en-ar",
-                device=-1
-            )
-            logger.info("✅ Pipeline EN->AR chargé")
+            preload_models()
+        finally:
+            serving_state['warming_up'] = False
+    
+    serving_state['warming_up'] = True
+    threading.Thread(target=run, daemon=True).start()
+
+def translation_available(pipeline_key):
+    """Vrai si le pipeline de traduction est chargé ou chargeable (pas d'échec récent)"""
+    return not model_registry.is_failed(translation_model_name(pipeline_key))
+
+def loaded_translation_pipelines():
+    return [key for key in TRANSLATION_MODELS if model_registry.is_loaded(translation_model_name(key))]
+
+def quantize_int8(model):
+    """Quantification dynamique int8 des couches linéaires (copie du modèle)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def vit_logits_and_embeddings(model, pixel_values):
+    """Logits et représentation poolée (jeton CLS après la dernière normalisation, entrée du classifieur)"""
+    if isinstance(model, ExportedViT):
+        outputs = model(pixel_values=pixel_values)
+        return outputs.logits, outputs.embeddings
+    embeddings = model.vit(pixel_values=pixel_values).last_hidden_state[:, 0, :]
+    return model.classifier(embeddings), embeddings
+
+class _ViTExportWrapper(torch.nn.Module):
+    """Enveloppe exportable : pixel_values -> (logits, embeddings)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return vit_logits_and_embeddings(self.model, pixel_values)
+
+class ExportedViT:
+    """ViT exporté (TorchScript / ONNX Runtime) avec l'interface utilisée par analyze_with_vit_batch"""
+
+    def __init__(self, run, config, backend):
+        self._run = run
+        self.config = config
+        self.backend = backend
+
+    def __call__(self, pixel_values, **kwargs):
+        logits, embeddings = self._run(pixel_values)
+        return SimpleNamespace(logits=logits, embeddings=embeddings)
+
+# Les exports produisent aussi les embeddings : nom distinct des anciens fichiers (logits seuls)
+VIT_EXPORT_FILES = {'torchscript': 'vit-embeddings.torchscript.pt', 'onnx': 'vit-embeddings.onnx'}
+
+def export_vit(model, backend, export_dir=EXPORT_DIR):
+    """Exporter ViT en TorchScript ou ONNX ; retourne le chemin du fichier"""
+    os.makedirs(export_dir, exist_ok=True)
+    wrapper = _ViTExportWrapper(model).eval()
+    size = model.config.image_size
+    dummy = torch.zeros(1, 3, size, size)
+    
+    if backend == 'torchscript':
+        path = os.path.join(export_dir, VIT_EXPORT_FILES[backend])
+        with torch.no_grad():
+            torch.jit.save(torch.jit.trace(wrapper, dummy), path)
+    elif backend == 'onnx':
+        path = os.path.join(export_dir, VIT_EXPORT_FILES[backend])
+        torch.onnx.export(
+            wrapper, (dummy,), path,
+            input_names=['pixel_values'], output_names=['logits', 'embeddings'],
+            dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}, 'embeddings': {0: 'batch'}},
+            opset_version=14
+        )
+    else:
+        raise ValueError(f"Backend d'export non supporté: {backend}")
+    
+    logger.info(f"📦 ViT exporté ({backend}): {path}")
+    return path
+
+def load_exported_vit(backend, model, export_dir=EXPORT_DIR):
+    """Charger le ViT exporté (l'exporter d'abord depuis le modèle eager si absent)"""
+    path = os.path.join(export_dir, VIT_EXPORT_FILES.get(backend, VIT_EXPORT_FILES['onnx']))
+    if not os.path.exists(path):
+        export_vit(model, backend, export_dir)
+    
+    if backend == 'torchscript':
+        module = torch.jit.optimize_for_inference(torch.jit.load(path).eval())
+        return ExportedViT(module, model.config, backend)
+    
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = torch.get_num_threads()
+    session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    
+    def run(pixel_values):
+        logits, embeddings = session.run(['logits', 'embeddings'], {'pixel_values': pixel_values.numpy()})
+        return torch.from_numpy(logits), torch.from_numpy(embeddings)
+    
+    return ExportedViT(run, model.config, backend)
+
+def _resolve_backend(backend):
+    if backend not in INFERENCE_BACKENDS:
+        logger.warning(f"⚠️ Backend inconnu '{backend}', utilisation de eager")
+        return 'eager'
+    return backend
+
+def convert_blip_model(backend, blip):
+    """Convertir BLIP vers le backend demandé (repli sur eager en cas d'échec)"""
+    inference_backends['blip'] = 'eager'
+    if _resolve_backend(backend) == 'eager':
+        return blip
+    
+    # La génération BLIP (beam search) n'est pas exportable en un seul graphe : int8 pour tous les backends
+    try:
+        blip = quantize_int8(blip)
+        inference_backends['blip'] = 'int8'
+    except Exception as e:
+        logger.warning(f"⚠️ Quantification BLIP impossible: {e}")
+    logger.info(f"⚙️ Backend d'inférence BLIP: {inference_backends['blip']}")
+    return blip
+
+def convert_vit_model(backend, vit):
+    """Convertir ViT vers le backend demandé (repli sur eager en cas d'échec)"""
+    backend = _resolve_backend(backend)
+    inference_backends['vit'] = 'eager'
+    if backend == 'eager':
+        return vit
+    
+    try:
+        vit = quantize_int8(vit) if backend == 'int8' else load_exported_vit(backend, vit)
+        inference_backends['vit'] = backend
+    except Exception as e:
+        logger.warning(f"⚠️ Backend {backend} indisponible pour ViT: {e}")
+    logger.info(f"⚙️ Backend d'inférence ViT: {inference_backends['vit']}")
+    return vit
+
+def convert_translation_pipeline(backend, key, pipeline_obj):
+    """Retourner le pipeline de traduction pour le backend demandé (l'original pour eager ou en cas d'échec)"""
+    inference_backends[key] = 'eager'
+    if _resolve_backend(backend) == 'eager':
+        return pipeline_obj
+    
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            ort_model = ORTModelForSeq2SeqLM.from_pretrained(translation_model_ids.get(key), export=True)
+            inference_backends[key] = 'onnx'
+            return pipeline(pipeline_obj.task, model=ort_model, tokenizer=pipeline_obj.tokenizer)
         except Exception as e:
-            logger.warning(f"⚠️ Erreur pipeline EN->AR: {e}")
-        
-        logger.info("🎉 Tous les modèles IA chargés avec succès")
-        
+            logger.warning(f"⚠️ ONNX indisponible pour {key} ({e}), repli sur int8")
+    
+    # TorchScript ne couvre pas la boucle de génération : int8
+    try:
+        converted = pipeline(
+            pipeline_obj.task,
+            model=quantize_int8(pipeline_obj.model),
+            tokenizer=pipeline_obj.tokenizer
+        )
+        inference_backends[key] = 'int8'
+        return converted
     except Exception as e:
-        logger.error(f"❌ Erreur chargement modèles: {e}")
+        logger.warning(f"⚠️ Quantification {key} impossible: {e}")
+        return pipeline_obj
+
+def _synthetic_images():
+    """Images de contrôle générées (sans fichier) pour la vérification des backends"""
+    size = (384, 384)
+    gradient = Image.linear_gradient('L').resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    return [
+        Image.effect_mandelbrot(size, (-2.0, -1.5, 1.0, 1.5), 100).convert('RGB'),
+        Image.merge('RGB', (gradient, radial, gradient.rotate(90))),
+        Image.merge('RGB', (radial, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), radial)),
+        Image.effect_noise(size, 64).convert('RGB'),
+    ]
+
+def _load_verification_images(images_dir):
+    if not images_dir:
+        return _synthetic_images()
+    images = []
+    for filename in sorted(os.listdir(images_dir)):
+        if is_allowed_filename(filename):
+            images.append(decode_image(os.path.join(images_dir, filename)))
+    return images
+
+def verify_inference_backend(backend, images_dir=None, min_top1_agreement=0.9):
+    """Comparer les sorties du backend avec les modèles fp32 ; retourne le rapport (dict)"""
+    blip_processor = BlipProcessor.from_pretrained(BLIP_MODEL_ID)
+    vit_processor = ViTImageProcessor.from_pretrained(VIT_MODEL_ID)
+    ref_blip = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_ID).eval()
+    ref_vit = ViTForImageClassification.from_pretrained(VIT_MODEL_ID).eval()
+    cand_blip = convert_blip_model(backend, ref_blip)
+    cand_vit = convert_vit_model(backend, ref_vit)
+    images = _load_verification_images(images_dir)
     
-    translation_models_loading = False
+    with torch.no_grad():
+        pixel_values = vit_processor(images=images, return_tensors="pt")['pixel_values']
+        ref_probs = torch.softmax(ref_vit(pixel_values=pixel_values).logits, dim=-1)
+        cand_probs = torch.softmax(cand_vit(pixel_values=pixel_values).logits, dim=-1)
+        
+        blip_inputs = blip_processor(images=images, return_tensors="pt")
+        ref_captions = blip_processor.batch_decode(
+            ref_blip.generate(**blip_inputs, max_length=100, num_beams=5), skip_special_tokens=True)
+        cand_captions = blip_processor.batch_decode(
+            cand_blip.generate(**blip_inputs, max_length=100, num_beams=5), skip_special_tokens=True)
+    
+    ref_top5 = torch.topk(ref_probs, 5).indices
+    cand_top5 = torch.topk(cand_probs, 5).indices
+    top1_agreement = (ref_top5[:, 0] == cand_top5[:, 0]).float().mean().item()
+    top5_overlap = sum(
+        len(set(r.tolist()) & set(c.tolist())) / 5 for r, c in zip(ref_top5, cand_top5)
+    ) / len(images)
+    
+    report = {
+        'backend': backend,
+        'effective_backends': dict(inference_backends),
+        'images': len(images),
+        'vit': {
+            'top1_agreement': round(top1_agreement, 4),
+            'top5_overlap': round(top5_overlap, 4),
+            'max_prob_diff': round((ref_probs - cand_probs).abs().max().item(), 6)
+        },
+        'blip': {
+            'caption_match_rate': round(sum(r == c for r, c in zip(ref_captions, cand_captions)) / len(images), 4),
+            'samples': [{'fp32': r, backend: c} for r, c in zip(ref_captions, cand_captions)]
+        }
+    }
+    
+    # Traductions : comparer sur un échantillon de labels ViT
+    labels = [ref_vit.config.id2label[i] for i in range(0, len(ref_vit.config.id2label), 50)]
+    report['translation'] = {}
+    for key in TRANSLATION_MODELS:
+        try:
+            ref_pipeline = create_translation_pipeline(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Pipeline {key} indisponible: {e}")
+            continue
+        cand_pipeline = convert_translation_pipeline(backend, key, ref_pipeline)
+        if cand_pipeline is ref_pipeline:
+            continue
+        ref_out = [o['translation_text'] for o in ref_pipeline(labels, max_length=100)]
+        cand_out = [o['translation_text'] for o in cand_pipeline(labels, max_length=100)]
+        report['translation'][key] = {
+            'match_rate': round(sum(r == c for r, c in zip(ref_out, cand_out)) / len(labels), 4)
+        }
+    
+    report['passed'] = top1_agreement >= min_top1_agreement
+    return report
+
+def verify_preprocessing(images_dir=None, max_mean_error=0.01, max_abs_error=0.15):
+    """Comparer preprocess_batch aux processors HF (BLIP et ViT) ; retourne le rapport (dict)"""
+    blip_processor = BlipProcessor.from_pretrained(BLIP_MODEL_ID)
+    vit_processor = ViTImageProcessor.from_pretrained(VIT_MODEL_ID)
+    images = _load_verification_images(images_dir)
+    # Couvrir aussi l'agrandissement et la taille exacte des modèles
+    images += [images[0].resize((200, 150)), images[0].resize((384, 384)), images[0].resize((224, 224))]
+    arrays = [image_to_array(image) for image in images]
+    
+    report = {'images': len(images), 'passed': True}
+    for name, processor in (('blip', blip_processor.image_processor), ('vit', vit_processor)):
+        reference = processor(images=images, return_tensors="pt")['pixel_values']
+        candidate = preprocess_batch(arrays, get_preprocess_spec(name, processor))
+        diff = (reference - candidate).abs()
+        report[name] = {
+            'shape': list(candidate.shape),
+            'mean_abs_error': round(diff.mean().item(), 6),
+            'max_abs_error': round(diff.max().item(), 6)
+        }
+        report['passed'] &= diff.mean().item() <= max_mean_error and diff.max().item() <= max_abs_error
+    return report
 
-# Démarrer le chargement asynchrone des modèles
-threading.Thread(target=load_models_async, daemon=True).start()
+# Précharger en arrière-plan les modèles du profil par défaut (sinon : chargement au premier usage)
+if __name__ != '__main__' and PRELOAD_MODELS:
+    start_background_preload()
 
 # Dictionnaires de traduction
 TRANSLATIONS = {
@@ -111,7 +923,67 @@ TRANSLATIONS = {
         'architectural_elements': "Éléments architecturaux structurés",
         'suitable_for': "Adapté pour",
         'professional_use': "Usage professionnel",
-        'high_quality': "Haute qualité"
+        'high_quality': "Haute qualité",
+        # Rapport : textes, ponctuation et dictionnaires de repli (repris par le moteur de rapports)
+        'translation_pipeline': 'en-fr',
+        'direction': 'ltr',
+        'report_title': "RAPPORT COMPLET D'ANALYSE D'IMAGE",
+        'ai_description': "Description IA : ",
+        'confidence': "confiance",
+        'pixels': "pixels",
+        'field_separator': " : ",
+        'heading_suffix': " :",
+        'brightness_levels': ("Élevé", "Moyen", "Faible"),
+        'default_description': "Image contenant divers éléments visuels",
+        'capitalize_caption': True,
+        'landscape_depth': "Paysage panoramique avec profondeur de champ",
+        'human_focus': "Présence d'éléments humains comme point focal",
+        'nature_uses': ("Présentations environnementales", "Arrière-plans naturels"),
+        'urban_uses': ("Projets urbains", "Design architectural"),
+        'general_uses': ("Usage professionnel", "Impression et affichage numérique"),
+        'compositions': {
+            'horizontal': "Composition horizontale avec lignes fortes",
+            'vertical': "Composition verticale avec éléments élancés",
+            'balanced': "Composition équilibrée et géométrique",
+            'panoramic': "Paysage panoramique ouvert",
+            'organic': "Composition fluide et organique"
+        },
+        'caption_phrases': {
+            "a man with a stick in his hand in the jungle": "Un homme tenant un bâton dans sa main dans la jungle",
+            "in his hand": "dans sa main",
+            "in the jungle": "dans la jungle",
+            "with a stick": "tenant un bâton",
+            "a man": "un homme",
+        },
+        'labels': {
+            "building": "Bâtiment",
+            "street": "Rue",
+            "city": "Ville",
+            "landscape": "Paysage",
+            "mountain": "Montagne",
+            "beach": "Plage",
+            "forest": "Forêt",
+            "person": "Personne",
+            "car": "Voiture",
+            "animal": "Animal",
+            "tree": "Arbre",
+            "water": "Eau",
+            "sky": "Ciel",
+            "food": "Nourriture",
+            "indoor": "Intérieur",
+            "outdoor": "Extérieur",
+            "zebra": "Zèbre",
+            "gazelle": "Gazelle",
+            "impala": "Impala",
+            "giraffe": "Girafe",
+            "comic book": "Bande dessinée",
+            "book jacket": "Couverture de livre",
+            "dust cover": "Couverture protectrice",
+            "dust jacket": "Couverture de livre",
+            "dust wrapper": "Emballage protecteur",
+            "bow": "Arc",
+            "book": "Livre"
+        }
     },
     'ar': {
         'technical_analysis': "التحليل الفني",
@@ -131,7 +1003,66 @@ TRANSLATIONS = {
         'architectural_elements': "عناصر معمارية بتصميم منظم",
         'suitable_for': "مناسب لـ",
         'professional_use': "الاستخدام المهني",
-        'high_quality': "جودة عالية"
+        'high_quality': "جودة عالية",
+        'translation_pipeline': 'en-ar',
+        'direction': 'rtl',
+        'report_title': "التقرير الشامل لتحليل الصورة",
+        'ai_description': "الوصف بالذكاء الاصطناعي: ",
+        'confidence': "ثقة",
+        'pixels': "بكسل",
+        'field_separator': " : ",
+        'heading_suffix': ":",
+        'brightness_levels': ("مرتفع", "متوسط", "منخفض"),
+        'default_description': "صورة تحتوي على عناصر بصرية متنوعة",
+        'capitalize_caption': False,
+        'landscape_depth': "منظر طبيعي بانورامي بعمق مجالي",
+        'human_focus': "وجود عناصر بشرية كمركز الاهتمام",
+        'nature_uses': ("عروض بيئية", "خلفيات طبيعية"),
+        'urban_uses': ("مشاريع عمرانية", "تصميم معماري"),
+        'general_uses': ("استخدام مهني", "طباعة وعرض رقمي"),
+        'compositions': {
+            'horizontal': "تركيب أفقي مع خطوط قوية",
+            'vertical': "تركيب عمودي مع عناصر رفيعة",
+            'balanced': "تركيب متوازن وهندسي",
+            'panoramic': "منظر طبيعي بانورامي مفتوح",
+            'organic': "تركيب سائل وعضوي"
+        },
+        'caption_phrases': {
+            "a man with a stick in his hand in the jungle": "رجل يحمل عصا في يده في الغابة",
+            "in his hand": "في يده",
+            "in the jungle": "في الغابة",
+            "with a stick": "يحمل عصا",
+            "a man": "رجل",
+        },
+        'labels': {
+            "building": "مبنى",
+            "street": "شارع",
+            "city": "مدينة",
+            "landscape": "منظر طبيعي",
+            "mountain": "جبل",
+            "beach": "شاطئ",
+            "forest": "غابة",
+            "person": "شخص",
+            "car": "سيارة",
+            "animal": "حيوان",
+            "tree": "شجرة",
+            "water": "ماء",
+            "sky": "سماء",
+            "food": "طعام",
+            "indoor": "داخلي",
+            "outdoor": "خارجي",
+            "zebra": "حمار وحشي",
+            "gazelle": "غزال",
+            "impala": "إمبالا",
+            "giraffe": "زرافة",
+            "comic book": "كتاب مصور",
+            "book jacket": "غلاف كتاب",
+            "dust cover": "غطاء واقي",
+            "dust jacket": "غلاف كتاب",
+            "dust wrapper": "غلاف واقي",
+            "bow": "قوس",
+            "book": "كتاب"
+        }
     },
     'en': {
         'technical_analysis': "Technical Analysis",
@@ -151,119 +1082,822 @@ TRANSLATIONS = {
         'architectural_elements': "Structured architectural elements",
         'suitable_for': "Suitable for",
         'professional_use': "Professional use",
-        'high_quality': "High quality"
+        'high_quality': "High quality",
+        # Langue des modèles : ni traduction ni dictionnaire de repli
+        'translation_pipeline': None,
+        'direction': 'ltr',
+        'report_title': "COMPREHENSIVE IMAGE ANALYSIS REPORT",
+        'ai_description': "AI Description: ",
+        'confidence': "confidence",
+        'pixels': "pixels",
+        'field_separator': ": ",
+        'heading_suffix': ":",
+        'brightness_levels': ("High", "Medium", "Low"),
+        'default_description': "Image containing various visual elements",
+        'capitalize_caption': False,
+        'landscape_depth': "Panoramic landscape with field depth",
+        'human_focus': "Human elements as focal point",
+        'nature_uses': ("Environmental presentations", "Natural backgrounds"),
+        'urban_uses': ("Urban projects", "Architectural design"),
+        'general_uses': ("Professional use", "Print and digital display"),
+        'compositions': {
+            'horizontal': "Horizontal composition with strong lines",
+            'vertical': "Vertical composition with slender elements",
+            'balanced': "Balanced and geometric composition",
+            'panoramic': "Open panoramic landscape",
+            'organic': "Fluid and organic composition"
+        },
+        'caption_phrases': {},
+        'labels': {}
     }
 }
 
-def translate_with_ia(text, target_lang='fr'):
-    """Traduire du texte avec IA"""
-    try:
-        if not text or text.strip() == "":
-            return text
-        
-        if target_lang == 'en':
-            return text
-        
-        # Déterminer la clé du pipeline
-        if target_lang == 'fr':
-            pipeline_key = 'en-fr'
-        elif target_lang == 'ar':
-            pipeline_key = 'en-ar'
-        else:
-            return text
-        
-        # Vérifier si le pipeline est chargé
-        if pipeline_key not in translation_pipelines:
-            logger.warning(f"Pipeline {pipeline_key} non chargé")
-            return text
-        
-        # Traduire avec le pipeline
-        pipeline_obj = translation_pipelines[pipeline_key]
-        
-        # Utiliser le bon format selon le modèle
-        if pipeline_key == 'en-fr' and 't5' in str(pipeline_obj.model.__class__).lower():
-            # Format pour T5
-            input_text = f"translate English to French: {text}"
-            result = pipeline_obj(input_text, max_length=100)[0]['translation_text']
+class TranslationMemo:
+    """Mémo persistant des traductions IA (dictionnaire en mémoire + sqlite)
+    
+    Les entrées sont lues à la création puis la connexion est refermée : les processus forkés (workers
+    gunicorn, pool de analyze-dir) partagent le dictionnaire, et chacun ouvre sa propre connexion à sa
+    première écriture (une connexion sqlite ne doit pas traverser un fork).
+    """
+
+    def __init__(self, db_path=TRANSLATION_MEMO_DB):
+        self._memo = {}  # (modèle, texte source) -> traduction
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._db = None
+        self._db_pid = None
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            self._load()
+
+    def _open(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")  # écritures concurrentes de plusieurs processus
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS translation_memo "
+            "(model TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, PRIMARY KEY (model, source))"
+        )
+        db.commit()
+        return db
+
+    def _load(self):
+        try:
+            db = self._open()
+            try:
+                for model, source, target in db.execute("SELECT model, source, target FROM translation_memo"):
+                    self._memo[(model, source)] = target
+            finally:
+                db.close()
+            logger.info(f"✅ Mémo de traduction: {len(self._memo)} entrées ({self.db_path})")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Mémo de traduction non persistant ({self.db_path}): {e}")
+            self.db_path = ''
+
+    def _connection(self):
+        """Connexion sqlite de ce processus, ouverte au premier usage (appelée sous self._lock)"""
+        if self.db_path and self._db_pid != os.getpid():
+            self._db_pid = os.getpid()
+            try:
+                self._db = self._open()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Mémo de traduction non persistant ({self.db_path}): {e}")
+                self._db = None
+        return self._db
+
+    def get(self, model_id, text):
+        with self._lock:
+            result = self._memo.get((model_id, text))
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put_many(self, model_id, pairs):
+        pairs = list(pairs)
+        with self._lock:
+            for source, target in pairs:
+                self._memo[(model_id, source)] = target
+            db = self._connection()
+            if db is None:
+                return
+            try:
+                db.executemany(
+                    "INSERT OR REPLACE INTO translation_memo (model, source, target) VALUES (?, ?, ?)",
+                    [(model_id, source, target) for source, target in pairs]
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Écriture mémo de traduction: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._memo),
+                'hits': self.hits,
+                'misses': self.misses,
+                'persistent': bool(self.db_path)
+            }
+
+translation_memo = TranslationMemo()
+
+@instrument_stage('translation')
+def translate_batch(texts, target_lang='fr'):
+    """Traduire plusieurs textes : déduplication, mémo, puis un seul appel pipeline pour les manquants"""
+    results = {text: text for text in texts if text is not None}
+    
+    # Déterminer la clé du pipeline
+    pipeline_key = TRANSLATIONS.get(target_lang, {}).get('translation_pipeline')
+    if pipeline_key is None:
+        return results
+    
+    # Vérifier si le pipeline est disponible (il est chargé à la première traduction)
+    if not translation_available(pipeline_key):
+        logger.warning(f"Pipeline {pipeline_key} indisponible")
+        return results
+    
+    model_id = translation_model_ids.get(pipeline_key, TRANSLATION_MODELS[pipeline_key]['model_id'])
+    
+    missing = []
+    for text in dict.fromkeys(t for t in texts if t and t.strip()):
+        memoized = translation_memo.get(model_id, text)
+        if memoized is None:
+            missing.append(text)
         else:
-            # Format standard pour les pipelines de traduction
-            result = pipeline_obj(text, max_length=100)[0]['translation_text']
-        
-        logger.info(f"✅ Traduction IA: '{text[:50]}...' -> '{result[:50]}...'")
-        return result.strip()
-        
+            results[text] = memoized
+    
+    if not missing:
+        return results
+    
+    try:
+        with model_registry.use(translation_model_name(pipeline_key)) as pipeline_obj:
+            # Utiliser le bon format selon le modèle
+            if pipeline_key == 'en-fr' and 't5' in str(pipeline_obj.model.__class__).lower():
+                inputs = [f"translate English to French: {text}" for text in missing]
+            else:
+                inputs = missing
+            
+            outputs = pipeline_obj(inputs, max_length=100, batch_size=TRANSLATION_BATCH_SIZE)
+        model_id = translation_model_ids.get(pipeline_key, model_id)
+        translated = [output['translation_text'].strip() for output in outputs]
+        translation_memo.put_many(model_id, zip(missing, translated))
+        results.update(zip(missing, translated))
+        logger.info(f"✅ Traduction IA par lot ({pipeline_key}): {len(missing)} textes traduits")
     except Exception as e:
         logger.error(f"❌ Erreur traduction IA: {e}")
+        record_stage_error('translation')
+    
+    return results
+
+def translate_with_ia(text, target_lang='fr'):
+    """Traduire du texte avec IA"""
+    if not text or text.strip() == "":
         return text
+    
+    return translate_batch([text], target_lang).get(text, text)
 
-def analyze_with_blip(image):
-    """Analyser l'image avec BLIP"""
-    try:
-        if blip_model is None:
-            logger.error("BLIP model not loaded")
-            return None
-            
-        inputs = blip_processor(image, return_tensors="pt")
-        with torch.no_grad():
-            out = blip_model.generate(**inputs, max_length=100, num_beams=5)
-        description = blip_processor.decode(out[0], skip_special_tokens=True)
-        logger.info(f"BLIP description: {description}")
-        return description
-    except Exception as e:
-        logger.error(f"Erreur BLIP: {e}")
-        return None
+def precompute_label_translations(languages=('fr', 'ar')):
+    """Remplir le mémo avec la traduction de tous les labels ViT (id2label)"""
+    config = model_registry.get('vit')[1].config if model_registry.is_loaded('vit') else AutoConfig.from_pretrained(VIT_MODEL_ID)
+    labels = [config.id2label[i] for i in sorted(config.id2label)]
+    
+    for language in languages:
+        for start in range(0, len(labels), TRANSLATION_BATCH_SIZE):
+            translate_batch(labels[start:start + TRANSLATION_BATCH_SIZE], language)
+        logger.info(f"✅ {len(labels)} labels ViT pré-traduits ({language})")
 
-def analyze_with_vit(image):
-    """Analyser l'image avec ViT"""
-    try:
-        if vit_model is None:
-            logger.error("ViT model not loaded")
-            return None
-            
-        inputs = vit_processor(image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = vit_model(**inputs)
-        probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        top_prob, top_class = torch.topk(probabilities, 5)
-        
-        results = []
-        for i in range(5):
-            label = vit_model.config.id2label[top_class[0][i].item()]
-            prob = top_prob[0][i].item()
-            results.append({"label": label, "confidence": prob})
-        
-        logger.info(f"ViT results: {results}")
-        return results
-    except Exception as e:
-        logger.error(f"Erreur ViT: {e}")
-        return None
+def _ewma(current, sample, alpha=0.2):
+    """Moyenne glissante exponentielle (la première mesure sert de valeur initiale)"""
+    return sample if current is None else current + alpha * (sample - current)
 
-def analyze_colors_and_composition(image):
-    """Analyser les couleurs et la composition"""
-    try:
-        width, height = image.size
-        small_img = image.resize((100, 100))
-        if small_img.mode != 'RGB':
-            small_img = small_img.convert('RGB')
-        
-        colors = small_img.getcolors(10000)
-        dominant_colors = []
-        if colors:
-            colors.sort(key=lambda x: x[0], reverse=True)
-            for count, color in colors[:5]:
-                hex_color = '#{:02x}{:02x}{:02x}'.format(color[0], color[1], color[2])
-                dominant_colors.append(hex_color)
-        
-        stat = ImageStat.Stat(image)
-        brightness = sum(stat.mean) / 3
-        contrast = sum(stat.stddev) / 3
-        
-        edges = image.filter(ImageFilter.FIND_EDGES)
-        edge_stat = ImageStat.Stat(edges)
-        edge_strength = sum(edge_stat.mean) / 3
-        
-        return {
-            'dominant_colors': dominant_colors,
+class MicroBatcher:
+    """Regrouper les requêtes concurrentes en un seul appel modèle"""
+
+    def __init__(self, name, batch_fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        # Métriques
+        self.batches_run = 0
+        self.items_processed = 0
+        self.last_batch_size = 0
+        self.batch_size_histogram = {}
+        # Moyennes glissantes (s) de l'attente en file et de la durée d'un lot, lues par LoadController
+        self.queue_wait_ewma = None
+        self.batch_latency_ewma = None
+        self.last_observed = None
+
+    def submit(self, item):
+        """Ajouter un élément à la file et retourner un Future"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Attendre le premier élément puis remplir le lot jusqu'à la taille ou au délai max"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [(item, future, submitted) for item, future, submitted in self._collect()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._run_batch(batch)
+            except BaseException as e:
+                # Le thread continue de servir la file : un élément déjà en file n'attendrait aucun worker
+                logger.error(f"❌ Lot {self.name} interrompu ({len(batch)} images): {e!r}")
+            finally:
+                # Aucun Future laissé en attente, quelle que soit l'issue du lot
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.completed_at = time.perf_counter()
+                        future.set_exception(RuntimeError(f'Batch {self.name} interrupted'))
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        queue_wait = sum(started - submitted for _, _, submitted in batch) / len(batch)
+        try:
+            results = list(self.batch_fn([item for item, _, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f'Batch {self.name} returned {len(results)} results for {len(batch)} items')
+        except Exception as e:
+            logger.error(f"❌ Erreur lot {self.name} ({len(batch)} images): {e}")
+            for _, future, _ in batch:
+                future.completed_at = time.perf_counter()
+                future.set_exception(e)
+            return
+
+        completed_at = time.perf_counter()
+        with self._lock:
+            self.queue_wait_ewma = _ewma(self.queue_wait_ewma, queue_wait)
+            self.batch_latency_ewma = _ewma(self.batch_latency_ewma, completed_at - started)
+            self.last_observed = completed_at
+            self.batches_run += 1
+            self.items_processed += len(batch)
+            self.last_batch_size = len(batch)
+            self.batch_size_histogram[len(batch)] = self.batch_size_histogram.get(len(batch), 0) + 1
+
+        for (_, future, _), result in zip(batch, results):
+            future.completed_at = completed_at
+            future.set_result(result)
+
+    def estimate(self, estimate_ttl=DEADLINE_ESTIMATE_TTL):
+        """Durée estimée (s) d'un nouvel élément : lots déjà en file ou attente observée, puis son propre lot
+        
+        None sans mesure, ou si les moyennes sont plus vieilles que estimate_ttl (file délaissée par la
+        dégradation) : une latence périmée n'est pas une estimation.
+        """
+        with self._lock:
+            if self.last_observed is None or time.perf_counter() - self.last_observed > estimate_ttl:
+                return None
+            latency, queue_wait = self.batch_latency_ewma, self.queue_wait_ewma
+        backlog = self._queue.qsize() // self.max_batch_size
+        return max(queue_wait, backlog * latency) + latency
+
+    def stats(self):
+        """Métriques de la file et des tailles de lot"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches_run': self.batches_run,
+                'items_processed': self.items_processed,
+                'last_batch_size': self.last_batch_size,
+                'avg_batch_size': round(self.items_processed / self.batches_run, 2) if self.batches_run else 0,
+                'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+                'queue_wait_ms': round(self.queue_wait_ewma * 1000, 1) if self.queue_wait_ewma is not None else None,
+                'batch_latency_ms': (round(self.batch_latency_ewma * 1000, 1)
+                                     if self.batch_latency_ewma is not None else None)
+            }
+
+_RESAMPLE_MODES = {int(Image.BICUBIC): 'bicubic', int(Image.BILINEAR): 'bilinear'}
+_preprocess_specs = {}
+
+def preprocess_spec(image_processor):
+    """Paramètres de redimensionnement / normalisation d'un processor d'images HF"""
+    do_normalize = image_processor.do_normalize
+    return {
+        'size': (image_processor.size['height'], image_processor.size['width']),
+        'mode': _RESAMPLE_MODES.get(int(image_processor.resample), 'bilinear'),
+        'rescale': image_processor.rescale_factor if image_processor.do_rescale else 1.0,
+        'mean': torch.tensor(image_processor.image_mean).view(1, 3, 1, 1) if do_normalize else None,
+        'std': torch.tensor(image_processor.image_std).view(1, 3, 1, 1) if do_normalize else None
+    }
+
+def get_preprocess_spec(name, image_processor):
+    """Spec d'un modèle du registre, extraite une seule fois de son processor d'images"""
+    spec = _preprocess_specs.get(name)
+    if spec is None:
+        spec = _preprocess_specs[name] = preprocess_spec(image_processor)
+    return spec
+
+def image_to_array(image):
+    """Tampon uint8 HxWx3 unique à partir duquel sont produites les entrées de BLIP et de ViT"""
+    return np.array(image.convert('RGB') if image.mode != 'RGB' else image, dtype=np.uint8)
+
+def preprocess_batch(arrays, spec):
+    """Tableaux uint8 HxWx3 -> pixel_values (N, 3, h, w), sans repasser par PIL
+    
+    Reproduit le redimensionnement PIL des processors HF (interpolation antialiasée, arrondi uint8),
+    puis rescale et normalisation. Les images de même taille sont redimensionnées en un seul appel.
+    """
+    output = torch.empty((len(arrays), 3) + spec['size'], dtype=torch.float32)
+    groups = {}
+    for index, array in enumerate(arrays):
+        groups.setdefault(array.shape, []).append(index)
+    
+    for indices in groups.values():
+        source = torch.from_numpy(np.stack([arrays[i] for i in indices])).permute(0, 3, 1, 2).float()
+        if tuple(source.shape[-2:]) != spec['size']:
+            source = torch.nn.functional.interpolate(
+                source, size=spec['size'], mode=spec['mode'], align_corners=False, antialias=True
+            )
+        # Les processors HF redimensionnent en uint8 : arrondir et borner comme PIL
+        source = source.round_().clamp_(0, 255).mul_(spec['rescale'])
+        if spec['mean'] is not None:
+            source = (source - spec['mean']) / spec['std']
+        output[indices] = source
+    
+    return output
+
+@instrument_stage('blip')
+def analyze_with_blip_batch(arrays, profile='best'):
+    """Générer les descriptions BLIP pour un lot d'images (tableaux uint8) avec les paramètres du profil"""
+    settings = CAPTION_PROFILES[profile]
+    name = blip_model_name(settings['model_id'])
+    with model_registry.use(name) as (processor, model):
+        pixel_values = preprocess_batch(arrays, get_preprocess_spec(name, processor.image_processor))
+        with torch.no_grad():
+            out = model.generate(
+                pixel_values=pixel_values, max_length=settings['max_length'], num_beams=settings['num_beams']
+            )
+        return processor.batch_decode(out, skip_special_tokens=True)
+
+class ViTResults(list):
+    """Top 5 ViT (liste de {label, confidence}) ; porte aussi l'embedding de l'image (hors JSON)"""
+
+    def __init__(self, results, embedding=None):
+        super().__init__(results)
+        self.embedding = embedding
+
+@instrument_stage('vit')
+def analyze_with_vit_batch(arrays):
+    """Classifier un lot d'images (tableaux uint8) avec ViT (top 5 et embedding par image)"""
+    with model_registry.use('vit') as (processor, model):
+        pixel_values = preprocess_batch(arrays, get_preprocess_spec('vit', processor))
+        with torch.no_grad():
+            logits, embeddings = vit_logits_and_embeddings(model, pixel_values)
+    probabilities = torch.nn.functional.softmax(logits, dim=-1)
+    top_prob, top_class = torch.topk(probabilities, 5)
+    embeddings = embeddings.float().numpy()
+    
+    batch_results = []
+    for row_prob, row_class, embedding in zip(top_prob, top_class, embeddings):
+        batch_results.append(ViTResults([
+            {"label": model.config.id2label[cls.item()], "confidence": prob.item()}
+            for prob, cls in zip(row_prob, row_class)
+        ], embedding))
+    return batch_results
+
+# Un lot BLIP partage les mêmes paramètres de génération : une file par profil
+blip_batchers = {
+    name: MicroBatcher(f'blip-{name}', partial(analyze_with_blip_batch, profile=name))
+    for name in CAPTION_PROFILES
+}
+vit_batcher = MicroBatcher('vit', analyze_with_vit_batch)
+
+def analyze_with_blip(image, profile=None):
+    """Analyser l'image avec BLIP"""
+    try:
+        description = blip_batchers[profile or DEFAULT_CAPTION_PROFILE].submit(image_to_array(image)).result()
+        logger.info(f"BLIP description: {description}")
+        return description
+    except Exception as e:
+        logger.error(f"Erreur BLIP: {e}")
+        return None
+
+def analyze_with_vit(image):
+    """Analyser l'image avec ViT"""
+    try:
+        results = vit_batcher.submit(image_to_array(image)).result()
+        logger.info(f"ViT results: {results}")
+        return results
+    except Exception as e:
+        logger.error(f"Erreur ViT: {e}")
+        return None
+
+class _CancelGeneration(StoppingCriteria):
+    """Arrêter la génération quand le client du flux s'est déconnecté"""
+
+    def __init__(self, cancelled):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.cancelled.is_set()
+
+def start_caption_stream(pixels, profile, cancelled):
+    """Lancer la génération BLIP (profil glouton) en arrière-plan ; retourne un itérateur de fragments de texte
+    
+    La recherche en faisceau ne produit pas de tokens définitifs au fil de l'eau : réservé aux profils num_beams=1.
+    Une erreur de génération est disponible dans streamer.error une fois l'itération terminée.
+    """
+    settings = CAPTION_PROFILES[profile]
+    name = blip_model_name(settings['model_id'])
+    processor, _ = model_registry.get(name)
+    streamer = TextIteratorStreamer(processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+    streamer.error = None
+    
+    def generate():
+        try:
+            with model_registry.use(name) as (processor, model):
+                pixel_values = preprocess_batch([pixels], get_preprocess_spec(name, processor.image_processor))
+                with torch.no_grad():
+                    model.generate(
+                        pixel_values=pixel_values, max_length=settings['max_length'], num_beams=1,
+                        streamer=streamer, stopping_criteria=StoppingCriteriaList([_CancelGeneration(cancelled)])
+                    )
+        except Exception as e:
+            logger.error(f"Erreur BLIP (flux): {e}")
+            streamer.error = e
+            streamer.end()
+    
+    threading.Thread(target=generate, name='blip-stream', daemon=True).start()
+    return streamer
+
+def configure_torch_threads(num_threads=TORCH_INTRAOP_THREADS):
+    """Limiter le pool intra-op de torch : BLIP et ViT s'exécutent en parallèle"""
+    if num_threads <= 0:
+        num_threads = max(1, (os.cpu_count() or 1) // 2)
+    torch.set_num_threads(num_threads)
+    logger.info(f"🧵 Threads torch intra-op: {num_threads}")
+    return num_threads
+
+configure_torch_threads()
+stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='stage')
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_ANALYSIS_WINDOW, thread_name_prefix='batch')
+
+def _timed_stage(fn, *args):
+    result = fn(*args)
+    return result, time.perf_counter()
+
+def _stage_result(name, future):
+    """Attendre le résultat d'une étape ; None en cas d'erreur (comme les analyseurs unitaires)"""
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"Erreur {name}: {e}")
+        return None
+
+def run_analysis_stages(image, profile=None, cancelled=None, caption=True):
+    """Exécuter BLIP, ViT et l'analyse des couleurs en parallèle ; retourne les résultats et les durées (ms)
+    
+    cancelled (threading.Event) : lève AnalysisCancelled dès qu'il est positionné, sans attendre les modèles.
+    caption=False : pas de description BLIP (dégradation sous échéance).
+    """
+    started = time.perf_counter()
+    
+    # BLIP et ViT passent par leurs files de micro-batching, les couleurs par le pool d'étapes ;
+    # les deux modèles partagent le même tampon uint8 (prétraitement vectorisé dans chaque lot)
+    pixels = image_to_array(image)
+    profile = profile or DEFAULT_CAPTION_PROFILE
+    blip_available = caption and not model_registry.is_failed(blip_model_name(CAPTION_PROFILES[profile]['model_id']))
+    blip_future = blip_batchers[profile].submit(pixels) if blip_available else None
+    vit_future = vit_batcher.submit(pixels) if not model_registry.is_failed('vit') else None
+    color_future = stage_executor.submit(_timed_stage, analyze_colors_and_composition, image)
+    if cancelled is not None:
+        wait_stages((blip_future, vit_future, color_future), cancelled)
+    
+    blip_description = _stage_result('BLIP', blip_future)
+    vit_results = _stage_result('ViT', vit_future)
+    color_analysis, colors_done = color_future.result()
+    
+    timings = {'colors': round((colors_done - started) * 1000, 1)}
+    for name, future in (('blip', blip_future), ('vit', vit_future)):
+        if future is not None:
+            timings[name] = round((future.completed_at - started) * 1000, 1)
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    
+    return blip_description, vit_results, color_analysis, timings
+
+class AnalysisCancelled(Exception):
+    """Analyse abandonnée : plus aucune requête n'attend son résultat"""
+
+def wait_stages(futures, cancelled, poll_interval=SINGLE_FLIGHT_POLL_MS / 1000):
+    """Attendre les étapes ; si l'analyse est abandonnée, retirer des files celles qui n'ont pas commencé"""
+    pending = {future for future in futures if future is not None}
+    while pending:
+        if cancelled.is_set():
+            for future in pending:
+                future.cancel()  # ignoré par MicroBatcher si le lot n'a pas démarré
+            raise AnalysisCancelled('Analysis cancelled: no client waiting')
+        _, pending = wait(pending, timeout=poll_interval)
+
+class SingleFlight:
+    """Partager un calcul en cours entre requêtes identiques concurrentes (single-flight)
+    
+    Le premier appel pour une clé lance fn(*args, cancelled) dans le pool ; les appels suivants attendent
+    le même Future, erreur comprise. Quand tous les appelants se sont déconnectés, l'événement cancelled
+    est levé pour que le calcul s'arrête.
+    """
+
+    def __init__(self, executor, poll_interval_ms=SINGLE_FLIGHT_POLL_MS):
+        self.executor = executor
+        self.poll_interval = max(0.001, poll_interval_ms / 1000)
+        self._flights = {}  # clé -> {'future', 'waiters', 'cancelled'}
+        self._lock = threading.Lock()
+        # Métriques
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def run(self, key, fn, *args, disconnected=None):
+        """Résultat du calcul partagé pour la clé, et True s'il a été lancé par une autre requête
+        
+        disconnected() est appelé toutes les poll_interval secondes : s'il retourne True, l'appelant
+        quitte l'attente (AnalysisCancelled) et le calcul est annulé s'il était le dernier.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            shared = flight is not None
+            if not shared:
+                flight = self._flights[key] = {'waiters': 0, 'cancelled': threading.Event()}
+                flight['future'] = self.executor.submit(fn, *args, flight['cancelled'])
+                self.started += 1
+            else:
+                self.coalesced += 1
+            flight['waiters'] += 1
+        future = flight['future']
+        if not shared:
+            # Hors du verrou : le rappel s'exécute tout de suite si le calcul est déjà terminé
+            future.add_done_callback(lambda _: self._forget(key, flight))
+        
+        try:
+            while disconnected is not None and not wait([future], timeout=self.poll_interval).done:
+                if disconnected():
+                    raise AnalysisCancelled('Client disconnected')
+            return future.result(), shared
+        finally:
+            self._leave(key, flight)
+
+    def _leave(self, key, flight):
+        with self._lock:
+            flight['waiters'] -= 1
+            if flight['waiters'] == 0 and not flight['future'].done():
+                flight['cancelled'].set()
+                self.cancelled += 1
+                # Une nouvelle requête relance un calcul au lieu de rejoindre celui qui s'arrête
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': SINGLE_FLIGHT,
+                'in_flight': len(self._flights),
+                'started': self.started,
+                'coalesced': self.coalesced,
+                'cancelled': self.cancelled
+            }
+
+def client_disconnected(environ):
+    """Le client a-t-il fermé la connexion ? (socket lisible sans données ; False si le serveur ne l'expose pas)
+    
+    Le corps de la requête a déjà été lu : une socket lisible dont la lecture anticipée est vide signale la fin
+    de connexion. gunicorn et le serveur de développement Werkzeug exposent la socket dans l'environnement WSGI.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except ValueError:
+        return False  # socket TLS : lecture anticipée non supportée
+    except OSError:
+        return True
+
+flight_executor = ThreadPoolExecutor(max_workers=SINGLE_FLIGHT_WORKERS, thread_name_prefix='flight')
+analysis_flights = SingleFlight(flight_executor)
+
+# Niveaux de dégradation, du pipeline complet au minimum (ViT + couleurs, dictionnaire)
+DEGRADATION_LEVELS = ('full', 'fewer_beams', 'dictionary_translation', 'no_caption')
+
+class LoadShedError(Exception):
+    """Requête délestée : même le niveau minimal ne tient pas dans son échéance (HTTP 503)"""
+
+    def __init__(self, retry_after):
+        super().__init__('Server overloaded: deadline cannot be met')
+        self.retry_after = retry_after
+
+class LoadController:
+    """Choisir le niveau de dégradation d'une requête d'après son échéance
+    
+    Les durées estimées viennent de l'état des files BLIP/ViT (profondeur, attente et durée moyennes des lots)
+    et de la durée récente des traductions. Le premier niveau qui tient dans le temps restant est retenu :
+    moins de faisceaux, puis traduction par dictionnaire, puis ViT + couleurs sans BLIP ; sinon délestage.
+    """
+
+    def __init__(self, margin_ms=DEADLINE_MARGIN_MS, estimate_ttl=DEADLINE_ESTIMATE_TTL):
+        self.margin = margin_ms / 1000
+        self.estimate_ttl = estimate_ttl
+        self.translation_ewma = None
+        self.translation_observed = None
+        self._lock = threading.Lock()
+        self.levels = {level: 0 for level in DEGRADATION_LEVELS}
+        self.shed = 0
+
+    def observe_translation(self, seconds):
+        with self._lock:
+            self.translation_ewma = _ewma(self.translation_ewma, seconds)
+            self.translation_observed = time.perf_counter()
+
+    def _fresh(self, value, observed):
+        # Latence non remesurée depuis longtemps : ignorée, la requête sert de nouvelle mesure
+        if value is None or time.perf_counter() - observed > self.estimate_ttl:
+            return 0.0
+        return value
+
+    def batcher_eta(self, batcher):
+        """Durée estimée (s) d'un élément ajouté à la file ; None sans mesure récente"""
+        return batcher.estimate(self.estimate_ttl)
+
+    def translation_eta(self, languages):
+        if not any(TRANSLATIONS[language]['translation_pipeline'] for language in languages):
+            return 0.0
+        with self._lock:
+            return self._fresh(self.translation_ewma, self.translation_observed)
+
+    def remaining(self, deadline):
+        return deadline - time.monotonic() - self.margin
+
+    def plan(self, profile, languages, deadline):
+        """Niveau, profil BLIP effectif (None = pas de description) et traduction IA ; LoadShedError sinon"""
+        remaining = self.remaining(deadline)
+        vit = self.batcher_eta(vit_batcher) or 0.0  # nécessaire à tous les niveaux : mesuré par cette requête
+        translation = self.translation_eta(languages)
+        beams = CAPTION_PROFILES[profile]['num_beams']
+        
+        # Profils retenus : modèle BLIP chargé (pas de chargement à payer) et, pour les profils plus légers,
+        # latence mesurée récemment. Le profil demandé reste candidat sans mesure récente : la requête sert
+        # de nouvelle mesure au lieu de le laisser bloqué sur une latence périmée.
+        etas = {}
+        if model_registry.is_loaded(blip_model_name(CAPTION_PROFILES[profile]['model_id'])):
+            etas[profile] = self.batcher_eta(blip_batchers[profile]) or 0.0
+        for name in sorted(CAPTION_PROFILES, key=lambda name: -CAPTION_PROFILES[name]['num_beams']):
+            if (CAPTION_PROFILES[name]['num_beams'] < beams
+                    and model_registry.is_loaded(blip_model_name(CAPTION_PROFILES[name]['model_id']))):
+                eta = self.batcher_eta(blip_batchers[name])
+                if eta is not None:
+                    etas[name] = eta
+        if not etas:
+            # Aucun modèle BLIP chargé et mesuré : le profil demandé est chargé par cette requête
+            etas[profile] = self.batcher_eta(blip_batchers[profile]) or 0.0
+        candidates = list(etas)
+        
+        plan = None
+        for candidate in candidates:
+            estimate = max(etas[candidate], vit) + translation
+            if estimate <= remaining:
+                plan = {'level': 'full' if candidate == profile else 'fewer_beams', 'profile': candidate,
+                        'ai_translation': True, 'estimated_ms': round(estimate * 1000, 1)}
+                break
+        if plan is None:
+            estimate = max(etas[candidates[-1]], vit)
+            if estimate <= remaining:
+                plan = {'level': 'dictionary_translation', 'profile': candidates[-1], 'ai_translation': False,
+                        'estimated_ms': round(estimate * 1000, 1)}
+            elif vit <= remaining:
+                plan = {'level': 'no_caption', 'profile': None, 'ai_translation': False,
+                        'estimated_ms': round(vit * 1000, 1)}
+        
+        if plan is None:
+            with self._lock:
+                self.shed += 1
+            degradation_requests.inc('shed')
+            raise LoadShedError(max(1, int(math.ceil(vit))))
+        plan['budget_ms'] = round(remaining * 1000, 1)
+        return plan
+
+    def record(self, level):
+        """Compter le niveau appliqué, une fois la traduction éventuellement rétrogradée après l'inférence"""
+        with self._lock:
+            self.levels[level] += 1
+        degradation_requests.inc(level)
+
+    def stats(self):
+        with self._lock:
+            translation = self.translation_ewma
+            levels = dict(self.levels)
+            shed = self.shed
+        etas = {**{f'blip-{name}': self.batcher_eta(batcher) for name, batcher in blip_batchers.items()},
+                'vit': self.batcher_eta(vit_batcher), 'translation': translation}
+        return {
+            'levels': levels,
+            'shed': shed,
+            'eta_ms': {name: round(eta * 1000, 1) if eta is not None else None for name, eta in etas.items()}
+        }
+
+degradation_requests = metrics.counter(
+    'image_analysis_degradation_total', "Requêtes avec échéance par niveau de dégradation (ou délestées)", ('level',))
+load_controller = LoadController()
+
+def request_deadline(fields, started):
+    """Échéance (time.monotonic) depuis l'en-tête X-Deadline-Ms ou le champ deadline_ms ; None sans échéance"""
+    value = request.headers.get('X-Deadline-Ms') or fields.get('deadline_ms')
+    budget_ms = float(value) if value else REQUEST_DEADLINE_MS
+    if not math.isfinite(budget_ms) or budget_ms < 0:
+        raise ValueError('deadline_ms must be a positive number')
+    return started + budget_ms / 1000 if budget_ms else None
+
+def color_analysis_array(image, max_side=COLOR_ANALYSIS_MAX_SIDE):
+    """Sous-échantillon RGB borné (tableau uint8 HxWx3) sur lequel portent toutes les statistiques"""
+    if max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image, dtype=np.uint8)
+
+def dominant_colors_from_array(pixels, count=5, bits=COLOR_QUANT_BITS):
+    """Couleurs dominantes par histogramme quantifié ; chaque case est représentée par sa couleur moyenne"""
+    flat = pixels.reshape(-1, 3)
+    shift = 8 - bits
+    quantized = (flat >> shift).astype(np.int32)
+    bins = (quantized[:, 0] << (2 * bits)) | (quantized[:, 1] << bits) | quantized[:, 2]
+    
+    counts = np.bincount(bins, minlength=1 << (3 * bits))
+    top = np.argsort(counts)[::-1][:count]
+    top = top[counts[top] > 0]
+    
+    colors = []
+    for channel in range(3):
+        sums = np.bincount(bins, weights=flat[:, channel], minlength=counts.size)
+        colors.append(sums[top] / counts[top])
+    means = np.rint(np.stack(colors, axis=1)).astype(np.uint8)
+    return ['#{:02x}{:02x}{:02x}'.format(*color) for color in means]
+
+def edge_strength_from_array(pixels):
+    """Intensité moyenne des contours (noyau FIND_EDGES de Pillow : 8·centre − 8 voisins, borné à 0..255)"""
+    if pixels.shape[0] < 3 or pixels.shape[1] < 3:
+        return 0.0
+    p = pixels.astype(np.int16)
+    neighbours = (
+        p[:-2, :-2] + p[:-2, 1:-1] + p[:-2, 2:] +
+        p[1:-1, :-2] + p[1:-1, 2:] +
+        p[2:, :-2] + p[2:, 1:-1] + p[2:, 2:]
+    )
+    edges = np.clip(8 * p[1:-1, 1:-1] - neighbours, 0, 255)
+    return float(edges.mean())
+
+@instrument_stage('colors')
+def analyze_colors_and_composition(image):
+    """Analyser les couleurs et la composition"""
+    try:
+        width, height = image.info.get('original_size', image.size)
+        pixels = color_analysis_array(image)
+        
+        dominant_colors = dominant_colors_from_array(pixels)
+        brightness = float(pixels.mean())
+        contrast = float(pixels.reshape(-1, 3).std(axis=0).mean())
+        edge_strength = edge_strength_from_array(pixels)
+        
+        return {
+            'dominant_colors': dominant_colors,
             'brightness': brightness,
             'contrast': contrast,
             'edge_strength': edge_strength,
@@ -275,6 +1909,11 @@ def analyze_colors_and_composition(image):
         logger.error(f"Erreur analyse couleurs: {e}")
         return {}
 
+def image_dimensions(color_analysis):
+    """Dimensions "LxH" de l'analyse des couleurs, None si l'étape a échoué"""
+    width, height = color_analysis.get('width'), color_analysis.get('height')
+    return f"{width}x{height}" if width and height else None
+
 def analyze_composition_type(edge_strength, aspect_ratio):
     """Analyser le type de composition"""
     if edge_strength > 50:
@@ -290,427 +1929,2487 @@ def analyze_composition_type(edge_strength, aspect_ratio):
         else:
             return "organic"
 
-def generate_analysis_report(blip_description, vit_results, color_analysis, language='fr'):
-    """Générer le rapport d'analyse dans la langue choisie"""
-    trans = TRANSLATIONS[language]
+class AnalysisCache:
+    """Cache des résultats d'analyse : LRU en mémoire (taille + TTL) et niveau disque sqlite optionnel
     
-    if language == 'fr':
-        return generate_french_report(blip_description, vit_results, color_analysis, trans)
-    elif language == 'ar':
-        return generate_arabic_report(blip_description, vit_results, color_analysis, trans)
-    else:
-        return generate_english_report(blip_description, vit_results, color_analysis, trans)
+    La connexion sqlite est ouverte au premier usage dans chaque processus, jamais héritée d'un fork
+    (le maître gunicorn importe l'application avant de forker les workers).
+    """
+
+    def __init__(self, max_entries=ANALYSIS_CACHE_SIZE, max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+                 ttl=ANALYSIS_CACHE_TTL, db_path=ANALYSIS_CACHE_DB, disk_ttl=ANALYSIS_CACHE_DISK_TTL,
+                 disk_max_rows=ANALYSIS_CACHE_DISK_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        self.disk_max_rows = disk_max_rows
+        self._disk_writes = 0
+        self._entries = OrderedDict()  # clé -> (expiration, JSON sérialisé)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._db = None
+        self._db_pid = None
+        # Compteurs
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_purged = 0
+
+    def _connection(self):
+        """Connexion sqlite de ce processus (None sans niveau disque) ; appelée sous self._lock"""
+        if not self.db_path or self._db_pid == os.getpid():
+            return self._db
+        self._db_pid = os.getpid()
+        self._db = None
+        try:
+            db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")  # lectures et écritures concurrentes des workers
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache "
+                "(key TEXT PRIMARY KEY, created_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS analysis_cache_created ON analysis_cache (created_at)")
+            db.commit()
+            self._db = db
+            self._disk_purge(time.time())
+            logger.info(f"✅ Cache disque d'analyse: {self.db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache disque indisponible ({self.db_path}): {e}")
+            self._db = None
+        return self._db
+
+    def get(self, key):
+        """Retourner une copie du résultat en cache, ou None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(payload)
+                self._remove(key)
+            
+            payload = self._disk_get(key, now)
+            if payload is not None:
+                self.disk_hits += 1
+                self._store(key, payload, now)
+                return json.loads(payload)
+            
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Enregistrer un résultat (dict sérialisable en JSON)"""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._store(key, payload, now)
+            self._disk_put(key, payload, now)
+
+    def _store(self, key, payload, now):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (now + self.ttl, payload)
+        self._bytes += len(payload)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def _disk_get(self, key, now):
+        if self._connection() is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, created_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now - self.disk_ttl:
+                # Entrée expirée : supprimée dès qu'elle est rencontrée
+                self._db.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self.disk_purged += 1
+                return None
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Lecture cache disque: {e}")
+            return None
+
+    def _disk_put(self, key, payload, now):
+        if self._connection() is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, created_at, value) VALUES (?, ?, ?)",
+                (key, now, payload)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Écriture cache disque: {e}")
+            return
+        self._disk_writes += 1
+        if self._disk_writes % ANALYSIS_CACHE_DISK_PURGE_EVERY == 0:
+            self._disk_purge(now)
+
+    def _disk_purge(self, now):
+        """Supprimer les lignes expirées, puis les plus anciennes au-delà de disk_max_rows"""
+        try:
+            purged = self._db.execute(
+                "DELETE FROM analysis_cache WHERE created_at <= ?", (now - self.disk_ttl,)
+            ).rowcount
+            if self.disk_max_rows > 0:
+                purged += self._db.execute(
+                    "DELETE FROM analysis_cache WHERE key IN (SELECT key FROM analysis_cache "
+                    "ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.disk_max_rows,)
+                ).rowcount
+            self._db.commit()
+            self.disk_purged += purged
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Purge cache disque: {e}")
+
+    def stats(self):
+        """Compteurs hit/miss et occupation"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_purged': self.disk_purged,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0,
+                'disk_enabled': self._connection() is not None
+            }
+
+analysis_cache = AnalysisCache()
+
+# Hash perceptuel (pHash) : DCT 2D d'une vignette 32x32 en niveaux de gris, signe des 8x8 basses fréquences
+PHASH_SIZE = 32
+PHASH_BITS = 8
+_PHASH_DCT = np.cos(
+    np.pi * np.arange(PHASH_BITS)[:, None] * (2 * np.arange(PHASH_SIZE)[None, :] + 1) / (2 * PHASH_SIZE)
+)
+
+def perceptual_hash(image):
+    """pHash 64 bits : stable au redimensionnement, à la recompression et aux petites retouches"""
+    thumbnail = image.convert('L').resize((PHASH_SIZE, PHASH_SIZE), Image.BOX)
+    pixels = np.asarray(thumbnail, dtype=np.float64)
+    coefficients = _PHASH_DCT @ pixels @ _PHASH_DCT.T
+    # Le coefficient continu (0, 0) ne porte que la luminosité moyenne : exclu de la médiane
+    bits = coefficients.ravel() > np.median(coefficients.ravel()[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+class NearDuplicateIndex:
+    """Index des images déjà analysées par hash perceptuel (BK-tree, distance de Hamming)
+    
+    Chaque entrée garde les résultats BLIP (par profil) et ViT, réutilisés pour les quasi-doublons
+    (copies redimensionnées ou recompressées). Au-delà de max_entries, les plus anciennes sont oubliées.
+    """
+
+    def __init__(self, max_entries=NEAR_DUPLICATE_INDEX_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> entrée (ordre d'insertion)
+        self._by_hash = {}  # hash -> id
+        self._root = None  # nœud BK-tree : [hash, {distance: nœud}]
+        self._stale = 0  # hashes encore dans l'arbre mais plus dans l'index
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _insert(self, value):
+        if self._root is None:
+            self._root = [value, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                return
+            node = child
+
+    def _search(self, value, max_distance):
+        """(distance, hash) des hashes indexés à max_distance ou moins (inégalité triangulaire)"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_hash, children = stack.pop()
+            distance = hamming_distance(value, node_hash)
+            if distance <= max_distance and node_hash in self._by_hash:
+                found.append((distance, node_hash))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
+
+    def _rebuild(self):
+        self._root = None
+        self._stale = 0
+        for value in self._by_hash:
+            self._insert(value)
+
+    def add(self, value, profile, blip_description, vit_results, metadata=None):
+        """Indexer (ou compléter) les résultats d'une image ; retourne l'id de l'entrée"""
+        with self._lock:
+            entry_id = self._by_hash.get(value)
+            if entry_id is None:
+                entry_id = uuid.uuid4().hex
+                self._entries[entry_id] = {
+                    'id': entry_id, 'hash': value, 'captions': {}, 'vit_results': vit_results,
+                    'indexed_at': datetime.now().isoformat(), **(metadata or {})
+                }
+                self._by_hash[value] = entry_id
+                self._insert(value)
+                while len(self._entries) > self.max_entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    del self._by_hash[evicted['hash']]
+                    self._stale += 1
+                # Arbre reconstruit quand la moitié des nœuds ne correspond plus à une entrée
+                if self._stale > len(self._entries):
+                    self._rebuild()
+            entry = self._entries[entry_id]
+            entry['captions'][profile] = blip_description
+            entry['vit_results'] = vit_results
+            return entry_id
+
+    def find(self, value, profile, max_distance=NEAR_DUPLICATE_MAX_DISTANCE):
+        """Entrée la plus proche ayant une description pour ce profil, avec sa distance ; (None, None) sinon"""
+        with self._lock:
+            for distance, match in self._search(value, max_distance):
+                entry = self._entries[self._by_hash[match]]
+                if profile in entry['captions']:
+                    self.hits += 1
+                    return entry, distance
+            self.misses += 1
+            return None, None
+
+    def query(self, value, max_distance=NEAR_DUPLICATE_MAX_DISTANCE, limit=10):
+        """Quasi-doublons indexés, du plus proche au plus éloigné"""
+        with self._lock:
+            matches = [(self._entries[self._by_hash[match]], distance)
+                       for distance, match in self._search(value, max_distance)[:limit]]
+            # Copies : les descriptions d'une entrée peuvent être complétées pendant la sérialisation
+            return [({**entry, 'captions': dict(entry['captions'])}, distance) for entry, distance in matches]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_distance': NEAR_DUPLICATE_MAX_DISTANCE,
+                'reuse': NEAR_DUPLICATE_REUSE,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+near_duplicates = NearDuplicateIndex()
+
+class IVFIndex:
+    """Index IVF pour la recherche d'embeddings à grande échelle
+    
+    k-means sphérique sur un échantillon, une liste inversée par centroïde (affectation de chaque ligne),
+    puis score exact sur les lignes des n_probes centroïdes les plus proches de la requête.
+    Entraîné en arrière-plan, et ré-entraîné quand le nombre de vecteurs a doublé ; en attendant,
+    la recherche reste exhaustive.
+    """
+
+    def __init__(self, min_vectors=EMBEDDING_IVF_MIN_VECTORS, n_lists=EMBEDDING_IVF_LISTS,
+                 n_probes=EMBEDDING_IVF_PROBES, iterations=10):
+        self.min_vectors = min_vectors
+        self.n_lists = n_lists
+        self.n_probes = n_probes
+        self.iterations = iterations
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)  # ligne -> liste (-1 : pas encore affectée)
+        self.trained_on = 0
+        self._building = False
+        self._lock = threading.Lock()
+
+    def _assign(self, vectors):
+        return np.argmax(vectors.astype(np.float32) @ self.centroids.T, axis=1).astype(np.int32)
+
+    def add(self, row, vector):
+        with self._lock:
+            if row >= len(self.assignments):
+                grown = np.full(max(2 * len(self.assignments), row + 1, 1024), -1, dtype=np.int32)
+                grown[:len(self.assignments)] = self.assignments
+                self.assignments = grown
+            if self.centroids is not None:
+                self.assignments[row] = self._assign(vector[None, :])[0]
+
+    def _train(self, matrix, count):
+        try:
+            rng = np.random.default_rng(0)
+            n_lists = self.n_lists or max(1, int(4 * count ** 0.5))
+            sample_rows = np.sort(rng.choice(count, size=min(count, 256 * n_lists), replace=False))
+            sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+            centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)]
+            for _ in range(self.iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                order = np.argsort(labels, kind='stable')
+                present, starts = np.unique(labels[order], return_index=True)
+                sums = np.add.reduceat(sample[order], starts, axis=0)
+                centroids[present] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+            
+            fresh = np.empty(count, dtype=np.int32)
+            for start in range(0, count, EMBEDDING_SEARCH_CHUNK):
+                chunk = np.asarray(matrix[start:min(start + EMBEDDING_SEARCH_CHUNK, count)], dtype=np.float32)
+                fresh[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+            with self._lock:
+                # Lignes ajoutées pendant l'entraînement : non affectées (toujours scorées) jusqu'au prochain
+                assignments = np.full(max(len(self.assignments), count), -1, dtype=np.int32)
+                assignments[:count] = fresh
+                self.centroids = centroids
+                self.assignments = assignments
+                self.trained_on = count
+            logger.info(f"✅ Index IVF: {len(centroids)} listes sur {count} embeddings")
+        except Exception as e:
+            logger.error(f"❌ Entraînement IVF: {e}")
+        finally:
+            self._building = False
+
+    def candidates(self, query, matrix, count):
+        """Lignes à scorer pour la requête, ou None pour une recherche exhaustive"""
+        if count < self.min_vectors:
+            return None
+        if not self._building and (self.centroids is None or count >= 2 * self.trained_on):
+            self._building = True
+            threading.Thread(target=self._train, args=(matrix, count), name='ivf-train', daemon=True).start()
+        with self._lock:
+            centroids, assignments = self.centroids, self.assignments[:count]
+        if centroids is None:
+            return None
+        probes = np.argsort(centroids @ query)[-self.n_probes:]
+        rows = np.flatnonzero(np.isin(assignments, probes) | (assignments < 0))
+        if count > len(assignments):
+            rows = np.concatenate([rows, np.arange(len(assignments), count)])
+        return rows
+
+    def stats(self):
+        return {
+            'lists': 0 if self.centroids is None else len(self.centroids),
+            'probes': self.n_probes,
+            'trained_on': self.trained_on,
+            'building': self._building
+        }
+
+class EmbeddingStore:
+    """Embeddings ViT des images analysées : matrice float16 mappée en mémoire (lignes normalisées) + ids
+    
+    Fichiers du dossier : vectors.f16 (capacité x dimension), ids.txt (un id par ligne, dans l'ordre
+    des lignes) et meta.json. Les workers d'un même serveur partagent le dossier : les ajouts se font
+    sous verrou de fichier et chaque processus relit les lignes ajoutées par les autres.
+    Sans dossier, la matrice reste en mémoire.
+    """
+
+    def __init__(self, directory=EMBEDDING_DIR, index=EMBEDDING_INDEX):
+        self.directory = directory
+        self.dim = None
+        self._matrix = None
+        self._ids = []  # ligne -> id
+        self._rows = {}  # id -> ligne
+        self._ids_offset = 0  # octets de ids.txt déjà lus
+        self._lock = threading.Lock()
+        self.ivf = IVFIndex() if index == 'ivf' else None
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._sync()
+                logger.info(f"✅ Embeddings: {len(self._ids)} vecteurs ({directory})")
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Embeddings non persistants ({directory}): {e}")
+                self.directory = ''
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self):
+        if not self.directory or fcntl is None:
+            yield
+            return
+        with open(self._path('.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _map(self, capacity):
+        """(Re)mapper la matrice avec au moins `capacity` lignes"""
+        if not self.directory:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float16)
+            if self._matrix is not None:
+                matrix[:len(self._matrix)] = self._matrix
+            self._matrix = matrix
+            return
+        path = self._path('vectors.f16')
+        row_bytes = self.dim * 2
+        with open(path, 'ab') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size < capacity * row_bytes:
+                size = capacity * row_bytes
+                f.truncate(size)
+        # Le fichier a pu être agrandi par un autre worker : mapper toute sa taille
+        self._matrix = np.memmap(path, dtype=np.float16, mode='r+', shape=(size // row_bytes, self.dim))
+
+    def _sync(self):
+        """Relire les ids ajoutés par d'autres processus (appelé sous self._lock)"""
+        if not self.directory:
+            return
+        if self.dim is None:
+            if not os.path.exists(self._path('meta.json')):
+                return
+            with open(self._path('meta.json'), encoding='utf-8') as f:
+                self.dim = int(json.load(f)['dim'])
+        ids_path = self._path('ids.txt')
+        if not os.path.exists(ids_path) or os.path.getsize(ids_path) <= self._ids_offset:
+            return
+        with open(ids_path, 'rb') as f:
+            f.seek(self._ids_offset)
+            data = f.read()
+        # Ligne incomplète (écriture en cours) : relue au prochain appel
+        data = data[:data.rfind(b'\n') + 1]
+        self._ids_offset += len(data)
+        first = len(self._ids)
+        for entry_id in data.decode('utf-8').splitlines():
+            self._rows[entry_id] = len(self._ids)
+            self._ids.append(entry_id)
+        if self._matrix is None or len(self._matrix) < len(self._ids):
+            self._map(len(self._ids))
+        if self.ivf is not None:
+            for row in range(first, len(self._ids)):
+                self.ivf.add(row, np.asarray(self._matrix[row], dtype=np.float32))
+
+    def add(self, entry_id, embedding):
+        """Enregistrer (ou remplacer) l'embedding d'une image"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        vector = (vector / max(float(np.linalg.norm(vector)), 1e-12)).astype(np.float16)
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = len(vector)
+                if self.directory:
+                    with open(self._path('meta.json'), 'w', encoding='utf-8') as f:
+                        json.dump({'dim': self.dim, 'dtype': 'float16', 'model': VIT_MODEL_ID}, f)
+            if len(vector) != self.dim:
+                logger.warning(f"⚠️ Embedding de dimension {len(vector)} ignoré (index en {self.dim})")
+                return
+            
+            row = self._rows.get(entry_id)
+            if row is None:
+                row = len(self._ids)
+                if self._matrix is None or row >= len(self._matrix):
+                    self._map(max(1024, 2 * row))
+            # Vecteur écrit avant l'id : une ligne n'est visible qu'une fois complète
+            self._matrix[row] = vector
+            if row == len(self._ids):
+                self._rows[entry_id] = row
+                self._ids.append(entry_id)
+                if self.directory:
+                    line = f"{entry_id}\n".encode('utf-8')
+                    with open(self._path('ids.txt'), 'ab') as f:
+                        f.write(line)
+                    self._ids_offset += len(line)
+            if self.ivf is not None:
+                self.ivf.add(row, vector.astype(np.float32))
+
+    def get(self, entry_id):
+        with self._lock:
+            self._sync()
+            row = self._rows.get(entry_id)
+            return None if row is None else np.asarray(self._matrix[row], dtype=np.float32)
+
+    def search(self, query, k=10, exclude=None):
+        """Top-k cosinus : [(id, score)] du plus proche au plus éloigné"""
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self._lock:
+            self._sync()
+            matrix, ids, count = self._matrix, self._ids, len(self._ids)
+        if count == 0 or len(query) != self.dim:
+            return []
+        
+        k = min(k + (exclude is not None), count)
+        rows = self.ivf.candidates(query, matrix, count) if self.ivf is not None else None
+        if rows is None:
+            # Force brute vectorisée, par blocs (conversion float32 bornée en mémoire)
+            best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            for start in range(0, count, EMBEDDING_SEARCH_CHUNK):
+                scores = np.asarray(matrix[start:min(start + EMBEDDING_SEARCH_CHUNK, count)], dtype=np.float32) @ query
+                top = np.argpartition(scores, -min(k, len(scores)))[-k:]
+                best_rows = np.concatenate([best_rows, top + start])
+                best_scores = np.concatenate([best_scores, scores[top]])
+        else:
+            best_rows = rows
+            best_scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        
+        order = np.argsort(best_scores)[::-1]
+        results = []
+        for index in order:
+            entry_id = ids[best_rows[index]]
+            if entry_id != exclude:
+                results.append((entry_id, float(best_scores[index])))
+            if len(results) == k - (exclude is not None):
+                break
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'vectors': len(self._ids),
+                'dim': self.dim,
+                'capacity': 0 if self._matrix is None else len(self._matrix),
+                'directory': self.directory or None,
+                'index': 'ivf' if self.ivf is not None else 'flat',
+                **({'ivf': self.ivf.stats()} if self.ivf is not None else {})
+            }
+
+embedding_store = EmbeddingStore()
+
+def image_digest(image):
+    """Hash des pixels décodés (et des tailles d'origine et décodée)"""
+    digest = hashlib.sha256()
+    original_width, original_height = image.info.get('original_size', image.size)
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:{original_width}x{original_height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def _caption_settings(profile):
+    settings = CAPTION_PROFILES[profile]
+    return f"{profile}:{settings['model_id']}:{settings['num_beams']}:{settings['max_length']}"
+
+def compute_analysis_key(image, language, profile=None, digest=None):
+    """Clé de cache : hash des pixels décodés + langue + profil de description + versions des modèles
+    
+    Le modèle de traduction n'est connu qu'une fois son pipeline chargé (repli éventuel) : recalculer la
+    clé après la traduction pour ranger le résultat sous le modèle qui l'a produit.
+    """
+    pipeline_key = TRANSLATIONS.get(language, {}).get('translation_pipeline')
+    translation_model = (
+        translation_model_ids.get(pipeline_key, TRANSLATION_MODELS[pipeline_key]['model_id']) if pipeline_key else 'none'
+    )
+    caption_settings = _caption_settings(profile or DEFAULT_CAPTION_PROFILE)
+    return (f"{digest or image_digest(image)}:{language}:{caption_settings}:{VIT_MODEL_ID}:{translation_model}"
+            f":{INFERENCE_BACKEND}:report{REPORT_VERSION}")
+
+def compute_inference_key(digest, profile=None):
+    """Clé des résultats BLIP/ViT/couleurs, communs à toutes les langues"""
+    return f"{digest}:{_caption_settings(profile or DEFAULT_CAPTION_PROFILE)}:{VIT_MODEL_ID}:{INFERENCE_BACKEND}"
+
+# Version du format des rapports (incluse dans la clé du cache d'analyse)
+REPORT_VERSION = 2
+REPORT_FORMATS = ('text', 'json', 'html')
+
+# Seuils et règles communs à toutes les langues ; les textes viennent de TRANSLATIONS
+BRIGHTNESS_THRESHOLDS = (150, 100)
+CATEGORY_NOTES = (('landscape', 'landscape_depth'), ('building', 'architectural_elements'), ('person', 'human_focus'))
+RECOMMENDATION_THEMES = tuple(
+    (theme, re.compile('|'.join(map(re.escape, keywords))))
+    for theme, keywords in (
+        ('nature_uses', ('landscape', 'mountain', 'beach', 'paysage', 'جبل', 'شاطئ')),
+        ('urban_uses', ('city', 'building', 'street', 'ville', 'bâtiment', 'مدينة', 'مبنى')),
+    )
+)
+MAX_RECOMMENDATIONS = 4
+
+def _literal(text):
+    """Texte fixe inséré dans un gabarit str.format"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+class ReportTemplate:
+    """Gabarits d'une langue, compilés une fois : seules les valeurs de l'analyse restent à formater"""
+
+    def __init__(self, language, trans):
+        self.language = language
+        self.trans = trans
+        t = {key: _literal(value) for key, value in trans.items() if isinstance(value, str)}
+        sep, colon = t['field_separator'], t['heading_suffix']
+        
+        # Texte brut : un gabarit complet par forme de rapport (0 à 3 catégories ; visuel absent, sans ou avec
+        # dimensions), rendu en un seul format() sans liste de morceaux intermédiaire
+        summary = (
+            f"🖼️ {t['report_title']}\n\n📋 {t['executive_summary']}\n{t['ai_description']}{{}}\n\n"
+            f"🔍 {t['content_analysis']}\n"
+        )
+        category = f"  • {{}} ({t['confidence']}: {{:.1f}}%)\n"
+        visual_size = (
+            f"  • {t['resolution']}{sep}{{}} × {{}} {t['pixels']}\n"
+            f"  • {t['aspect_ratio']}{sep}{{:.2f}}:1\n"
+        )
+        visual = (
+            f"  • {t['dominant_colors']}{sep}{{}}\n"
+            f"  • {t['composition_type']}{sep}{{}}\n"
+            f"  • {t['brightness_level']}{sep}{{}}\n"
+        )
+        visual_layouts = {None: '', 'visual': visual, 'size': visual_size + visual}
+        closing = f"\n🎨 {t['technical_analysis']}\n{{}}\n💡 {t['recommendations']}\n  • {{}}"
+        self.text_layouts = {
+            (count, shape): (
+                summary + (f"{t['main_categories']}{colon}\n" + category * count if count else '')
+                + f"\n{t['visual_analysis']}{colon}\n" + visual_layout + closing
+            ).format
+            for count in range(4) for shape, visual_layout in visual_layouts.items()
+        }
+        
+        # HTML (textes fixes échappés ici, valeurs échappées au rendu)
+        h = {key: _literal(html.escape(value)) for key, value in trans.items() if isinstance(value, str)}
+        self.html_open = (
+            f'<article class="analysis-report" lang="{language}" dir="{h["direction"]}">\n'
+            f"<h2>🖼️ {h['report_title']}</h2>\n"
+            f"<section><h3>📋 {h['executive_summary']}</h3><p>{h['ai_description']}{{}}</p></section>\n"
+            f"<section><h3>🔍 {h['content_analysis']}</h3>\n"
+        ).format
+        self.html_categories = f"<h4>{h['main_categories']}</h4><ul>{{}}</ul>\n".format
+        self.html_category = f"<li>{{}} ({h['confidence']}: {{:.1f}}%)</li>".format
+        self.html_visual_heading = f"<h4>{h['visual_analysis']}</h4><ul>"
+        self.html_visual_size = (
+            f"<li>{h['resolution']}{h['field_separator']}{{}} × {{}} {h['pixels']}</li>"
+            f"<li>{h['aspect_ratio']}{h['field_separator']}{{:.2f}}:1</li>"
+        ).format
+        self.html_visual = (
+            f"<li>{h['dominant_colors']}{h['field_separator']}{{}}</li>"
+            f"<li>{h['composition_type']}{h['field_separator']}{{}}</li>"
+            f"<li>{h['brightness_level']}{h['field_separator']}{{}}</li></ul>\n"
+        ).format
+        self.html_close = (
+            f"</section>\n<section><h3>🎨 {h['technical_analysis']}</h3><ul>{{}}</ul></section>\n"
+            f"<section><h3>💡 {h['recommendations']}</h3><ul>{{}}</ul></section>\n</article>"
+        ).format
+
+    def format_text(self, description, categories, size, visual, technical, recommendations):
+        """Texte brut à partir des valeurs déjà traduites
+        
+        categories : couples (label, confiance) ; size : (largeur, hauteur, ratio) ou None ;
+        visual : (couleurs dominantes, composition, luminosité) ou None (size ignoré).
+        """
+        args = [description]
+        for label, confidence in categories:
+            args += (label, confidence * 100)
+        shape = None
+        if visual is not None:
+            shape = 'visual'
+            if size is not None:
+                shape = 'size'
+                args += size
+            args += visual
+        args += (''.join(f"  • {line}\n" for line in technical), "\n  • ".join(recommendations))
+        return self.text_layouts[len(categories), shape](*args)
+
+    def render_text(self, report):
+        visual = report['visual']
+        return self.format_text(
+            report['description'],
+            [(c['label'], c['confidence']) for c in report['categories']],
+            (visual['width'], visual['height'], visual['aspect_ratio'])
+            if visual and visual['aspect_ratio'] is not None else None,
+            (', '.join(visual['dominant_colors']), visual['composition_description'], visual['brightness_level'])
+            if visual else None,
+            report['technical'], report['recommendations']
+        )
+
+    def render_html(self, report):
+        escape = html.escape
+        parts = [self.html_open(escape(report['description']))]
+        if report['categories']:
+            parts.append(self.html_categories(''.join(
+                self.html_category(escape(c['label']), c['confidence'] * 100) for c in report['categories']
+            )))
+        visual = report['visual']
+        if visual:
+            parts.append(self.html_visual_heading)
+            if visual['aspect_ratio'] is not None:
+                parts.append(self.html_visual_size(visual['width'], visual['height'], visual['aspect_ratio']))
+            parts.append(self.html_visual(
+                escape(', '.join(visual['dominant_colors'])),
+                escape(visual['composition_description']), escape(visual['brightness_level'])
+            ))
+        parts.append(self.html_close(
+            ''.join(f"<li>{escape(line)}</li>" for line in report['technical']),
+            ''.join(f"<li>{escape(line)}</li>" for line in report['recommendations'])
+        ))
+        return ''.join(parts)
+
+class ReportEngine:
+    """Rapports d'analyse multilingues : contenu structuré, puis rendu texte, JSON ou HTML
+    
+    Ajouter une langue revient à ajouter son entrée dans TRANSLATIONS ; les gabarits sont compilés au démarrage.
+    """
+
+    def __init__(self, languages):
+        self.templates = {language: ReportTemplate(language, trans) for language, trans in languages.items()}
+
+    def build(self, blip_description, vit_results, color_analysis, language, translations=None):
+        """Contenu du rapport (dictionnaire sérialisable en JSON), textes déjà traduits
+        
+        translations : résultat de translate_report_texts déjà calculé pour cette langue, sinon traduit ici.
+        """
+        trans = self.templates[language].trans
+        top_results = (vit_results or [])[:3]
+        
+        # Description et labels affichés traduits en un seul lot (servi par le mémo après la première fois)
+        if translations is None:
+            translations = translate_report_texts(blip_description, vit_results, language)
+        
+        report = {
+            'language': language,
+            'direction': trans['direction'],
+            'title': trans['report_title'],
+            'description': translate_caption(blip_description, language, translations),
+            'categories': [
+                {'label': translate_label(r['label'], language, translations), 'source_label': r['label'],
+                 'confidence': r['confidence']}
+                for r in top_results
+            ],
+            'visual': None,
+            'technical': self._technical(trans, vit_results, color_analysis),
+            'recommendations': self._recommendations(trans, blip_description)
+        }
+        
+        if color_analysis:
+            # Dimensions absentes : résolution et ratio omis du rapport
+            width, height = color_analysis.get('width'), color_analysis.get('height')
+            report['visual'] = {
+                'width': width,
+                'height': height,
+                'aspect_ratio': width / height if width and height else None,
+                'dominant_colors': color_analysis['dominant_colors'][:3],
+                'composition': color_analysis['composition'],
+                'composition_description': trans['compositions'].get(
+                    color_analysis['composition'], color_analysis['composition']
+                ),
+                'brightness_level': self._brightness_level(trans, color_analysis['brightness'])
+            }
+        
+        return report
+
+    def render_text(self, blip_description, vit_results, color_analysis, language, translations=None):
+        """Rapport texte directement depuis les résultats, sans le dictionnaire de build (même texte)"""
+        template = self.templates[language]
+        trans = template.trans
+        if translations is None:
+            translations = translate_report_texts(blip_description, vit_results, language)
+        
+        size = visual = None
+        if color_analysis:
+            width, height = color_analysis.get('width'), color_analysis.get('height')
+            if width and height:
+                size = (width, height, width / height)
+            visual = (
+                ', '.join(color_analysis['dominant_colors'][:3]),
+                trans['compositions'].get(color_analysis['composition'], color_analysis['composition']),
+                self._brightness_level(trans, color_analysis['brightness'])
+            )
+        return template.format_text(
+            translate_caption(blip_description, language, translations),
+            [(translate_label(r['label'], language, translations), r['confidence']) for r in (vit_results or [])[:3]],
+            size, visual,
+            self._technical(trans, vit_results, color_analysis), self._recommendations(trans, blip_description)
+        )
+
+    @staticmethod
+    def _brightness_level(trans, brightness):
+        high, medium, low = trans['brightness_levels']
+        return high if brightness > BRIGHTNESS_THRESHOLDS[0] else medium if brightness > BRIGHTNESS_THRESHOLDS[1] else low
+
+    @staticmethod
+    def _technical(trans, vit_results, color_analysis):
+        technical = []
+        if color_analysis:
+            if color_analysis['contrast'] > 60:
+                technical.append(trans['high_contrast'])
+            if color_analysis['edge_strength'] > 40:
+                technical.append(trans['sharp_details'])
+            if len(color_analysis['dominant_colors']) >= 3:
+                technical.append(trans['color_harmony'])
+        
+        if vit_results:
+            main_category = vit_results[0]['label'].lower()
+            for keyword, note in CATEGORY_NOTES:
+                if keyword in main_category:
+                    technical.append(trans[note])
+                    break
+        return technical
+
+    @staticmethod
+    def _recommendations(trans, blip_description):
+        desc_lower = (blip_description or "").lower()
+        recommendations = []
+        for theme, keywords in RECOMMENDATION_THEMES:
+            if keywords.search(desc_lower):
+                recommendations.extend(trans[theme])
+        recommendations.extend(trans['general_uses'])
+        del recommendations[MAX_RECOMMENDATIONS:]
+        return recommendations
+
+    def render(self, report, output_format='text'):
+        """Rapport structuré -> texte brut, JSON (le dictionnaire lui-même) ou HTML"""
+        if output_format == 'json':
+            return report
+        template = self.templates[report['language']]
+        if output_format == 'html':
+            return template.render_html(report)
+        return template.render_text(report)
+
+report_engine = ReportEngine(TRANSLATIONS)
+
+def translate_report_texts(blip_description, vit_results, language):
+    """Description et 3 premiers labels traduits en un lot ({} si la langue n'a pas de pipeline disponible)"""
+    pipeline_key = TRANSLATIONS[language]['translation_pipeline']
+    if pipeline_key is None or not translation_available(pipeline_key):
+        return {}
+    return translate_batch([blip_description] + [r['label'] for r in (vit_results or [])[:3]], language)
+
+def translate_report_languages(blip_description, vit_results, languages):
+    """Traductions des rapports de plusieurs langues : un lot par pipeline, les pipelines en parallèle"""
+    if len(languages) == 1:
+        return {languages[0]: translate_report_texts(blip_description, vit_results, languages[0])}
+    futures = {language: stage_executor.submit(translate_report_texts, blip_description, vit_results, language)
+               for language in languages}
+    return {language: future.result() for language, future in futures.items()}
 
-def translate_to_french(text):
-    """Traduire le texte anglais en français avec IA"""
+@instrument_stage('report')
+def generate_analysis_report(blip_description, vit_results, color_analysis, language='fr', output_format='text',
+                             translations=None):
+    """Générer le rapport d'analyse dans la langue choisie (texte, JSON ou HTML)"""
+    if output_format == 'text':
+        return report_engine.render_text(blip_description, vit_results, color_analysis, language, translations)
+    report = report_engine.build(blip_description, vit_results, color_analysis, language, translations)
+    return report_engine.render(report, output_format)
+
+def translate_caption(text, language, translations=None):
+    """Traduire la description BLIP (IA, puis expressions connues, puis texte par défaut)
+    
+    translations : résultat d'un translate_batch déjà effectué, sinon traduction unitaire.
+    """
+    trans = TRANSLATIONS[language]
     if not text:
-        return "Image contenant divers éléments visuels"
+        return trans['default_description']
+    # Description déjà dans la langue des modèles
+    if trans['translation_pipeline'] is None:
+        return text
     
     # Essayer d'abord la traduction IA
-    translated = translate_with_ia(text, 'fr')
+    translated = translations.get(text) if translations is not None else translate_with_ia(text, language)
     
     # Si la traduction IA a fonctionné et est différente du texte original
     if translated and translated != text:
         return translated
     
     # Fallback: traduction manuelle
-    translations = {
-        "a man with a stick in his hand in the jungle": "Un homme tenant un bâton dans sa main dans la jungle",
-        "in his hand": "dans sa main",
-        "in the jungle": "dans la jungle",
-        "with a stick": "tenant un bâton",
-        "a man": "un homme",
-    }
+    lowered = text.lower()
+    for source, target in trans['caption_phrases'].items():
+        if source in lowered:
+            replaced = lowered.replace(source, target)
+            return replaced.capitalize() if trans['capitalize_caption'] else replaced
     
-    for eng, fr in translations.items():
-        if eng in text.lower():
-            return text.lower().replace(eng, fr).capitalize()
+    return trans['default_description']
+
+def translate_label(english_label, language, translations=None):
+    """Traduire un label ViT (IA si le pipeline est disponible, puis dictionnaire)"""
+    trans = TRANSLATIONS[language]
+    pipeline_key = trans['translation_pipeline']
+    if translations is not None:
+        translated = translations.get(english_label)
+        if translated and translated != english_label:
+            return translated
+    elif pipeline_key is not None and translation_available(pipeline_key):
+        translated = translate_with_ia(english_label, language)
+        if translated and translated != english_label:
+            return translated
     
-    return "Image contenant divers éléments visuels"
+    # Fallback au dictionnaire
+    return trans['labels'].get(english_label.lower(), english_label)
 
-def translate_to_arabic(text):
-    """Traduire le texte en arabe avec IA"""
-    if not text:
-        return "صورة تحتوي على عناصر بصرية متنوعة"
+def get_composition_description(composition_type, language):
+    """Obtenir la description de la composition"""
+    return TRANSLATIONS[language]['compositions'].get(composition_type, composition_type)
+
+def is_allowed_filename(filename):
+    """Vérifier l'extension du fichier"""
+    return any(filename.lower().endswith(f'.{fmt}') for fmt in ALLOWED_FORMATS)
+
+class ImageTooLargeError(ValueError):
+    """Image refusée : nombre de pixels supérieur à INGEST_MAX_PIXELS"""
+
+def decode_image(stream, max_side=INGEST_MAX_SIDE, max_pixels=INGEST_MAX_PIXELS):
+    """Étape d'ingestion : décoder l'image en un tampon RGB réduit, partagé par BLIP, ViT et l'analyse des couleurs
     
-    # Essayer d'abord la traduction IA
-    translated = translate_with_ia(text, 'ar')
+    La taille et le format d'origine sont conservés dans image.info ('original_size', 'source_format').
+    Lève ImageTooLargeError au-delà de max_pixels, ou une exception Pillow si le fichier est invalide.
+    """
+    image = Image.open(stream)  # lecture de l'en-tête uniquement, directement depuis le flux
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLargeError(f"Image too large: {width}x{height} pixels (max {max_pixels})")
+    source_format = image.format
     
-    # Si la traduction IA a fonctionné et est différente du texte original
-    if translated and translated != text:
-        return translated
+    if max_side and max(width, height) > max_side:
+        # JPEG : réduction 1/2, 1/4 ou 1/8 dans le domaine DCT pendant le décodage
+        scale = max_side / max(width, height)
+        image.draft('RGB', (max(1, int(width * scale)), max(1, int(height * scale))))
+        image.thumbnail((max_side, max_side), Image.BICUBIC, reducing_gap=2.0)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    image.info['original_size'] = (width, height)
+    image.info['source_format'] = source_format
+    return image
+
+def decode_tile_raster(stream, max_side=TILE_SCAN_MAX_SIDE, max_pixels=TILE_MAX_PIXELS,
+                       max_decoded_pixels=TILE_DECODE_MAX_PIXELS):
+    """Décoder la source du mode tuilé dans son mode d'origine (conversion RGB et réduction : TiledRaster)
+    
+    Les JPEG sont réduits dans le domaine DCT pendant le décodage (jusqu'à 1/8, sans descendre sous max_side).
+    Les autres formats sont décodés en pleine résolution : c'est le seul raster entier en mémoire,
+    borné par max_decoded_pixels.
+    """
+    image = Image.open(stream)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLargeError(f"Image too large: {width}x{height} pixels (max {max_pixels})")
+    source_format = image.format
+    if max(width, height) > max_side:
+        scale = max_side / max(width, height)
+        image.draft('RGB', (max(1, int(width * scale)), max(1, int(height * scale))))
+    decoded_width, decoded_height = image.size
+    if decoded_width * decoded_height > max_decoded_pixels:
+        raise ImageTooLargeError(f"Image too large to decode for tiled mode: {decoded_width}x{decoded_height} "
+                                 f"pixels (max {max_decoded_pixels})")
+    image.load()
+    image.info['original_size'] = (width, height)
+    image.info['source_format'] = source_format
+    return image
+
+class TiledRaster:
+    """Raster RGB du mode tuilé dans un memmap sur disque ; les tuiles sont extraites et réduites à la demande
+    
+    Le raster est construit bande par bande depuis l'image décodée : chaque bande est convertie en RGB et
+    réduite avant d'être copiée, sans copie convertie ni réduite de l'image entière. Il survit ensuite à la
+    source (libérée après la construction) pendant toute l'inférence, hors du tas.
+    Le fichier temporaire est supprimé dès sa création : le memmap libère les données quand il n'est plus référencé
+    (y compris par un calcul partagé qui survit à la requête qui l'a lancé).
+    """
+
+    STRIP_ROWS = 256  # lignes du raster produites à la fois
+
+    def __init__(self, image, captions=False, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_tiles=TILE_MAX_COUNT,
+                 max_side=TILE_SCAN_MAX_SIDE):
+        source_width, source_height = image.size
+        self.original_size = image.info.get('original_size', image.size)
+        self.source_format = image.info.get('source_format', image.format)
+        self.captions = captions
+        # Réduction entière par moyenne de blocs : des bandes de hauteur multiple du facteur donnent le même
+        # résultat qu'une réduction de l'image entière
+        factor = max(1, math.ceil(max(image.size) / max_side))
+        width, height = math.ceil(source_width / factor), math.ceil(source_height / factor)
+        with tempfile.TemporaryFile(prefix='tiles-') as f:
+            self.raster = np.memmap(f, dtype=np.uint8, mode='w+', shape=(height, width, 3))
+        strip_rows = self.STRIP_ROWS * factor
+        for top in range(0, source_height, strip_rows):
+            strip = image.crop((0, top, source_width, min(source_height, top + strip_rows)))
+            if strip.mode != 'RGB':
+                strip = strip.convert('RGB')
+            if factor > 1:
+                strip = strip.reduce(factor)
+            self.raster[top // factor:top // factor + strip.height] = np.asarray(strip, dtype=np.uint8)
+        self.raster.flush()
+        self.boxes, self.grid, self.tile_size = self._layout(width, height, tile_size, overlap, max_tiles)
+
+    def overview(self, max_side=INGEST_MAX_SIDE):
+        """Image entière réduite (entrée de BLIP, ViT et des couleurs) tirée du raster, sans redécoder la source"""
+        image = Image.fromarray(np.asarray(self.raster))
+        image.thumbnail((max_side, max_side), Image.BICUBIC, reducing_gap=2.0)
+        image.info['original_size'] = self.original_size
+        image.info['source_format'] = self.source_format
+        return image
+
+    @staticmethod
+    def _layout(width, height, tile_size, overlap, max_tiles):
+        """Boîtes (x0, y0, x1, y1) régulièrement espacées, la dernière de chaque rangée alignée sur le bord"""
+        side = min(width, height, tile_size)
+        while True:
+            stride = max(1, int(side * (1 - overlap)))
+            columns = math.ceil(max(0, width - side) / stride) + 1
+            rows = math.ceil(max(0, height - side) / stride) + 1
+            if columns * rows <= max_tiles or side >= min(width, height):
+                break
+            side = min(min(width, height), int(side * 1.1) + 1)
+        if columns * rows > max_tiles:
+            # Image très allongée : moins de tuiles, réparties sur toute la longueur (sans chevauchement)
+            rows = min(rows, max_tiles)
+            columns = max(1, min(columns, max_tiles // rows))
+        xs = np.linspace(0, width - side, columns).round().astype(int)
+        ys = np.linspace(0, height - side, rows).round().astype(int)
+        boxes = [(int(x), int(y), int(x) + side, int(y) + side) for y in ys for x in xs]
+        return boxes, (columns, rows), side
+
+    @property
+    def key(self):
+        """Suffixe des clés de cache et de single-flight (découpage et descriptions par tuile)"""
+        return f":tiles{len(self.boxes)}x{self.tile_size}:{self.grid[0]}x{self.grid[1]}:{int(self.captions)}"
+
+    def original_box(self, box):
+        """Boîte d'une tuile dans les coordonnées de l'image d'origine"""
+        scale_x = self.original_size[0] / self.raster.shape[1]
+        scale_y = self.original_size[1] / self.raster.shape[0]
+        x0, y0, x1, y1 = box
+        return [round(x0 * scale_x), round(y0 * scale_y), round(x1 * scale_x), round(y1 * scale_y)]
+
+    def tiles(self, side=TILE_MODEL_SIDE):
+        """Tuiles uint8 side x side, lues dans le memmap une par une (seules les pages touchées sont chargées)"""
+        for x0, y0, x1, y1 in self.boxes:
+            tile = Image.fromarray(np.ascontiguousarray(self.raster[y0:y1, x0:x1]))
+            if tile.size != (side, side):
+                tile = tile.resize((side, side), Image.BICUBIC, reducing_gap=2.0)
+            yield np.asarray(tile, dtype=np.uint8)
+
+# Signatures des formats acceptés (premiers octets du fichier)
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+IMAGE_SNIFF_BYTES = 16
+
+def sniff_image_format(head):
+    """Format réel d'après les premiers octets (None si ce n'est pas une image acceptée)"""
+    for signature, fmt in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class UploadError(Exception):
+    """Envoi refusé pendant la lecture du corps multipart (message et code HTTP de la réponse)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class UploadSpool:
+    """Fichier reçu : en mémoire jusqu'à UPLOAD_SPOOL_MEMORY, au-delà dans un fichier temporaire relu par mmap"""
+
+    def __init__(self, memory_limit=UPLOAD_SPOOL_MEMORY):
+        self.memory_limit = memory_limit
+        self.size = 0
+        self.format = None  # format détecté par sniff_image_format
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._map = None
+
+    @property
+    def on_disk(self):
+        return self._file is not None
+
+    def head(self, size=IMAGE_SNIFF_BYTES):
+        if self._file is None:
+            return self._buffer.getvalue()[:size]
+        self._file.seek(0)
+        head = self._file.read(size)
+        self._file.seek(0, os.SEEK_END)
+        return head
+
+    def write(self, data):
+        if self._file is None and self.size + len(data) > self.memory_limit:
+            # Débordement : les octets déjà reçus passent sur disque, la mémoire par requête reste bornée
+            self._file = tempfile.TemporaryFile(prefix='upload-')
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        (self._buffer if self._file is None else self._file).write(data)
+        self.size += len(data)
+
+    def open(self):
+        """Flux en lecture pour Pillow, sans recopier le fichier : le tampon lui-même ou une projection mmap"""
+        if self._file is None:
+            self._buffer.seek(0)
+            return self._buffer
+        if self._map is None:
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._map.seek(0)
+        return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def receive_image_upload(field_name='image', max_bytes=UPLOAD_MAX_BYTES, required=True):
+    """Lire le corps multipart en flux : champs texte et fichier image (UploadSpool)
+    
+    Contrairement à request.files, rien n'est mis en tampon avant validation : l'extension est vérifiée
+    dès l'en-tête de la partie, la signature sur les premiers octets, et la taille pendant la lecture.
+    Retourne (champs, nom du fichier, spool) ; lève UploadError. request.form et request.files
+    ne doivent plus être utilisés ensuite (le flux est consommé). Avec required=False, l'image est
+    facultative : sans elle (ou sans corps multipart), nom du fichier et spool valent None.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        if not required:
+            return request.form, None, None  # formulaire urlencoded, borné par Werkzeug
+        raise UploadError('No image provided')
+    if request.content_length is not None and request.content_length > max_bytes + UPLOAD_MULTIPART_OVERHEAD:
+        raise UploadError(f'Upload too large (max {max_bytes} bytes)', 413)
+    
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_parts=64)
+    stream = request.stream
+    fields = MultiDict()  # comme request.form : champs répétés conservés (getlist)
+    filename = None
+    spool = None
+    current = None  # UploadSpool, [nom, valeur] d'un champ texte, ou None (partie ignorée)
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                decoder.receive_data(stream.read(UPLOAD_CHUNK_SIZE) or None)
+            elif isinstance(event, File):
+                current = None
+                if event.name == field_name and spool is None:
+                    if not event.filename:
+                        raise UploadError('No file selected')
+                    if not is_allowed_filename(event.filename):
+                        raise UploadError(f'Format not supported. Use: {", ".join(ALLOWED_FORMATS)}')
+                    filename = event.filename
+                    spool = current = UploadSpool()
+            elif isinstance(event, Field):
+                current = [event.name, bytearray()]
+            elif isinstance(event, Data):
+                if current is spool and spool is not None:
+                    if spool.size + len(event.data) > max_bytes:
+                        raise UploadError(f'Upload too large (max {max_bytes} bytes)', 413)
+                    spool.write(event.data)
+                    # Rejet dès le premier bloc si le contenu n'est pas une image acceptée
+                    if spool.format is None and (spool.size >= IMAGE_SNIFF_BYTES or not event.more_data):
+                        spool.format = sniff_image_format(spool.head())
+                        if spool.format is None:
+                            raise UploadError(f'Format not supported. Use: {", ".join(ALLOWED_FORMATS)}')
+                elif current is not None:
+                    current[1] += event.data
+                    if len(current[1]) > UPLOAD_MAX_FIELD_BYTES:
+                        raise UploadError(f'Form field too large: {current[0]}', 413)
+                    if not event.more_data:
+                        fields.add(current[0], current[1].decode('utf-8', 'replace'))
+                        current = None
+            elif isinstance(event, Epilogue):
+                break
+    except (UploadError, ValueError, RequestEntityTooLarge, ClientDisconnected) as e:
+        if spool is not None:
+            spool.close()
+        if isinstance(e, UploadError):
+            raise
+        if isinstance(e, RequestEntityTooLarge):
+            raise UploadError(f'Request too large (max {REQUEST_MAX_BYTES} bytes) or too many form parts', 413)
+        raise UploadError('Malformed or incomplete multipart body')
+    
+    if spool is None:
+        if not required:
+            return fields, None, None
+        raise UploadError('No image provided')
+    if spool.format is None:
+        spool.close()
+        raise UploadError(f'Format not supported. Use: {", ".join(ALLOWED_FORMATS)}')
+    return fields, filename, spool
+
+def analyze_decoded_image(image, language, profile=None, disconnected=None, deadline=None):
+    """Analyse complète d'une image décodée : cache, étapes parallèles puis rapport"""
+    return analyze_decoded_image_languages(image, [language], profile, disconnected, deadline)[language]
+
+def analyze_decoded_image_languages(image, languages, profile=None, disconnected=None, deadline=None, tiling=None):
+    """Analyse d'une image décodée pour plusieurs langues : {langue: réponse}
+    
+    BLIP, ViT et les couleurs ne dépendent pas de la langue : ils sont calculés une seule fois, puis les
+    traductions de toutes les langues manquantes au cache sont faites en parallèle avant les rapports.
+    Les inférences identiques en cours (mêmes pixels et profil) sont partagées (single-flight) ;
+    disconnected() permet d'abandonner l'attente quand le client est parti.
+    
+    deadline (time.monotonic) : LoadController choisit le niveau de dégradation (details.degradation) ;
+    LoadShedError si même ViT + couleurs ne tient pas. Les résultats dégradés ne sont pas mis en cache.
+    
+    tiling (TiledRaster) : mode tuilé, catégories et descriptions des tuiles fusionnées (niveau full uniquement).
+    """
+    profile = profile or DEFAULT_CAPTION_PROFILE
+    
+    # Résultats déjà calculés pour la même image ?
+    digest = image_digest(image)
+    tiling_key = tiling.key if tiling is not None else ''
+    cache_keys = {language: compute_analysis_key(image, language, profile, digest) + tiling_key
+                  for language in languages}
+    results = {}
+    for language, cache_key in cache_keys.items():
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            cached['details']['analysis_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cached['details']['cached'] = True
+            cached['details']['stage_timings_ms'] = {}
+            results[language] = cached
+    missing = [language for language in cache_keys if language not in results]
+    if not missing:
+        return results
+    
+    # Quasi-doublon déjà analysé (copie redimensionnée ou recompressée) : reprendre ses résultats BLIP/ViT
+    image_hash = perceptual_hash(image)
+    reuse = NEAR_DUPLICATE_REUSE and tiling is None
+    match, distance = near_duplicates.find(image_hash, profile) if reuse else (None, None)
+    shared = False
+    plan = {'level': 'full', 'profile': profile, 'ai_translation': True}
+    if match is not None:
+        started = time.perf_counter()
+        color_analysis = analyze_colors_and_composition(image)
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        blip_description, vit_results = match['captions'][profile], match['vit_results']
+        stage_timings = {'colors': elapsed, 'total': elapsed}
+        extra_details = {'near_duplicate': {'id': match['id'], 'distance': distance}}
+    else:
+        if deadline is not None:
+            plan = load_controller.plan(profile, missing, deadline)
+        inference_profile, caption = plan['profile'] or profile, plan['profile'] is not None
+        # Mode tuilé seulement sans dégradation : les tuiles coûtent plus cher que l'image entière
+        tiled = tiling is not None and plan['level'] == 'full'
+        if tiled:
+            inference = (run_tiled_inference, image, inference_profile, tiling, caption)
+        else:
+            inference = (run_image_inference, image, inference_profile, image_hash, caption)
+        if SINGLE_FLIGHT:
+            # Même image déjà en cours d'analyse (autre onglet, nouvel essai du client) : attendre ce calcul
+            inference_key = (compute_inference_key(digest, inference_profile) + ('' if caption else ':no-caption')
+                             + (tiling_key if tiled else ''))
+            (blip_description, vit_results, color_analysis, stage_timings, extra_details), shared = analysis_flights.run(
+                inference_key, *inference, disconnected=disconnected
+            )
+        else:
+            blip_description, vit_results, color_analysis, stage_timings, extra_details = inference[0](*inference[1:])
+        if tiling is not None and not tiled:
+            extra_details = {**extra_details, 'tiling': {'skipped': plan['level']}}
+    if shared:
+        extra_details = {**extra_details, 'coalesced': True}
+    
+    # Échéance trop proche pour la traduction IA après l'inférence : dictionnaire seulement
+    if (deadline is not None and plan['ai_translation']
+            and load_controller.remaining(deadline) < load_controller.translation_eta(missing)):
+        plan = {**plan, 'level': 'dictionary_translation', 'ai_translation': False}
+    degradation = {'level': plan['level']}
+    if deadline is not None:
+        load_controller.record(plan['level'])
+        degradation.update(caption_profile=plan['profile'], budget_ms=plan.get('budget_ms'),
+                           estimated_ms=plan.get('estimated_ms'))
+    
+    translation_started = time.perf_counter()
+    if plan['ai_translation']:
+        translations = translate_report_languages(blip_description, vit_results, missing)
+        load_controller.observe_translation(time.perf_counter() - translation_started)
+    else:
+        translations = {language: {} for language in missing}
+    translation_ms = round((time.perf_counter() - translation_started) * 1000, 1)
+    # Clés recalculées après la traduction : le pipeline (ou son repli) vient peut-être d'être chargé,
+    # le résultat est rangé sous le modèle qui a réellement traduit (la requête suivante le retrouve)
+    cache_keys.update({language: compute_analysis_key(image, language, profile, digest) + tiling_key
+                       for language in missing})
+    for language in missing:
+        results[language] = build_analysis_response(
+            image, language, profile, cache_keys[language], blip_description, vit_results, color_analysis,
+            {**stage_timings, 'translation': translation_ms}, {**extra_details, 'degradation': degradation},
+            translations[language], cache=plan['level'] == 'full'
+        )
+    return results
+
+def run_image_inference(image, profile, image_hash, caption=True, cancelled=None):
+    """Étapes BLIP, ViT et couleurs (en parallèle), puis enregistrement du quasi-doublon et de l'embedding"""
+    blip_description, vit_results, color_analysis, stage_timings = run_analysis_stages(
+        image, profile, cancelled, caption
+    )
+    extra_details = {}
+    if blip_description is not None and vit_results is not None:
+        extra_details['image_id'] = near_duplicates.add(image_hash, profile, blip_description, vit_results, {
+            'dimensions': image_dimensions(color_analysis)
+        })
+        if getattr(vit_results, 'embedding', None) is not None:
+            embedding_store.add(extra_details['image_id'], vit_results.embedding)
+    return blip_description, vit_results, color_analysis, stage_timings, extra_details
+
+def merge_tile_labels(vit_results, tile_results, limit=5):
+    """Catégories de l'image entière et des tuiles : meilleure confiance par label (top 5 global)"""
+    best = {}
+    for results in [vit_results or []] + tile_results:
+        for result in results:
+            if result['confidence'] > best.get(result['label'], -1.0):
+                best[result['label']] = result['confidence']
+    merged = sorted(best.items(), key=lambda item: -item[1])[:limit]
+    return ViTResults([{'label': label, 'confidence': confidence} for label, confidence in merged],
+                      getattr(vit_results, 'embedding', None))
+
+def merge_tile_captions(caption, tile_captions, limit=TILE_CAPTION_MAX):
+    """Description globale complétée par les descriptions de tuiles nouvelles (ordre de lecture des tuiles)"""
+    parts = [caption.strip()] if caption and caption.strip() else []
+    added = 0
+    for text in tile_captions:
+        text = (text or '').strip()
+        if not text or any(text in part for part in parts):
+            continue
+        parts.append(text)
+        added += 1
+        if added == limit:
+            break
+    return ', '.join(parts) if parts else caption
+
+def run_tile_models(tiling, profile):
+    """ViT (et BLIP si demandé) sur toutes les tuiles en un seul lot chacun"""
+    started = time.perf_counter()
+    tiles = list(tiling.tiles())
+    vit_results = analyze_with_vit_batch(tiles)
+    captions = analyze_with_blip_batch(tiles, profile) if tiling.captions else [None] * len(tiles)
+    return vit_results, captions, round((time.perf_counter() - started) * 1000, 1)
+
+def run_tiled_inference(image, profile, tiling, caption=True, cancelled=None):
+    """Mode tuilé : étapes sur l'image entière et modèles sur les tuiles en parallèle, puis fusion
+    
+    Les résultats fusionnés ne sont pas ajoutés à l'index des quasi-doublons ni aux embeddings (propres au mode normal).
+    """
+    started = time.perf_counter()
+    tile_future = stage_executor.submit(run_tile_models, tiling, profile)
+    try:
+        blip_description, vit_results, color_analysis, stage_timings = run_analysis_stages(
+            image, profile, cancelled, caption
+        )
+        if cancelled is not None:
+            wait_stages((tile_future,), cancelled)
+    except AnalysisCancelled:
+        tile_future.cancel()
+        raise
+    
+    tiling_details = {'tiles': len(tiling.boxes), 'grid': list(tiling.grid), 'captions': tiling.captions,
+                      'raster': f"{tiling.raster.shape[1]}x{tiling.raster.shape[0]}"}
+    try:
+        tile_results, tile_captions, stage_timings['tiles'] = tile_future.result()
+        stage_timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        logger.error(f"Erreur tuiles: {e}")
+        record_stage_error('tiles')
+        return blip_description, vit_results, color_analysis, stage_timings, {
+            'tiling': {**tiling_details, 'error': str(e)}
+        }
+    
+    tiling_details['regions'] = [
+        {'box': tiling.original_box(box), 'label': results[0]['label'] if results else None,
+         'confidence': results[0]['confidence'] if results else None, 'caption': tile_caption}
+        for box, results, tile_caption in zip(tiling.boxes, tile_results, tile_captions)
+    ]
+    vit_results = merge_tile_labels(vit_results, tile_results)
+    if blip_description is not None and tiling.captions:
+        blip_description = merge_tile_captions(blip_description, tile_captions)
+    return blip_description, vit_results, color_analysis, stage_timings, {'tiling': tiling_details}
+
+def build_analysis_response(image, language, profile, cache_key, blip_description, vit_results, color_analysis,
+                            stage_timings, extra_details=None, translations=None, cache=True):
+    """Rapport et détails à partir des résultats des étapes ; mis en cache si BLIP et ViT ont réussi"""
+    # Générer le rapport
+    report_started = time.perf_counter()
+    report = generate_analysis_report(
+        blip_description, 
+        vit_results, 
+        color_analysis, 
+        language,
+        output_format='json',
+        translations=translations
+    )
+    analysis_report = report_engine.render(report, 'text')
+    stage_timings['report'] = round((time.perf_counter() - report_started) * 1000, 1)
     
-    # Fallback: traduction manuelle
-    translations = {
-        "a man with a stick in his hand in the jungle": "رجل يحمل عصا في يده في الغابة",
-        "in his hand": "في يده",
-        "in the jungle": "في الغابة",
-        "with a stick": "يحمل عصا",
-        "a man": "رجل",
+    response_data = {
+        'success': True,
+        'description': analysis_report,
+        'report': report,
+        'details': {
+            'confidence': 0.95,
+            'dominant_colors': color_analysis.get('dominant_colors', []),
+            'image_format': image.info.get('source_format', image.format),
+            'dimensions': image_dimensions(color_analysis),
+            'analysis_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'language': language,
+            'caption_profile': profile,
+            'models_used': ['BLIP', 'ViT'],
+            'translation_ia': len(loaded_translation_pipelines()) > 0,
+            'stage_timings_ms': stage_timings,
+            'cached': False,
+            **(extra_details or {})
+        }
     }
     
-    for eng, arb in translations.items():
-        if eng in text.lower():
-            return text.lower().replace(eng, arb)
+    # Ne pas mettre en cache un résultat partiel (erreur modèle) ou dégradé
+    if cache and blip_description is not None and vit_results is not None:
+        analysis_cache.put(cache_key, response_data)
     
-    return "صورة تحتوي على عناصر بصرية متنوعة"
+    return response_data
 
-def generate_french_report(blip_description, vit_results, color_analysis, trans):
-    """Générer rapport en français"""
-    report = "🖼️ RAPPORT COMPLET D'ANALYSE D'IMAGE\n\n"
+def parse_languages(values):
+    """Champ language : une langue, une liste (champs répétés ou séparés par des virgules) ou 'all'
     
-    report += f"📋 {trans['executive_summary']}\n"
-    french_desc = translate_to_french(blip_description) if blip_description else 'Image contenant divers éléments visuels'
-    report += f"Description IA : {french_desc}\n\n"
-    
-    report += f"🔍 {trans['content_analysis']}\n"
+    Retourne (langues sans doublon, True si plusieurs langues ont été demandées) ; ValueError si une langue est inconnue.
+    """
+    languages = [part.strip() for value in values for part in value.split(',') if part.strip()] or ['fr']
+    if 'all' in languages:
+        return list(TRANSLATIONS), True
+    unknown = [language for language in languages if language not in TRANSLATIONS]
+    if unknown:
+        raise ValueError(f'Unsupported language: {", ".join(unknown)}. Use: {", ".join(TRANSLATIONS)} or all')
+    return list(dict.fromkeys(languages)), len(languages) > 1
+
+def unavailable_image_models(profile=None):
+    """Modèles d'image requis par le profil dont le dernier chargement a échoué"""
+    names = [blip_model_name(CAPTION_PROFILES[profile or DEFAULT_CAPTION_PROFILE]['model_id']), 'vit']
+    return [name for name in names if model_registry.is_failed(name)]
+
+def models_unavailable_response(names):
+    response = jsonify({
+        'success': False,
+        'error': f'Models unavailable: {", ".join(names)}. Please try again later.'
+    })
+    response.headers['Retry-After'] = str(int(MODEL_RETRY_AFTER))
+    return response, 503
+
+@app.route('/api/analyze-image', methods=['POST'])
+@instrument_stage('analyze_image')
+def analyze_image():
+    """Endpoint pour analyser l'image"""
+    started = time.monotonic()
+    try:
+        try:
+            fields, filename, spool = receive_image_upload()
+        except UploadError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
+        
+        with spool:
+            profile = fields.get('profile', DEFAULT_CAPTION_PROFILE)
+            
+            report_format = fields.get('report_format', 'text')
+            
+            # Plusieurs langues (liste ou 'all') : une seule inférence, un rapport par langue
+            try:
+                languages, multiple = parse_languages(fields.getlist('language'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            language = ','.join(languages)
+            
+            # Échéance : en-tête X-Deadline-Ms ou champ deadline_ms, comptée depuis l'arrivée de la requête
+            try:
+                deadline = request_deadline(fields, started)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'deadline_ms must be a positive number'}), 400
+            
+            if profile not in CAPTION_PROFILES:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unknown profile. Use: {", ".join(CAPTION_PROFILES)}'
+                }), 400
+            
+            if report_format not in REPORT_FORMATS:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unknown report format. Use: {", ".join(REPORT_FORMATS)}'
+                }), 400
+            
+            # Les modèles se chargent au premier usage ; refuser seulement si leur chargement a échoué
+            unavailable = unavailable_image_models(profile)
+            if unavailable:
+                return models_unavailable_response(unavailable)
+            
+            logger.info(f"🌍 Analyse demandée en: {language}")
+            
+            # Décodage complet avant de libérer le spool (tampon mémoire ou fichier temporaire) ;
+            # mode tuilé : décodage en pleine résolution (bornée) vers un raster memmap, limites propres
+            # (TILE_MAX_PIXELS) ; au-delà d'INGEST_MAX_PIXELS, l'image entière est tirée de ce raster
+            try:
+                image = tiling = None
+                if fields.get('tiled', '').lower() in ('1', 'true', 'yes'):
+                    tiling = TiledRaster(decode_tile_raster(spool.open()),
+                                         captions=fields.get('tile_captions', '').lower() in ('1', 'true', 'yes'))
+                    width, height = tiling.original_size
+                    if width * height > INGEST_MAX_PIXELS:
+                        image = tiling.overview()
+                    if len(tiling.boxes) < 2:
+                        tiling = None  # image déjà à la taille d'une tuile
+                if image is None:
+                    image = decode_image(spool.open())
+                image.load()
+            except (ImageTooLargeError, Image.DecompressionBombError) as e:
+                return jsonify({'success': False, 'error': str(e)}), 413
+            except Exception as e:
+                return jsonify({'success': False, 'error': 'Invalid or corrupted image file'}), 400
+        
+        try:
+            results = analyze_decoded_image_languages(image, languages, profile,
+                                                      disconnected=partial(client_disconnected, request.environ),
+                                                      deadline=deadline, tiling=tiling)
+        except LoadShedError as e:
+            logger.warning(f"🚦 Requête délestée: {filename} (échéance intenable)")
+            response = jsonify({'success': False, 'error': str(e)})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
+        except AnalysisCancelled:
+            # Réponse jamais lue : le client est parti (code 499 à la manière de nginx)
+            logger.info(f"🔌 Client déconnecté pendant l'analyse: {filename}")
+            return jsonify({'success': False, 'error': 'Client closed request'}), 499
+        if report_format == 'html':
+            # Rendu à partir du rapport structuré (sans toucher à l'entrée du cache)
+            results = {
+                lang: {**data, 'report_html': report_engine.render(data['report'], 'html')}
+                for lang, data in results.items()
+            }
+        
+        cached = all(data['details']['cached'] for data in results.values())
+        logger.info(f"✅ Image analysée: {filename} | Langue: {language} | Cache: {cached}")
+        if multiple:
+            return jsonify({'success': True, 'languages': languages, 'reports': results})
+        return jsonify(results[languages[0]])
+        
+    except Exception as e:
+        # Exception convertie en réponse 500 : invisible pour instrument_stage, comptée ici
+        record_stage_error('analyze_image')
+        logger.error(f"❌ Erreur analyse: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def sse_event(event, data):
+    """Événement Server-Sent Events (une ligne data JSON)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/analyze-image/stream', methods=['POST'])
+def analyze_image_stream():
+    """Variante en flux (SSE) de /api/analyze-image : chaque section est envoyée dès qu'elle est prête
     
-    if vit_results:
-        report += f"{trans['main_categories']} :\n"
-        for i, result in enumerate(vit_results[:3], 1):
-            label_fr = translate_label_to_french(result['label'])
-            report += f"  • {label_fr} (confiance: {result['confidence']*100:.1f}%)\n"
+    Événements : colors, categories, caption_token (profils gloutons), caption, translation, report, done.
+    """
+    try:
+        fields, filename, spool = receive_image_upload()
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
     
-    report += f"\n{trans['visual_analysis']} :\n"
-    if color_analysis:
-        report += f"  • {trans['resolution']} : {color_analysis['width']} × {color_analysis['height']} pixels\n"
-        report += f"  • {trans['aspect_ratio']} : {color_analysis['width']/color_analysis['height']:.2f}:1\n"
-        report += f"  • {trans['dominant_colors']} : {', '.join(color_analysis['dominant_colors'][:3])}\n"
-        report += f"  • {trans['composition_type']} : {get_composition_description(color_analysis['composition'], 'fr')}\n"
-        report += f"  • {trans['brightness_level']} : {'Élevé' if color_analysis['brightness'] > 150 else 'Moyen' if color_analysis['brightness'] > 100 else 'Faible'}\n"
+    with spool:
+        language = fields.get('language', 'fr')
+        profile = fields.get('profile', DEFAULT_CAPTION_PROFILE)
+        if profile not in CAPTION_PROFILES:
+            return jsonify({'success': False, 'error': f'Unknown profile. Use: {", ".join(CAPTION_PROFILES)}'}), 400
+        if language not in TRANSLATIONS:
+            return jsonify({'success': False, 'error': f'Unsupported language: {language}'}), 400
+        
+        unavailable = unavailable_image_models(profile)
+        if unavailable:
+            return models_unavailable_response(unavailable)
+        
+        # Décoder avant de répondre : les erreurs restent des réponses JSON classiques, et le spool
+        # est libéré avant le début du flux
+        try:
+            image = decode_image(spool.open())
+            image.load()
+        except (ImageTooLargeError, Image.DecompressionBombError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 413
+        except Exception:
+            return jsonify({'success': False, 'error': 'Invalid or corrupted image file'}), 400
     
-    report += f"\n🎨 {trans['technical_analysis']}\n"
-    report += generate_technical_analysis(color_analysis, vit_results, 'fr')
+    logger.info(f"📡 Analyse en flux: {filename} | Langue: {language} | Profil: {profile}")
     
-    report += f"\n💡 {trans['recommendations']}\n"
-    report += generate_recommendations(blip_description, vit_results, 'fr')
+    def generate():
+        started = time.perf_counter()
+        elapsed_ms = lambda: round((time.perf_counter() - started) * 1000, 1)
+        cancelled = threading.Event()
+        
+        cache_key = compute_analysis_key(image, language, profile)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            cached['details'].update(cached=True, stage_timings_ms={},
+                                     analysis_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            yield sse_event('report', {**cached, 'elapsed_ms': elapsed_ms()})
+            yield sse_event('done', {'elapsed_ms': elapsed_ms()})
+            return
+        
+        try:
+            # Lancer les modèles d'abord, puis envoyer l'analyse des couleurs calculée pendant ce temps
+            pixels = image_to_array(image)
+            stream_tokens = CAPTION_PROFILES[profile]['num_beams'] == 1
+            vit_future = vit_batcher.submit(pixels) if not model_registry.is_failed('vit') else None
+            caption_stream = blip_future = None
+            if stream_tokens:
+                caption_stream = start_caption_stream(pixels, profile, cancelled)
+            else:
+                blip_future = blip_batchers[profile].submit(pixels)
+            
+            color_analysis = analyze_colors_and_composition(image)
+            timings = {'colors': elapsed_ms()}
+            yield sse_event('colors', {
+                **color_analysis,
+                'composition_description': get_composition_description(color_analysis.get('composition'), language),
+                'elapsed_ms': timings['colors']
+            })
+            
+            vit_results = _stage_result('ViT', vit_future)
+            timings['vit'] = elapsed_ms()
+            yield sse_event('categories', {'categories': vit_results or [], 'elapsed_ms': timings['vit']})
+            
+            if stream_tokens:
+                parts = []
+                for text in caption_stream:
+                    if text:
+                        parts.append(text)
+                        yield sse_event('caption_token', {'text': text, 'elapsed_ms': elapsed_ms()})
+                blip_description = None if caption_stream.error else ''.join(parts).strip()
+            else:
+                blip_description = _stage_result('BLIP', blip_future)
+            timings['blip'] = elapsed_ms()
+            yield sse_event('caption', {'caption': blip_description, 'elapsed_ms': timings['blip']})
+            
+            if language != 'en':
+                labels = [r['label'] for r in (vit_results or [])[:3]]
+                translated = translate_batch([blip_description] + labels, language)
+                timings['translation'] = elapsed_ms()
+                yield sse_event('translation', {
+                    'language': language,
+                    'caption': translated.get(blip_description, blip_description),
+                    'labels': {label: translated.get(label, label) for label in labels},
+                    'elapsed_ms': timings['translation']
+                })
+            
+            timings['total'] = elapsed_ms()
+            # Clé du modèle de traduction réellement chargé (repli éventuel au premier usage)
+            cache_key = compute_analysis_key(image, language, profile)
+            response_data = build_analysis_response(
+                image, language, profile, cache_key, blip_description, vit_results, color_analysis, timings
+            )
+            yield sse_event('report', {**response_data, 'elapsed_ms': elapsed_ms()})
+            yield sse_event('done', {'elapsed_ms': elapsed_ms()})
+        except Exception as e:
+            logger.error(f"❌ Erreur analyse en flux: {e}")
+            yield sse_event('error', {'success': False, 'error': str(e)})
+        finally:
+            # Client déconnecté (GeneratorExit) ou fin normale : arrêter la génération en cours
+            cancelled.set()
     
-    return report
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par un proxy nginx
+    return response
 
-def generate_arabic_report(blip_description, vit_results, color_analysis, trans):
-    """Générer rapport en arabe"""
-    report = "🖼️ التقرير الشامل لتحليل الصورة\n\n"
-    
-    report += f"📋 {trans['executive_summary']}\n"
-    arabic_desc = translate_to_arabic(blip_description) if blip_description else "صورة تحتوي على عناصر بصرية متنوعة"
-    report += f"الوصف بالذكاء الاصطناعي: {arabic_desc}\n\n"
-    
-    report += f"🔍 {trans['content_analysis']}\n"
-    
-    if vit_results:
-        report += f"{trans['main_categories']}:\n"
-        for i, result in enumerate(vit_results[:3], 1):
-            label_ar = translate_label_to_arabic(result['label'])
-            report += f"  • {label_ar} (ثقة: {result['confidence']*100:.1f}%)\n"
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    """Corps au-delà de REQUEST_MAX_BYTES (MAX_CONTENT_LENGTH) : réponse JSON comme les autres erreurs"""
+    return jsonify({'success': False, 'error': f'Request too large (max {REQUEST_MAX_BYTES} bytes)'}), 413
+
+@app.route('/api/near-duplicates', methods=['POST'])
+def query_near_duplicates():
+    """Images déjà analysées proches d'une image envoyée (ou d'un hash perceptuel hexadécimal)"""
+    try:
+        fields, filename, spool = receive_image_upload(required=False)
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
     
-    report += f"\n{trans['visual_analysis']}:\n"
-    if color_analysis:
-        report += f"  • {trans['resolution']} : {color_analysis['width']} × {color_analysis['height']} بكسل\n"
-        report += f"  • {trans['aspect_ratio']} : {color_analysis['width']/color_analysis['height']:.2f}:1\n"
-        report += f"  • {trans['dominant_colors']} : {', '.join(color_analysis['dominant_colors'][:3])}\n"
-        report += f"  • {trans['composition_type']} : {get_composition_description(color_analysis['composition'], 'ar')}\n"
-        report += f"  • {trans['brightness_level']} : {'مرتفع' if color_analysis['brightness'] > 150 else 'متوسط' if color_analysis['brightness'] > 100 else 'منخفض'}\n"
+    with spool or nullcontext():
+        try:
+            max_distance = int(fields.get('max_distance', NEAR_DUPLICATE_MAX_DISTANCE))
+            limit = int(fields.get('limit', 10))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'max_distance and limit must be integers'}), 400
+        if not 0 <= max_distance <= 64 or limit < 1:
+            return jsonify({'success': False, 'error': 'max_distance must be in [0, 64] and limit positive'}), 400
+        
+        if spool is not None:
+            try:
+                image_hash = perceptual_hash(decode_image(spool.open()))
+            except (ImageTooLargeError, Image.DecompressionBombError) as e:
+                return jsonify({'success': False, 'error': str(e)}), 413
+            except Exception:
+                return jsonify({'success': False, 'error': 'Invalid or corrupted image file'}), 400
+        elif 'hash' in fields:
+            try:
+                image_hash = int(fields['hash'], 16)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'hash must be hexadecimal'}), 400
+        else:
+            return jsonify({'success': False, 'error': 'No image or hash provided'}), 400
     
-    report += f"\n🎨 {trans['technical_analysis']}\n"
-    report += generate_technical_analysis(color_analysis, vit_results, 'ar')
+    matches = near_duplicates.query(image_hash, max_distance, limit)
+    return jsonify({
+        'success': True,
+        'hash': f'{image_hash:016x}',
+        'max_distance': max_distance,
+        'matches': [
+            {
+                'id': entry['id'],
+                'hash': f"{entry['hash']:016x}",
+                'distance': distance,
+                'dimensions': entry.get('dimensions'),
+                'indexed_at': entry['indexed_at'],
+                'captions': entry['captions'],
+                'categories': entry['vit_results']
+            }
+            for entry, distance in matches
+        ]
+    })
+
+@app.route('/api/similar', methods=['POST'])
+def find_similar():
+    """Images analysées les plus proches (cosinus des embeddings ViT) d'une image envoyée ou d'un id"""
+    try:
+        fields, filename, spool = receive_image_upload(required=False)
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
     
-    report += f"\n💡 {trans['recommendations']}\n"
-    report += generate_recommendations(blip_description, vit_results, 'ar')
+    with spool or nullcontext():
+        try:
+            k = int(fields.get('k', 10))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'k must be an integer'}), 400
+        if not 1 <= k <= 1000:
+            return jsonify({'success': False, 'error': 'k must be in [1, 1000]'}), 400
+        
+        exclude = None
+        if spool is not None:
+            if model_registry.is_failed('vit'):
+                return models_unavailable_response(['vit'])
+            try:
+                image = decode_image(spool.open())
+            except (ImageTooLargeError, Image.DecompressionBombError) as e:
+                return jsonify({'success': False, 'error': str(e)}), 413
+            except Exception:
+                return jsonify({'success': False, 'error': 'Invalid or corrupted image file'}), 400
+            try:
+                query = vit_batcher.submit(image_to_array(image)).result().embedding
+            except Exception as e:
+                logger.error(f"❌ Erreur embedding: {e}")
+                return jsonify({'success': False, 'error': str(e)}), 500
+        elif 'id' in fields:
+            exclude = fields['id']
+            query = embedding_store.get(exclude)
+            if query is None:
+                return jsonify({'success': False, 'error': 'Unknown image id'}), 404
+        else:
+            return jsonify({'success': False, 'error': 'No image or id provided'}), 400
     
-    return report
+    results = embedding_store.search(query, k, exclude=exclude)
+    return jsonify({
+        'success': True,
+        'k': k,
+        'index': embedding_store.stats()['index'],
+        'results': [{'id': entry_id, 'score': round(score, 6)} for entry_id, score in results]
+    })
 
-def generate_english_report(blip_description, vit_results, color_analysis, trans):
-    """Générer rapport en anglais"""
-    report = "🖼️ COMPREHENSIVE IMAGE ANALYSIS REPORT\n\n"
+def detach_batch_uploads():
+    """Copier les fichiers envoyés dans des fichiers temporaires : Flask ferme les siens à la fin de la vue,
+    avant le flux NDJSON
     
-    report += f"📋 {trans['executive_summary']}\n"
-    report += f"AI Description: {blip_description or 'Image containing various visual elements'}\n\n"
+    Les images sont mises bout à bout dans un seul fichier (nom, position, taille) ; l'archive a le sien.
+    Seules les images en vol sont relues en mémoire (iter_batch_uploads).
+    """
+    spool = tempfile.TemporaryFile(prefix='batch-')
+    images = []
+    for file in request.files.getlist('images'):
+        if file.filename:
+            offset = spool.tell()
+            shutil.copyfileobj(file.stream, spool, UPLOAD_CHUNK_SIZE)
+            images.append((file.filename, offset, spool.tell() - offset))
+    archive = request.files.get('archive')
+    archive_stream = None
+    if archive is not None and archive.filename:
+        archive_stream = tempfile.TemporaryFile(prefix='batch-archive-')
+        shutil.copyfileobj(archive.stream, archive_stream, UPLOAD_CHUNK_SIZE)
+    return spool, images, archive_stream
+
+def iter_batch_uploads(spool, images, archive_stream):
+    """Parcourir les images envoyées (champ 'images' multiple et/ou archive zip/tar 'archive')
+
+    Une image refusée (trop grande, limite de l'archive atteinte) est produite avec une UploadError à la
+    place du flux : elle donne une ligne d'erreur sans être décompressée en mémoire.
+    """
+    too_large = UploadError(f'File too large (max {UPLOAD_MAX_BYTES} bytes)', 413)
+    for filename, offset, size in images:
+        if size > UPLOAD_MAX_BYTES:
+            yield filename, too_large
+            continue
+        spool.seek(offset); yield filename, io.BytesIO(spool.read(size))
+    if archive_stream is None: return
+
+    members = 0
+    total = 0
+
+    def read_member(name, declared_size, open_member):
+        # Taille annoncée vérifiée avant d'ouvrir, lecture bornée ensuite (l'en-tête peut mentir)
+        nonlocal members, total
+        if members >= BATCH_ARCHIVE_MAX_MEMBERS:
+            raise UploadError(f'Archive has too many images (max {BATCH_ARCHIVE_MAX_MEMBERS})', 413)
+        if total + min(declared_size, UPLOAD_MAX_BYTES) > BATCH_ARCHIVE_MAX_BYTES:
+            raise UploadError(f'Archive too large once decompressed (max {BATCH_ARCHIVE_MAX_BYTES} bytes)', 413)
+        members += 1
+        if declared_size > UPLOAD_MAX_BYTES:
+            return too_large
+        with open_member() as member:
+            data = member.read(UPLOAD_MAX_BYTES + 1)
+        total += len(data)
+        if len(data) > UPLOAD_MAX_BYTES:
+            return too_large
+        return io.BytesIO(data)
+
+    stream = archive_stream
+    try:
+        if zipfile.is_zipfile(stream):
+            stream.seek(0)
+            with zipfile.ZipFile(stream) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and is_allowed_filename(info.filename):
+                        yield info.filename, read_member(info.filename, info.file_size,
+                                                         lambda info=info: zf.open(info))
+            return
+        stream.seek(0)
+        with tarfile.open(fileobj=stream, mode='r:*') as tf:
+            for member in tf:
+                if member.isfile() and is_allowed_filename(member.name):
+                    yield member.name, read_member(member.name, member.size,
+                                                   lambda member=member: tf.extractfile(member))
+    except UploadError as e:
+        # Limite de l'archive atteinte : une dernière ligne d'erreur, le reste n'est pas lu
+        logger.warning(f"⚠️ Archive du lot tronquée : {e}")
+        yield 'archive', e
+
+def analyze_batch_item(filename, stream, language, profile=None):
+    """Analyser une image du lot ; retourne une ligne de résultat (jamais d'exception)"""
+    if isinstance(stream, UploadError):
+        return {'filename': filename, 'success': False, 'error': str(stream)}
+    if not is_allowed_filename(filename):
+        return {'filename': filename, 'success': False,
+                'error': f'Format not supported. Use: {", ".join(ALLOWED_FORMATS)}'}
+    try:
+        image = decode_image(stream)
+    except (ImageTooLargeError, Image.DecompressionBombError) as e:
+        return {'filename': filename, 'success': False, 'error': str(e)}
+    except Exception:
+        return {'filename': filename, 'success': False, 'error': 'Invalid or corrupted image file'}
+    try:
+        return {'filename': filename, **analyze_decoded_image(image, language, profile)}
+    except Exception as e:
+        logger.error(f"❌ Erreur analyse ({filename}): {e}")
+        return {'filename': filename, 'success': False, 'error': str(e)}
+
+@app.route('/api/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """Endpoint pour analyser un lot d'images ; une ligne NDJSON par image dès qu'elle est prête"""
+    if not request.files.getlist('images') and 'archive' not in request.files:
+        return jsonify({'success': False, 'error': 'No images or archive provided'}), 400
     
-    report += f"🔍 {trans['content_analysis']}\n"
+    language = request.form.get('language', 'fr')
+    if language not in TRANSLATIONS:
+        return jsonify({'success': False, 'error': f'Unsupported language: {language}'}), 400
     
-    if vit_results:
-        report += f"{trans['main_categories']}:\n"
-        for i, result in enumerate(vit_results[:3], 1):
-            report += f"  • {result['label']} (confidence: {result['confidence']*100:.1f}%)\n"
+    profile = request.form.get('profile', DEFAULT_CAPTION_PROFILE)
+    if profile not in CAPTION_PROFILES:
+        return jsonify({'success': False, 'error': f'Unknown profile. Use: {", ".join(CAPTION_PROFILES)}'}), 400
     
-    report += f"\n{trans['visual_analysis']}:\n"
-    if color_analysis:
-        report += f"  • {trans['resolution']}: {color_analysis['width']} × {color_analysis['height']} pixels\n"
-        report += f"  • {trans['aspect_ratio']}: {color_analysis['width']/color_analysis['height']:.2f}:1\n"
-        report += f"  • {trans['dominant_colors']}: {', '.join(color_analysis['dominant_colors'][:3])}\n"
-        report += f"  • {trans['composition_type']}: {get_composition_description(color_analysis['composition'], 'en')}\n"
-        report += f"  • {trans['brightness_level']}: {'High' if color_analysis['brightness'] > 150 else 'Medium' if color_analysis['brightness'] > 100 else 'Low'}\n"
+    unavailable = unavailable_image_models(profile)
+    if unavailable:
+        return models_unavailable_response(unavailable)
     
-    report += f"\n🎨 {trans['technical_analysis']}\n"
-    report += generate_technical_analysis(color_analysis, vit_results, 'en')
+    spool, images, archive_stream = detach_batch_uploads()
     
-    report += f"\n💡 {trans['recommendations']}\n"
-    report += generate_recommendations(blip_description, vit_results, 'en')
+    def generate():
+        started = time.perf_counter()
+        processed = errors = 0
+        pending = set()
+        uploads = iter_batch_uploads(spool, images, archive_stream)
+        exhausted = False
+        
+        try:
+            # Fenêtre glissante : les images en vol alimentent les lots BLIP/ViT sans tout garder en mémoire
+            while pending or not exhausted:
+                while not exhausted and len(pending) < BATCH_ANALYSIS_WINDOW:
+                    try:
+                        filename, stream = next(uploads)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    except (zipfile.BadZipFile, tarfile.TarError) as e:
+                        exhausted = True
+                        errors += 1
+                        yield json.dumps({'success': False, 'error': f'Invalid archive: {e}'}) + '\n'
+                        break
+                    pending.add(batch_executor.submit(analyze_batch_item, filename, stream, language, profile))
+                
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    processed += 1
+                    errors += 0 if result['success'] else 1
+                    yield json.dumps(result, ensure_ascii=False) + '\n'
+        finally:
+            for future in pending:
+                future.cancel()
+            spool.close()
+            if archive_stream is not None:
+                archive_stream.close()
+        
+        yield json.dumps({
+            'done': True,
+            'processed': processed,
+            'errors': errors,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }) + '\n'
+        logger.info(f"✅ Lot analysé: {processed} images ({errors} erreurs) | Langue: {language}")
     
-    return report
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
-def translate_label_to_french(english_label):
-    """Traduire les labels en français"""
-    # D'abord essayer la traduction IA
-    if 'en-fr' in translation_pipelines:
-        translated = translate_with_ia(english_label, 'fr')
-        if translated and translated != english_label:
-            return translated
-    
-    # Fallback au dictionnaire
-    translations = {
-        "building": "Bâtiment",
-        "street": "Rue", 
-        "city": "Ville",
-        "landscape": "Paysage",
-        "mountain": "Montagne",
-        "beach": "Plage",
-        "forest": "Forêt",
-        "person": "Personne",
-        "car": "Voiture",
-        "animal": "Animal",
-        "tree": "Arbre",
-        "water": "Eau",
-        "sky": "Ciel",
-        "food": "Nourriture",
-        "indoor": "Intérieur",
-        "outdoor": "Extérieur",
-        "zebra": "Zèbre",
-        "gazelle": "Gazelle",
-        "impala": "Impala",
-        "giraffe": "Girafe",
-        "comic book": "Bande dessinée",
-        "book jacket": "Couverture de livre",
-        "dust cover": "Couverture protectrice",
-        "dust jacket": "Couverture de livre",
-        "dust wrapper": "Emballage protecteur",
-        "bow": "Arc",
-        "book": "Livre"
-    }
-    
-    return translations.get(english_label.lower(), english_label)
+class JobQueueFullError(Exception):
+    """File de travaux pleine (backpressure : HTTP 429)"""
 
-def translate_label_to_arabic(english_label):
-    """Traduire les labels en arabe"""
-    # D'abord essayer la traduction IA
-    if 'en-ar' in translation_pipelines:
-        translated = translate_with_ia(english_label, 'ar')
-        if translated and translated != english_label:
-            return translated
-    
-    # Fallback au dictionnaire
-    translations = {
-        "building": "مبنى",
-        "street": "شارع",
-        "city": "مدينة", 
-        "landscape": "منظر طبيعي",
-        "mountain": "جبل",
-        "beach": "شاطئ",
-        "forest": "غابة",
-        "person": "شخص",
-        "car": "سيارة",
-        "animal": "حيوان",
-        "tree": "شجرة",
-        "water": "ماء",
-        "sky": "سماء",
-        "food": "طعام",
-        "indoor": "داخلي",
-        "outdoor": "خارجي",
-        "zebra": "حمار وحشي",
-        "gazelle": "غزال",
-        "impala": "إمبالا",
-        "giraffe": "زرافة",
-        "comic book": "كتاب مصور",
-        "book jacket": "غلاف كتاب",
-        "dust cover": "غطاء واقي",
-        "dust jacket": "غلاف كتاب",
-        "dust wrapper": "غلاف واقي",
-        "bow": "قوس",
-        "book": "كتاب"
-    }
+    def __init__(self, retry_after):
+        super().__init__('Job queue is full')
+        self.retry_after = retry_after
+
+# Identifiant de cette instance du serveur, partagé par ses workers préforkés : dans la file sqlite,
+# distingue les travaux laissés par un arrêt précédent de ceux des workers voisins encore actifs
+SERVER_INSTANCE = uuid.uuid4().hex
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobQueue:
+    """Travaux d'analyse asynchrones : file à priorité bornée, pool de workers, résultats et webhooks
     
-    return translations.get(english_label.lower(), english_label)
+    Les travaux sont conservés en mémoire ; avec db_path, leur état est aussi écrit dans sqlite à chaque
+    étape. Tous les processus qui partagent le fichier (workers gunicorn) répondent alors sur n'importe
+    quel travail, et les travaux non terminés d'un processus arrêté sont repris par le prochain qui ouvre
+    la file. La connexion est ouverte au premier usage dans chaque processus, jamais héritée d'un fork.
+    """
 
-def get_composition_description(composition_type, language):
-    """Obtenir la description de la composition"""
-    descriptions = {
-        'fr': {
-            'horizontal': "Composition horizontale avec lignes fortes",
-            'vertical': "Composition verticale avec éléments élancés", 
-            'balanced': "Composition équilibrée et géométrique",
-            'panoramic': "Paysage panoramique ouvert",
-            'organic': "Composition fluide et organique"
-        },
-        'ar': {
-            'horizontal': "تركيب أفقي مع خطوط قوية",
-            'vertical': "تركيب عمودي مع عناصر رفيعة",
-            'balanced': "تركيب متوازن وهندسي", 
-            'panoramic': "منظر طبيعي بانورامي مفتوح",
-            'organic': "تركيب سائل وعضوي"
-        },
-        'en': {
-            'horizontal': "Horizontal composition with strong lines",
-            'vertical': "Vertical composition with slender elements",
-            'balanced': "Balanced and geometric composition", 
-            'panoramic': "Open panoramic landscape",
-            'organic': "Fluid and organic composition"
+    def __init__(self, run_job, workers=JOB_WORKERS, max_size=JOB_QUEUE_SIZE,
+                 result_ttl=JOB_RESULT_TTL, db_path=JOB_DB):
+        self.run_job = run_job
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.result_ttl = result_ttl
+        self.db_path = db_path
+        self._heap = []  # (-priorité, ordre d'arrivée, id)
+        self._jobs = {}  # id -> état public du travail
+        self._payloads = {}  # id -> octets de l'image (travaux en attente)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._run_seconds = deque(maxlen=50)  # pour estimer Retry-After
+        self._running = 0
+        self._stopping = False
+        self._db = None
+        self._db_pid = None
+        # Compteurs
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Ouvrir la file persistante dans ce processus et reprendre les travaux interrompus"""
+        with self._cond:
+            self._connection()
+
+    def _connection(self):
+        """Connexion sqlite de ce processus (None sans db_path) ; appelée sous self._cond"""
+        if not self.db_path or self._db_pid == os.getpid():
+            return self._db
+        if self._db_pid is not None:
+            # Processus forké après usage de la file : l'état local appartient au parent
+            self._heap, self._jobs, self._payloads, self._threads, self._running = [], {}, {}, [], 0
+        self._db_pid = os.getpid()
+        self._db = None
+        try:
+            db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")  # lectures concurrentes des autres workers
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs "
+                "(id TEXT PRIMARY KEY, priority INTEGER NOT NULL, created_at REAL NOT NULL, "
+                "job TEXT NOT NULL, payload BLOB, owner TEXT)"
+            )
+            if 'owner' not in {row[1] for row in db.execute("PRAGMA table_info(jobs)")}:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            db.commit()
+            self._db = db
+            restored = self._claim_orphaned_jobs()
+            logger.info(f"✅ File de travaux persistante: {self.db_path} ({restored} travaux repris)")
+            if restored:
+                self._ensure_workers()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ File de travaux persistante indisponible ({self.db_path}): {e}")
+            self._db = None
+        return self._db
+
+    def _owner(self):
+        return f"{SERVER_INSTANCE}:{os.getpid()}"
+
+    def _claim_orphaned_jobs(self):
+        """Reprendre les travaux non terminés d'une instance précédente ou d'un worker disparu"""
+        restored = 0
+        rows = self._db.execute(
+            "SELECT id, priority, job, payload, owner FROM jobs WHERE payload IS NOT NULL ORDER BY created_at"
+        ).fetchall()
+        for job_id, priority, job_json, payload, owner in rows:
+            if owner:
+                instance, _, pid = owner.rpartition(':')
+                if instance == SERVER_INSTANCE and _pid_alive(int(pid)):
+                    continue
+            # Réservation atomique : un seul worker reprend chaque travail
+            claimed = self._db.execute(
+                "UPDATE jobs SET owner = ? WHERE id = ? AND owner IS ?", (self._owner(), job_id, owner)
+            ).rowcount
+            self._db.commit()
+            if not claimed:
+                continue
+            job = json.loads(job_json)
+            job['status'] = 'queued'  # interrompu par l'arrêt du processus
+            self._jobs[job_id] = job
+            self._payloads[job_id] = payload
+            heapq.heappush(self._heap, (-priority, next(self._order), job_id))
+            restored += 1
+        return restored
+
+    def submit(self, payload, params, priority=0, callback_url=None):
+        """Mettre un travail en file ; retourne son état public (lève JobQueueFullError si la file est pleine)"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'priority': priority,
+            'params': params,
+            'callback_url': callback_url,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'timings_ms': {},
+            'result': None,
+            'error': None
         }
-    }
-    return descriptions[language].get(composition_type, composition_type)
+        with self._cond:
+            self._purge_expired(now)
+            if len(self._heap) >= self.max_size:
+                self.rejected += 1
+                raise JobQueueFullError(self._estimate_wait())
+            self._jobs[job_id] = job
+            self._payloads[job_id] = payload
+            heapq.heappush(self._heap, (-priority, next(self._order), job_id))
+            self._persist(job, payload)
+            self.submitted += 1
+            self._cond.notify()
+            snapshot = dict(job)
+        self._ensure_workers()
+        return snapshot
 
-def generate_technical_analysis(color_analysis, vit_results, language):
-    """Générer l'analyse technique"""
-    trans = TRANSLATIONS[language]
-    analysis = ""
-    
-    if color_analysis:
-        if color_analysis['contrast'] > 60:
-            analysis += f"  • {trans['high_contrast']}\n"
-        if color_analysis['edge_strength'] > 40:
-            analysis += f"  • {trans['sharp_details']}\n"
-        if len(color_analysis['dominant_colors']) >= 3:
-            analysis += f"  • {trans['color_harmony']}\n"
-    
-    if vit_results:
-        main_category = vit_results[0]['label']
-        if 'landscape' in main_category.lower():
-            if language == 'fr':
-                analysis += "  • Paysage panoramique avec profondeur de champ\n"
-            elif language == 'ar':
-                analysis += "  • منظر طبيعي بانورامي بعمق مجالي\n"
-            else:
-                analysis += "  • Panoramic landscape with field depth\n"
-        elif 'building' in main_category.lower():
-            analysis += f"  • {trans['architectural_elements']}\n"
-        elif 'person' in main_category.lower():
-            if language == 'fr':
-                analysis += "  • Présence d'éléments humains comme point focal\n"
-            elif language == 'ar':
-                analysis += "  • وجود عناصر بشرية كمركز الاهتمام\n" 
-            else:
-                analysis += "  • Human elements as focal point\n"
-    
-    return analysis
+    def get(self, job_id):
+        """État public d'un travail (copie), ou None ; les travaux des autres processus sont lus dans sqlite"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._stored_job(job_id)
+            snapshot = dict(job)
+            if job['status'] == 'queued':
+                entry = next(e for e in self._heap if e[2] == job_id)
+                snapshot['queue_position'] = sum(1 for e in self._heap if e < entry)
+            return snapshot
 
-def generate_recommendations(blip_desc, vit_results, language):
-    """Générer les recommandations"""
-    trans = TRANSLATIONS[language]
-    recommendations = []
-    
-    desc_lower = (blip_desc or "").lower()
-    
-    if any(word in desc_lower for word in ['landscape', 'mountain', 'beach', 'paysage', 'جبل', 'شاطئ']):
-        if language == 'fr':
-            recommendations.extend(["Présentations environnementales", "Arrière-plans naturels"])
-        elif language == 'ar':
-            recommendations.extend(["عروض بيئية", "خلفيات طبيعية"])
-        else:
-            recommendations.extend(["Environmental presentations", "Natural backgrounds"])
-    
-    if any(word in desc_lower for word in ['city', 'building', 'street', 'ville', 'bâtiment', 'مدينة', 'مبنى']):
-        if language == 'fr':
-            recommendations.extend(["Projets urbains", "Design architectural"])
-        elif language == 'ar':
-            recommendations.extend(["مشاريع عمرانية", "تصميم معماري"])
-        else:
-            recommendations.extend(["Urban projects", "Architectural design"])
+    def _stored_job(self, job_id):
+        db = self._connection()
+        if db is None:
+            return None
+        try:
+            row = db.execute("SELECT job FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = json.loads(row[0])
+            if job['finished_at'] and time.time() - job['finished_at'] > self.result_ttl:
+                return None
+            if job['status'] == 'queued':
+                # Position dans la file partagée par tous les processus
+                job['queue_position'] = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE payload IS NOT NULL "
+                    "AND json_extract(job, '$.status') = 'queued' "
+                    "AND (priority > ? OR (priority = ? AND created_at < ?))",
+                    (job['priority'], job['priority'], job['created_at'])
+                ).fetchone()[0]
+            return job
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Lecture file de travaux: {e}")
+            return None
+
+    def _estimate_wait(self):
+        """Délai (s) conseillé avant de resoumettre : temps d'écoulement de la file actuelle"""
+        average = sum(self._run_seconds) / len(self._run_seconds) if self._run_seconds else 1.0
+        return max(1, int(average * len(self._heap) / self.workers + 0.5))
+
+    def _ensure_workers(self):
+        with self._cond:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, job_id = heapq.heappop(self._heap)
+                self._running += 1
+                job = self._jobs[job_id]
+                payload = self._payloads.pop(job_id)
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                job['timings_ms']['queue_wait'] = round((job['started_at'] - job['created_at']) * 1000, 1)
+                self._persist_state(job)
+            
+            started = time.perf_counter()
+            try:
+                result = self.run_job(payload, job['params'])
+                status, error = ('done', None) if result.get('success', True) else ('failed', result.get('error'))
+            except Exception as e:
+                logger.error(f"❌ Erreur travail {job_id}: {e}")
+                result, status, error = None, 'failed', str(e)
+            run_seconds = time.perf_counter() - started
+            
+            with self._cond:
+                job['status'] = status
+                job['result'] = result
+                job['error'] = error
+                job['finished_at'] = time.time()
+                job['timings_ms']['run'] = round(run_seconds * 1000, 1)
+                job['timings_ms']['total'] = round((job['finished_at'] - job['created_at']) * 1000, 1)
+                self._run_seconds.append(run_seconds)
+                if status == 'done':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._persist_state(job, finished=True)
+                snapshot = dict(job)
+            
+            if job['callback_url']:
+                self._notify(snapshot)
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def shutdown(self, timeout=None):
+        """Arrêt gracieux : aucun nouveau travail démarré, attente des travaux en cours (et de leurs webhooks)"""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            while self._running:
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    logger.warning(f"⚠️ Arrêt: {self._running} travaux encore en cours après {timeout}s")
+                    break
+                self._cond.wait(remaining)
+            queued = len(self._heap)
+        if queued:
+            fate = 'repris par le prochain processus' if self._db is not None else 'abandonnés (file non persistante)'
+            logger.warning(f"⚠️ Arrêt: {queued} travaux en attente {fate}")
+
+    def _notify(self, job):
+        """Envoyer l'état final du travail au webhook du client (POST JSON)"""
+        try:
+            # Revalidé à l'envoi (la résolution DNS a pu changer) ; pas de redirection vers un autre hôte
+            validate_callback_url(job['callback_url'])
+            response = requests.post(job['callback_url'], json=job, timeout=JOB_CALLBACK_TIMEOUT,
+                                     allow_redirects=False)
+            callback_status = response.status_code
+        except (ValueError, requests.RequestException) as e:
+            logger.warning(f"⚠️ Webhook du travail {job['job_id']} en échec: {e}")
+            callback_status = None
+        with self._cond:
+            state = self._jobs[job['job_id']]
+            state['callback_status'] = callback_status
+            self._persist_state(state, finished=True)
+
+    def _purge_expired(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] and now - job['finished_at'] > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+        db = self._connection()
+        if db is None:
+            return
+        try:
+            # Travaux expirés de tous les processus partageant la file
+            db.execute("DELETE FROM jobs WHERE payload IS NULL AND json_extract(job, '$.finished_at') < ?",
+                       (now - self.result_ttl,))
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Purge de la file de travaux: {e}")
+
+    def _persist(self, job, payload):
+        db = self._connection()
+        if db is None:
+            return
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (id, priority, created_at, job, payload, owner) VALUES (?, ?, ?, ?, ?, ?)",
+                (job['job_id'], job['priority'], job['created_at'], json.dumps(job, ensure_ascii=False), payload,
+                 self._owner())
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Écriture file de travaux: {e}")
+
+    def _persist_state(self, job, finished=False):
+        """Publier l'état du travail aux autres processus ; terminé, l'image n'est plus nécessaire"""
+        db = self._connection()
+        if db is None:
+            return
+        try:
+            db.execute(
+                "UPDATE jobs SET job = ?" + (", payload = NULL" if finished else "") + " WHERE id = ?",
+                (json.dumps(job, ensure_ascii=False), job['job_id'])
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Écriture file de travaux: {e}")
+
+    def stats(self):
+        with self._cond:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job['status']] = statuses.get(job['status'], 0) + 1
+            return {
+                'queue_depth': len(self._heap),
+                'max_queue_size': self.max_size,
+                'workers': self.workers,
+                'jobs_by_status': statuses,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_run_ms': round(1000 * sum(self._run_seconds) / len(self._run_seconds), 1)
+                              if self._run_seconds else 0,
+                'persistent': self._connection() is not None
+            }
+
+def validate_callback_url(url):
+    """Refuser (ValueError) un webhook hors liste blanche ou visant une adresse non publique (SSRF)
     
-    if language == 'fr':
-        recommendations.extend(["Usage professionnel", "Impression et affichage numérique"])
-    elif language == 'ar':
-        recommendations.extend(["استخدام مهني", "طباعة وعرض رقمي"])
-    else:
-        recommendations.extend(["Professional use", "Print and digital display"])
+    Sans JOB_CALLBACK_ALLOWED_HOSTS, toutes les adresses résolues doivent être publiques : loopback,
+    privées, link-local, réservées et multicast sont refusées.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('callback_url must be an http(s) URL')
+    host = parts.hostname.lower()
+    if JOB_CALLBACK_ALLOWED_HOSTS:
+        if host not in JOB_CALLBACK_ALLOWED_HOSTS:
+            raise ValueError(f'callback_url host is not allowed: {host}')
+        return
     
-    return "  • " + "\n  • ".join(recommendations[:4])
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, ValueError):
+        raise ValueError(f'callback_url host cannot be resolved: {host}')
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f'callback_url must point to a public address: {host}')
 
-@app.route('/api/analyze-image', methods=['POST'])
-def analyze_image():
-    """Endpoint pour analyser l'image"""
+def run_analysis_job(payload, params):
+    """Exécuter un travail d'analyse (octets de l'image + paramètres du formulaire)"""
+    return analyze_batch_item(params['filename'], io.BytesIO(payload), params['language'], params['profile'])
+
+job_queue = JobQueue(run_analysis_job)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Soumettre une analyse asynchrone ; retourne immédiatement l'identifiant du travail"""
+    # Mêmes contrôles que /api/analyze-image (taille, extension, signature) avant de mettre en file
     try:
-        # Attendre que les modèles soient chargés
-        if blip_model is None or vit_model is None:
-            return jsonify({
-                'success': False, 
-                'error': 'Models are still loading. Please wait a moment and try again.'
-            }), 503
-        
-        if 'image' not in request.files:
-            return jsonify({'success': False, 'error': 'No image provided'}), 400
-        
-        file = request.files['image']
-        language = request.form.get('language', 'fr')
-        
-        logger.info(f"🌍 Analyse demandée en: {language}")
-        
-        if file.filename == '':
-            return jsonify({'success': False, 'error': 'No file selected'}), 400
-        
-        allowed_formats = ['jpg', 'jpeg', 'png', 'webp', 'bmp', 'gif']
-        if not any(file.filename.lower().endswith(f'.{fmt}') for fmt in allowed_formats):
-            return jsonify({
-                'success': False, 
-                'error': f'Format not supported. Use: {", ".join(allowed_formats)}'
-            }), 400
+        fields, filename, spool = receive_image_upload()
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    
+    with spool:
+        language = fields.get('language', 'fr')
+        if language not in TRANSLATIONS:
+            return jsonify({'success': False, 'error': f'Unsupported language: {language}'}), 400
+        profile = fields.get('profile', DEFAULT_CAPTION_PROFILE)
+        if profile not in CAPTION_PROFILES:
+            return jsonify({'success': False, 'error': f'Unknown profile. Use: {", ".join(CAPTION_PROFILES)}'}), 400
         
         try:
-            image = Image.open(file.stream)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-        except Exception as e:
-            return jsonify({'success': False, 'error': 'Invalid or corrupted image file'}), 400
-        
-        # Analyse avec l'IA
-        blip_description = analyze_with_blip(image) if blip_model else None
-        vit_results = analyze_with_vit(image) if vit_model else None
-        color_analysis = analyze_colors_and_composition(image)
-        
-        # Générer le rapport
-        analysis_report = generate_analysis_report(
-            blip_description, 
-            vit_results, 
-            color_analysis, 
-            language
-        )
+            priority = int(fields.get('priority', '0'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'priority must be an integer'}), 400
         
-        response_data = {
-            'success': True,
-            'description': analysis_report,
-            'details': {
-                'confidence': 0.95,
-                'dominant_colors': color_analysis.get('dominant_colors', []),
-                'image_format': image.format,
-                'dimensions': f"{color_analysis.get('width', 0)}x{color_analysis.get('height', 0)}",
-                'analysis_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'language': language,
-                'models_used': ['BLIP', 'ViT'],
-                'translation_ia': len(translation_pipelines) > 0
-            }
-        }
+        callback_url = fields.get('callback_url') or None
+        if callback_url:
+            try:
+                validate_callback_url(callback_url)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
         
-        logger.info(f"✅ Image analysée: {file.filename} | Langue: {language}")
-        return jsonify(response_data)
+        unavailable = unavailable_image_models(profile)
+        if unavailable:
+            return models_unavailable_response(unavailable)
         
-    except Exception as e:
-        logger.error(f"❌ Erreur analyse: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        # Charge utile bornée par UPLOAD_MAX_BYTES, lue une seule fois depuis le spool
+        payload = bytes(spool.open().read(spool.size))
+    
+    params = {'filename': filename, 'language': language, 'profile': profile}
+    try:
+        job = job_queue.submit(payload, params, priority, callback_url)
+    except JobQueueFullError as e:
+        response = jsonify({'success': False, 'error': 'Job queue is full. Please retry later.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    
+    logger.info(f"📥 Travail {job['job_id']} en file: {filename} | Langue: {language} | Priorité: {priority}")
+    response = jsonify({
+        'success': True,
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/api/jobs/{job['job_id']}"
+    })
+    response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """État d'un travail asynchrone, avec son résultat une fois terminé"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    return jsonify({'success': True, **job})
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    image_models = [blip_model_name(CAPTION_PROFILES[DEFAULT_CAPTION_PROFILE]['model_id']), 'vit']
+    if unavailable_image_models():
+        status = 'degraded ⚠️'
+    elif all(model_registry.is_loaded(name) for name in image_models):
+        status = 'healthy ✅'
+    else:
+        status = 'ready (lazy loading) 💤'
+    
     return jsonify({
-        'status': 'healthy ✅' if blip_model and vit_model else 'loading ⏳',
+        'status': status,
         'service': 'Multi-Language Image Analysis API',
         'version': '6.0.0',
         'supported_languages': ['fr', 'ar', 'en'],
         'models_loaded': {
-            'blip': blip_model is not None,
-            'vit': vit_model is not None,
-            'translation_ia': len(translation_pipelines) > 0
+            'blip': model_registry.is_loaded(image_models[0]),
+            'vit': model_registry.is_loaded('vit'),
+            'translation_ia': len(loaded_translation_pipelines()) > 0
         },
-        'translation_pipelines': list(translation_pipelines.keys()),
+        'models': model_registry.stats(),
+        'translation_pipelines': loaded_translation_pipelines(),
+        'inference_backends': inference_backends,
+        'caption_profiles': CAPTION_PROFILES,
+        'default_caption_profile': DEFAULT_CAPTION_PROFILE,
+        'batching': {
+            **{f'blip-{name}': batcher.stats() for name, batcher in blip_batchers.items()},
+            'vit': vit_batcher.stats()
+        },
+        'cache': analysis_cache.stats(),
+        'near_duplicates': near_duplicates.stats(),
+        'single_flight': analysis_flights.stats(),
+        'load_controller': load_controller.stats(),
+        'embeddings': embedding_store.stats(),
+        'translation_memo': translation_memo.stats(),
+        'jobs': job_queue.stats(),
+        'serving': {'pid': os.getpid(), **serving_state},
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness : le processus répond (ne dépend pas des modèles)"""
+    return jsonify({'status': 'alive', 'pid': os.getpid(), 'timestamp': datetime.now().isoformat()})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness : warmup terminé, pas d'arrêt en cours et modèles d'image disponibles"""
+    unavailable = unavailable_image_models()
+    ready = not serving_state['warming_up'] and not serving_state['draining'] and not unavailable
+    return jsonify({
+        'ready': ready,
+        'pid': os.getpid(),
+        **serving_state,
+        'unavailable_models': unavailable,
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    # Réponses en flux (NDJSON) : durée jusqu'au premier octet
+    endpoint = request.endpoint or 'unknown'
+    started = g.get('request_started')
+    if started is not None:
+        http_latency.observe(time.perf_counter() - started, endpoint)
+    http_requests.inc(endpoint, str(response.status_code))
+    return response
+
+metrics.gauge('image_analysis_queue_depth', "Éléments en attente par file", ('queue',), lambda: {
+    **{(f'blip-{name}',): batcher.stats()['queue_depth'] for name, batcher in blip_batchers.items()},
+    ('vit',): vit_batcher.stats()['queue_depth'],
+    ('jobs',): job_queue.stats()['queue_depth']
+})
+metrics.gauge('image_analysis_model_weights_bytes', "Taille des poids des modèles chargés", ('model',), lambda: {
+    (name,): model['weights_bytes'] for name, model in model_registry.stats()['models'].items()
+})
+metrics.gauge('process_resident_memory_bytes', "Mémoire résidente du processus", (), lambda: {
+    (): process_rss_bytes()
+})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métriques au format texte Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/test-translation', methods=['POST'])
 def test_translation():
     """Endpoint pour tester la traduction IA"""
@@ -721,36 +4420,357 @@ def test_translation():
         
         logger.info(f"Test traduction: '{text}' -> {language}")
         
-        if language == 'fr':
-            translated = translate_to_french(text)
-        elif language == 'ar':
-            translated = translate_to_arabic(text)
-        else:
-            translated = text
+        translated = translate_caption(text, language) if language in TRANSLATIONS else text
         
         return jsonify({
             'success': True,
             'original': text,
             'translated': translated,
             'language': language,
-            'translation_method': 'IA' if len(translation_pipelines) > 0 else 'Dictionary'
+            'translation_method': 'IA' if len(loaded_translation_pipelines()) > 0 else 'Dictionary'
         })
     except Exception as e:
         logger.error(f"Erreur test traduction: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _init_cli_worker(threads_per_worker, model_names):
+    """Initialiser un worker CLI : budget de threads torch ; modèles hérités du parent (fork) ou chargés ici
+    
+    model_names : les mêmes modèles que le parent (profil et langue demandés), pas la liste par défaut.
+    """
+    configure_torch_threads(threads_per_worker)
+    preload_models(model_names)
+
+def _cli_analyze_file(task):
+    root, relpath, language, profile = task
+    with open(os.path.join(root, relpath), 'rb') as f:
+        return analyze_batch_item(relpath, f, language, profile)
+
+def _flatten_result(result):
+    """Ligne à plat pour la sortie colonne (Parquet)"""
+    details = result.get('details', {})
+    return {
+        'filename': result['filename'],
+        'success': result['success'],
+        'error': result.get('error'),
+        'description': result.get('description'),
+        'language': details.get('language'),
+        'caption_profile': details.get('caption_profile'),
+        'dimensions': details.get('dimensions'),
+        'image_format': details.get('image_format'),
+        'dominant_colors': details.get('dominant_colors', []),
+        'analysis_time': details.get('analysis_time'),
+        'stage_timings_ms': json.dumps(details.get('stage_timings_ms', {}))
+    }
+
+def run_directory_analysis(root, output, output_format='jsonl', checkpoint=None, workers=None,
+                           threads_per_worker=1, language='fr', profile=None, parquet_rows_per_file=1000):
+    """Analyser une arborescence d'images avec un pool de processus, avec reprise sur checkpoint"""
+    if language not in TRANSLATIONS:
+        raise SystemExit(f"❌ Langue non supportée: {language}")
+    profile = profile or DEFAULT_CAPTION_PROFILE
+    if profile not in CAPTION_PROFILES:
+        raise SystemExit(f"❌ Profil inconnu: {profile}")
+    if output_format == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ pyarrow est requis pour --format parquet (pip install -r requirements-optional.txt)")
+    
+    checkpoint = checkpoint or f"{output.rstrip(os.sep)}.checkpoint"
+    done = set()
+    if os.path.exists(checkpoint):
+        with open(checkpoint, encoding='utf-8') as f:
+            done = {line.rstrip('\n') for line in f if line.strip()}
+    
+    relpaths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            relpath = os.path.relpath(os.path.join(dirpath, filename), root)
+            if is_allowed_filename(filename) and relpath not in done:
+                relpaths.append(relpath)
+    
+    workers = workers or max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+    logger.info(f"📂 {len(relpaths)} images à analyser ({len(done)} déjà traitées) | {workers} workers × {threads_per_worker} threads")
+    if not relpaths:
+        return
+    
+    if output_format == 'parquet':
+        os.makedirs(output, exist_ok=True)
+        part_index = len([name for name in os.listdir(output) if name.endswith('.parquet')])
+        out_file = None
+    else:
+        out_file = open(output, 'a', encoding='utf-8')
+    checkpoint_file = open(checkpoint, 'a', encoding='utf-8')
+    pending_rows = []
+    
+    def flush_parquet():
+        nonlocal part_index
+        if not pending_rows:
+            return
+        table = pa.Table.from_pylist(pending_rows)
+        pq.write_table(table, os.path.join(output, f"part-{part_index:05d}.parquet"))
+        part_index += 1
+        # Le checkpoint ne référence que des lignes déjà écrites sur disque
+        checkpoint_file.writelines(row['filename'] + '\n' for row in pending_rows)
+        checkpoint_file.flush()
+        pending_rows.clear()
+    
+    started = time.perf_counter()
+    processed = errors = 0
+    tasks = [(root, relpath, language, profile) for relpath in relpaths]
+    pipeline_key = TRANSLATIONS[language]['translation_pipeline']
+    model_names = [
+        blip_model_name(CAPTION_PROFILES[profile]['model_id']), 'vit',
+        *([translation_model_name(pipeline_key)] if pipeline_key else [])
+    ]
+    if multiprocessing.get_start_method() == 'fork':
+        # Charger avant le fork : les workers partagent les poids en copie-sur-écriture
+        preload_models(model_names)
+        gc.freeze()  # éviter que le ramasse-miettes ne recopie les pages partagées dans chaque worker
+    pool = multiprocessing.Pool(workers, initializer=_init_cli_worker, initargs=(threads_per_worker, model_names))
+    try:
+        for result in pool.imap_unordered(_cli_analyze_file, tasks):
+            processed += 1
+            errors += 0 if result['success'] else 1
+            if output_format == 'parquet':
+                pending_rows.append(_flatten_result(result))
+                if len(pending_rows) >= parquet_rows_per_file:
+                    flush_parquet()
+            else:
+                out_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+                out_file.flush()
+                checkpoint_file.write(result['filename'] + '\n')
+                checkpoint_file.flush()
+            if processed % 100 == 0:
+                rate = processed / (time.perf_counter() - started)
+                logger.info(f"⏱️ {processed}/{len(tasks)} images ({rate:.1f} images/s)")
+        pool.close()
+    except KeyboardInterrupt:
+        logger.warning("⚠️ Interruption : les résultats écrits sont conservés, relancer pour reprendre")
+        pool.terminate()
+    except BaseException:
+        pool.terminate()  # sinon join() sur un pool encore actif masquerait l'erreur d'origine
+        raise
+    finally:
+        pool.join()
+        if output_format == 'parquet':
+            flush_parquet()
+        else:
+            out_file.close()
+        checkpoint_file.close()
+    
+    logger.info(f"✅ {processed} images analysées ({errors} erreurs) en {time.perf_counter() - started:.1f}s")
+
+def warmup_worker(profile=None, languages=('fr', 'ar')):
+    """Analyse d'une image synthétique avant d'accepter du trafic : modèles, noyaux torch et traductions prêts"""
+    serving_state['warming_up'] = True
+    started = time.perf_counter()
+    try:
+        image = Image.merge('RGB', (Image.linear_gradient('L'), Image.radial_gradient('L'),
+                                    Image.linear_gradient('L').rotate(90)))
+        blip_description, vit_results, color_analysis, _ = run_analysis_stages(image, profile)
+        for language in languages:
+            generate_analysis_report(blip_description, vit_results, color_analysis, language)
+    except Exception as e:
+        logger.error(f"❌ Erreur warmup: {e}")
+    finally:
+        serving_state['warming_up'] = False
+        serving_state['warmup_seconds'] = round(time.perf_counter() - started, 2)
+    logger.info(f"🔥 Worker {os.getpid()} prêt (warmup {serving_state['warmup_seconds']}s)")
+
+def drain_worker(timeout=SERVE_GRACEFUL_TIMEOUT):
+    """Arrêt gracieux d'un worker : readiness en échec puis fin des travaux asynchrones en cours"""
+    serving_state['draining'] = True
+    job_queue.shutdown(timeout)
+
+def default_job_db():
+    """File de travaux partagée par les workers préforkés quand JOB_DB n'est pas défini (supprimée à l'arrêt)"""
+    return os.path.join(tempfile.gettempdir(), f'image-analysis-jobs-{SERVER_INSTANCE}.sqlite3')
+
+def serve_production(host='0.0.0.0', port=8000, workers=None, threads=SERVE_THREADS, torch_threads=None,
+                     timeout=SERVE_TIMEOUT, graceful_timeout=SERVE_GRACEFUL_TIMEOUT, warmup=SERVE_WARMUP):
+    """Service de production : workers gunicorn préforkés partageant les poids chargés dans le maître"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("❌ Le mode production nécessite gunicorn (pip install -r requirements-optional.txt)")
+    
+    # Un budget de threads torch par worker ; par défaut autant de workers que le budget de cœurs le permet
+    cpu_count = os.cpu_count() or 1
+    torch_threads = torch_threads or TORCH_INTRAOP_THREADS or min(2, cpu_count)
+    workers = workers or SERVE_WORKERS or max(1, cpu_count // torch_threads)
+    logger.info(f"🏭 Production: {workers} workers × {threads} threads HTTP × {torch_threads} threads torch")
+    
+    # Chaque worker a ses threads de travaux : l'état des travaux passe par sqlite pour que
+    # GET /api/jobs/<id> réponde quel que soit le worker qui reçoit la requête
+    temporary_job_db = not job_queue.db_path
+    if temporary_job_db:
+        job_queue.db_path = default_job_db()
+    
+    # Charger avant le fork : les workers partagent les poids en copie-sur-écriture
+    preload_models()
+    gc.freeze()
+    
+    sigterm_at = []
+    
+    def post_fork(server, worker):
+        configure_torch_threads(torch_threads)
+        job_queue.start()
+        if warmup:
+            warmup_worker()
+    
+    def post_worker_init(worker):
+        # Readiness en échec dès SIGTERM, pendant que gunicorn termine les requêtes en vol
+        def handle_term(signum, frame):
+            serving_state['draining'] = True
+            sigterm_at.append(time.monotonic())
+            worker.handle_exit(signum, frame)
+        signal.signal(signal.SIGTERM, handle_term)
+        signal.siginterrupt(signal.SIGTERM, False)
+    
+    def worker_int(worker):
+        serving_state['draining'] = True
+    
+    def worker_exit(server, worker):
+        # Travaux asynchrones en cours : le reste du délai de grâce ouvert par SIGTERM
+        elapsed = time.monotonic() - sigterm_at[0] if sigterm_at else 0
+        drain_worker(max(1, graceful_timeout - elapsed))
+    
+    def on_exit(server):
+        if temporary_job_db:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(job_queue.db_path + suffix)
+                except FileNotFoundError:
+                    pass
+    
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': timeout,  # couvre aussi le warmup du worker
+        'graceful_timeout': graceful_timeout,  # requêtes en vol terminées avant l'arrêt (SIGTERM)
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_int': worker_int,
+        'worker_exit': worker_exit,
+        'on_exit': on_exit,
+    }
+    
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return app
+    
+    ProductionServer().run()
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serveur d'analyse d'images multi-langues")
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser('serve', help="Démarrer le serveur (par défaut)")
+    serve_parser.add_argument('--production', action='store_true',
+                              help="Workers gunicorn préforkés (modèles chargés une fois, warmup, arrêt gracieux)")
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--workers', type=int, help="Workers préforkés (défaut: cœurs / threads torch)")
+    serve_parser.add_argument('--threads', type=int, default=SERVE_THREADS, help="Threads HTTP par worker")
+    serve_parser.add_argument('--torch-threads', type=int, help="Threads torch intra-op par worker")
+    serve_parser.add_argument('--no-warmup', dest='warmup', action='store_false', default=SERVE_WARMUP)
+    parser.set_defaults(production=False, host='0.0.0.0', port=8000)
+    precompute_parser = subparsers.add_parser(
+        'precompute-translations',
+        help="Pré-traduire tous les labels ViT dans le mémo de traduction"
+    )
+    precompute_parser.add_argument('--languages', nargs='+', choices=['fr', 'ar'], default=['fr', 'ar'])
+    analyze_dir_parser = subparsers.add_parser(
+        'analyze-dir',
+        help="Analyser une arborescence d'images hors-ligne (pool de processus, reprise possible)"
+    )
+    analyze_dir_parser.add_argument('root', help="Dossier racine des images")
+    analyze_dir_parser.add_argument('--output', required=True,
+                                    help="Fichier JSONL, ou dossier de fichiers Parquet")
+    analyze_dir_parser.add_argument('--format', dest='output_format', choices=['jsonl', 'parquet'], default='jsonl')
+    analyze_dir_parser.add_argument('--checkpoint', help="Fichier de reprise (défaut: <output>.checkpoint)")
+    analyze_dir_parser.add_argument('--workers', type=int, help="Nombre de processus (défaut: cœurs / threads)")
+    analyze_dir_parser.add_argument('--threads-per-worker', type=int, default=1)
+    analyze_dir_parser.add_argument('--language', choices=list(TRANSLATIONS), default='fr')
+    analyze_dir_parser.add_argument('--profile', choices=list(CAPTION_PROFILES), default=DEFAULT_CAPTION_PROFILE)
+    export_parser = subparsers.add_parser('export-models', help="Exporter ViT en TorchScript ou ONNX")
+    export_parser.add_argument('--backend', choices=['torchscript', 'onnx'], required=True)
+    export_parser.add_argument('--output-dir', default=EXPORT_DIR)
+    verify_parser = subparsers.add_parser(
+        'verify-backend',
+        help="Vérifier l'accord des sorties d'un backend avec les modèles fp32"
+    )
+    verify_parser.add_argument('--backend', choices=INFERENCE_BACKENDS[1:], required=True)
+    verify_parser.add_argument('--images', help="Dossier d'images de contrôle (défaut: images synthétiques)")
+    verify_parser.add_argument('--min-top1-agreement', type=float, default=0.9)
+    verify_preprocess_parser = subparsers.add_parser(
+        'verify-preprocessing',
+        help="Vérifier que le prétraitement partagé reproduit les processors HF"
+    )
+    verify_preprocess_parser.add_argument('--images', help="Dossier d'images de contrôle (défaut: images synthétiques)")
+    args = parser.parse_args()
+    
+    if args.command == 'precompute-translations':
+        precompute_label_translations(args.languages)
+        raise SystemExit(0)
+    
+    if args.command == 'export-models':
+        export_vit(ViTForImageClassification.from_pretrained(VIT_MODEL_ID).eval(), args.backend, args.output_dir)
+        raise SystemExit(0)
+    
+    if args.command == 'verify-backend':
+        verification = verify_inference_backend(args.backend, args.images, args.min_top1_agreement)
+        print(json.dumps(verification, ensure_ascii=False, indent=2))
+        raise SystemExit(0 if verification['passed'] else 1)
+    
+    if args.command == 'verify-preprocessing':
+        verification = verify_preprocessing(args.images)
+        print(json.dumps(verification, indent=2))
+        raise SystemExit(0 if verification['passed'] else 1)
+    
+    if args.command == 'analyze-dir':
+        run_directory_analysis(
+            args.root, args.output, args.output_format, args.checkpoint,
+            args.workers, args.threads_per_worker, args.language, args.profile
+        )
+        raise SystemExit(0)
+    
+    if args.production:
+        serve_production(args.host, args.port, args.workers, args.threads, args.torch_threads,
+                         warmup=args.warmup)
+        raise SystemExit(0)
+    
     print("🚀 Démarrage du serveur d'analyse multi-langues...")
-    print("🔗 URL: http://localhost:8000")
+    print(f"🔗 URL: http://localhost:{args.port}")
     print("🌍 Langues supportées: Français, Arabe, Anglais")
-    print("🤖 Chargement des modèles en arrière-plan...")
-    print("📸 Le serveur démarre, les modèles se chargeront progressivement")
+    if PRELOAD_MODELS:
+        print("🤖 Chargement des modèles en arrière-plan...")
+    else:
+        print("💤 Modèles chargés à la première requête (PRELOAD_MODELS=1 pour les précharger)")
     print("\n📋 Endpoints disponibles:")
     print("   • POST /api/analyze-image - Analyser une image")
+    print("   • POST /api/analyze-image/stream - Analyser une image, sections envoyées au fil de l'eau (SSE)")
+    print("   • POST /api/analyze-batch - Analyser un lot d'images (NDJSON)")
+    print("   • POST /api/near-duplicates - Images déjà analysées proches (hash perceptuel)")
+    print("   • POST /api/similar - Images analysées similaires (cosinus des embeddings ViT)")
+    print("   • POST /api/jobs - Soumettre une analyse asynchrone (GET /api/jobs/<id> pour le résultat)")
     print("   • GET  /api/health - Vérifier l'état des modèles")
+    print("   • GET  /api/health/live, /api/health/ready - Sondes liveness / readiness")
+    print("   • GET  /metrics - Métriques Prometheus")
     print("   • POST /api/test-translation - Tester la traduction IA")
     
-    # Attendre un peu que le chargement commence
-    time.sleep(2)
+    if PRELOAD_MODELS:
+        start_background_preload()
+    job_queue.start()
     
-    app.run(host='0.0.0.0', port=8000, debug=False)
\ No newline at end of file
+    app.run(host=args.host, port=args.port, debug=False)
\ No newline at end of file
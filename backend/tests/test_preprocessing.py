@@ -0,0 +1,54 @@
+"""Parité de preprocess_batch avec les processors HF (BLIP et ViT), sans téléchargement ni modèle"""
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+from transformers import BlipImageProcessor, ViTImageProcessor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mêmes tolérances que la commande verify-preprocessing
+MAX_MEAN_ERROR = 0.01
+MAX_ABS_ERROR = 0.15
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    """server-final.py importé sans état persistant (caches, mémo, travaux, embeddings)"""
+    for name in ('ANALYSIS_CACHE_DB', 'JOB_DB', 'EMBEDDING_DIR', 'TRANSLATION_MEMO_DB'):
+        os.environ[name] = ''
+    os.environ['EXPORT_DIR'] = str(tmp_path_factory.mktemp('exported_models'))
+    os.environ['PRELOAD_MODELS'] = '0'
+    spec = importlib.util.spec_from_file_location('server_final', os.path.join(BACKEND_DIR, 'server-final.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_images():
+    """Dégradés, bruit et aplats : réduction, agrandissement, taille exacte des modèles et format non carré"""
+    rng = np.random.default_rng(0)
+    gradient = Image.merge('RGB', (Image.linear_gradient('L'), Image.radial_gradient('L'),
+                                   Image.linear_gradient('L').rotate(90)))
+    # Texture aléatoire lissée, plus proche d'une photo qu'un bruit blanc pixel à pixel
+    noise = Image.fromarray(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)).resize((640, 480), Image.BILINEAR)
+    flat = Image.new('RGB', (300, 200), (200, 40, 90))
+    return [gradient, noise, flat, gradient.resize((200, 150)), noise.resize((384, 384)), noise.resize((224, 224)),
+            noise.resize((1024, 256))]
+
+
+@pytest.mark.parametrize('processor_factory', [BlipImageProcessor, ViTImageProcessor], ids=['blip', 'vit'])
+def test_preprocess_batch_matches_hf_processor(server, processor_factory):
+    processor = processor_factory()
+    images = synthetic_images()
+
+    reference = processor(images=images, return_tensors='pt')['pixel_values']
+    candidate = server.preprocess_batch([server.image_to_array(image) for image in images],
+                                        server.preprocess_spec(processor))
+
+    assert tuple(candidate.shape) == tuple(reference.shape)
+    diff = (reference - candidate).abs()
+    assert diff.mean().item() <= MAX_MEAN_ERROR
+    assert diff.max().item() <= MAX_ABS_ERROR
@@ -91,24 +91,78 @@ const ImageDescriptionGenerator = () => {
       formData.append('image', selectedImage);
       formData.append('language', selectedLanguage);
 
-      // Appel à l'API Python
-      const response = await fetch('http://localhost:8000/api/analyze-image', {
+      // Appel à l'API Python en flux (SSE) : les sections s'affichent dès qu'elles sont prêtes
+      const response = await fetch('http://localhost:8000/api/analyze-image/stream', {
         method: 'POST',
         body: formData,
       });
 
       if (!response.ok) {
-        throw new Error(`Erreur serveur: ${response.status}`);
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Erreur serveur: ${response.status}`);
       }
 
-      const data = await response.json();
-
-      if (data.success) {
-        setDescription(data.description);
-        setAnalysisDetails(data.details || {});
-      } else {
-        throw new Error(data.error || 'Erreur lors de l\'analyse');
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      const preview = { colors: '', categories: '', caption: '', translation: '' };
+      const showPreview = () => {
+        setDescription([preview.colors, preview.categories, preview.caption, preview.translation]
+          .filter(Boolean).join('\n\n'));
+      };
+      let buffer = '';
+      let finished = false;
+
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Chaque événement se termine par une ligne vide
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const event = (block.match(/^event: (.*)$/m) || [])[1];
+          const payload = (block.match(/^data: (.*)$/m) || [])[1];
+          if (!event || payload === undefined) continue;
+          const data = JSON.parse(payload);
+
+          switch (event) {
+            case 'colors':
+              preview.colors = `🎨 ${data.composition_description}`;
+              setAnalysisDetails({ dominant_colors: data.dominant_colors });
+              break;
+            case 'categories':
+              preview.categories = data.categories
+                .map(c => `• ${c.label} (${(c.confidence * 100).toFixed(1)}%)`).join('\n');
+              break;
+            case 'caption_token':
+              preview.caption += data.text;
+              break;
+            case 'caption':
+              preview.caption = data.caption || preview.caption;
+              break;
+            case 'translation':
+              preview.translation = `🌍 ${data.caption}`;
+              break;
+            case 'report':
+              setDescription(data.description);
+              setAnalysisDetails(data.details || {});
+              break;
+            case 'error':
+              throw new Error(data.error || 'Erreur lors de l\'analyse');
+            case 'done':
+              finished = true;
+              break;
+            default:
+              break;
+          }
+          if (['colors', 'categories', 'caption_token', 'caption', 'translation'].includes(event)) {
+            showPreview();
+          }
+        }
       }
+      reader.cancel().catch(() => {});
 
     } catch (err) {
       console.error('Erreur analyse:', err);